@@ -0,0 +1,374 @@
+# benchmark.py
+# Headless end-to-end benchmark that replays video files through process_frame
+#
+# Usage:
+# python benchmark.py clip1.mp4 clip2.mp4 --output results.json
+
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tracemalloc
+from time import perf_counter
+
+import cv2
+import numpy as np
+import mediapipe as mp
+
+from main import process_frame, process_frame_pipelined, process_frame_lanes
+from pose_detection import get_pose_engine, RoiPoseTracker
+from game_controller import GameController
+from key_dispatcher import KeyDispatcher, NullBackend, RecordingBackend
+from overlay import OverlayRenderer
+from capture import CapturedFrame
+from telemetry import Telemetry
+from landmark_recording import LandmarkRecorder
+from governor import QualityGovernor
+from inference_pool import InferencePool
+from lanes import LANE_KEY_MAPS, LaneSet, create_lane_controllers
+from motion_gate import MotionGate
+from frame_source import create_frame_source
+from buffer_pool import FrameBufferPool
+from pose_landmarker import DEFAULT_POSE_MODEL, AsyncPoseLandmarker
+
+# Stages recorded by process_frame, in pipeline order
+STAGES = ('flip', 'convert', 'inference', 'classify', 'dispatch', 'overlay')
+
+# Additional stage recorded by process_frame_pipelined, reported after inference
+PIPELINE_STAGES = ('reorder',)
+
+
+def summarize(durations):
+    """
+    Summarize a list of durations in seconds
+
+    Returns:
+        Dictionary with mean, p50, p95, p99 and max in milliseconds
+    """
+    if not durations:
+        return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0}
+    values = np.asarray(durations) * 1000.0
+    p50, p95, p99 = np.percentile(values, [50, 95, 99])
+    return {
+        'mean': float(values.mean()),
+        'p50': float(p50),
+        'p95': float(p95),
+        'p99': float(p99),
+        'max': float(values.max()),
+    }
+
+
+def allocation_report(allocated_frames):
+    """
+    Summarize the memory allocated during each traced frame
+
+    Args:
+        allocated_frames: Peak traced memory above the frame's starting point, in frame sizes, per frame
+
+    Returns:
+        Dictionary with the number of frames, the frames that allocated at least one frame-sized
+        image and the median and maximum allocation in frame sizes
+    """
+    if not allocated_frames:
+        return {'frames': 0, 'frames_over_frame_size': 0, 'p50': 0.0, 'max': 0.0}
+    values = np.asarray(allocated_frames)
+    return {
+        'frames': int(len(values)),
+        'frames_over_frame_size': int((values >= 1.0).sum()),
+        'p50': round(float(np.median(values)), 3),
+        'max': round(float(values.max()), 3),
+    }
+
+
+def git_commit():
+    """Return the current git commit hash, or None outside a git checkout."""
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], stderr=subprocess.DEVNULL,
+                                       cwd=os.path.dirname(os.path.abspath(__file__))).decode().strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_video(path, pose, samples, warmup_frames=0, max_frames=None, record_landmarks=False, governor=None,
+              pool=None, num_lanes=1, backend=None, buffers=None, render=True, trace_allocations=False, rate='max'):
+    """
+    Run every frame of a video through process_frame and record stage timings
+
+    Args:
+        path: Video file path, image directory or 'synthetic' (see frame_source.create_frame_source)
+        pose: Pose object used for inference
+        samples: Dictionary of stage name -> list of durations, extended in place
+                 ('capture_to_key' holds the latency from frame start to key sent)
+        warmup_frames: Number of initial frames to process without recording
+        max_frames: Stop after this many frames (None for the whole file)
+        record_landmarks: Whether to save the landmark stream next to the video as <path>.bplm
+        governor: Optional QualityGovernor (also passed as pose) told every frame's time
+        pool: Optional InferencePool; frames are then processed pipelined and pose is ignored
+        num_lanes: Number of player lanes; with more than one, every lane gets its own pose and pose is ignored
+        backend: Input backend the keys are sent to (default: discard them)
+        buffers: Optional FrameBufferPool the frame images are taken from
+        render: Whether to draw the overlays on every frame
+        trace_allocations: Whether to record the memory allocated by Python and NumPy during each frame,
+                           in frame sizes, in samples['allocated_frames'] (tracemalloc must be tracing)
+        rate: 'max' to read frames as fast as they are processed, 'native' to read them at the
+              video's frame rate like a camera
+
+    Returns:
+        Number of frames recorded
+    """
+    # Frames are read as fast as they decode (or at the native rate), timestamped when read
+    # (synthetic frames end after the timed frames, 300 by default)
+    source = create_frame_source(path, rate=rate, frames=warmup_frames + (max_frames or 300))
+    if not source.is_opened():
+        print(f"Error: cannot open {path}")
+        return 0
+
+    # Keys go nowhere (or into a recording) and nothing is shown
+    backend = backend if backend is not None else NullBackend()
+    telemetry = Telemetry(log_interval=None)
+    key_latencies = samples.setdefault('capture_to_key', [])
+    on_sent = lambda origin_timestamp, sent_at: key_latencies.append(sent_at - origin_timestamp)
+    lanes = None
+    if num_lanes > 1:
+        lanes = LaneSet(create_lane_controllers(num_lanes, backend=backend, on_sent=on_sent))
+    else:
+        controller = GameController(dispatcher=KeyDispatcher(backend=backend, on_sent=on_sent).start())
+    renderer = OverlayRenderer() if render else None
+    timer = telemetry.timer
+    recorder = LandmarkRecorder(f"{path.rstrip('/')}.bplm") if record_landmarks else None
+
+    seq = 0
+    recorded = 0
+    finished = 0
+    image = None
+
+    def record(frame=None):
+        nonlocal recorded, finished
+        if buffers is not None:
+            buffers.release(frame)
+        finished += 1
+        if finished <= warmup_frames:
+            return
+        for stage, duration in timer.laps.items():
+            samples.setdefault(stage, []).append(duration)
+        samples.setdefault('total', []).append(timer.total())
+        recorded += 1
+
+    try:
+        while max_frames is None or recorded < max_frames:
+            if trace_allocations:
+                tracemalloc.reset_peak()
+                traced_before, _ = tracemalloc.get_traced_memory()
+
+            # Frames are processed one at a time, so every frame can be decoded into the same image
+            ok, image, timestamp = source.read(image if buffers is not None else None)
+            if not ok:
+                break
+            seq += 1
+            captured = CapturedFrame(image, timestamp, seq)
+
+            if pool is not None:
+                # Every frame of the file is processed, so wait for a free slot instead of dropping
+                while pool.is_full():
+                    process_frame_pipelined(None, pool, controller, telemetry, renderer, recorder=recorder,
+                                            timeout=1.0, on_finished=record, buffers=buffers)
+                process_frame_pipelined(captured, pool, controller, telemetry, renderer, recorder=recorder,
+                                        on_finished=record, buffers=buffers)
+            else:
+                if lanes is not None:
+                    frame = process_frame_lanes(captured, lanes, telemetry, renderer, buffers=buffers)
+                else:
+                    frame = process_frame(captured, controller, telemetry, renderer, pose, recorder=recorder,
+                                          buffers=buffers)
+                if governor is not None:
+                    governor.observe(timer.total())
+                record(frame)
+
+            if buffers is not None:
+                buffers.frame_done()
+            if trace_allocations and seq > warmup_frames:
+                _, traced_peak = tracemalloc.get_traced_memory()
+                samples.setdefault('allocated_frames', []).append((traced_peak - traced_before) / image.nbytes)
+
+        # Finish the frames still in the pipeline
+        while pool is not None and pool.queue_depth():
+            process_frame_pipelined(None, pool, controller, telemetry, renderer, recorder=recorder,
+                                    timeout=1.0, on_finished=record, buffers=buffers)
+    finally:
+        if lanes is not None:
+            lanes.close()
+        else:
+            controller.close()
+        source.release()
+        if recorder is not None:
+            recorder.close()
+
+    return recorded
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Benchmark the frame pipeline on recorded video files')
+    parser.add_argument('videos', nargs='+',
+                        help="video files or image directories to replay ('synthetic' for generated frames)")
+    parser.add_argument('--output', default='benchmark.json', help='JSON file to write results to')
+    parser.add_argument('--warmup-frames', type=int, default=10,
+                        help='frames per video processed before timing starts')
+    parser.add_argument('--max-frames', type=int, default=None, help='maximum timed frames per video')
+    parser.add_argument('--pose-engine', choices=('solutions', 'landmarker'), default='solutions',
+                        help='blocking legacy pose graph, or the asynchronous Tasks PoseLandmarker')
+    parser.add_argument('--pose-model', default=DEFAULT_POSE_MODEL,
+                        help='PoseLandmarker model bundle (.task) for --pose-engine landmarker')
+    parser.add_argument('--source-rate', choices=('max', 'native'), default='max',
+                        help="read frames as fast as they are processed, or at the video's frame rate "
+                             "(use native to compare the asynchronous engine, which drops frames while busy)")
+    parser.add_argument('--roi-tracking', action='store_true',
+                        help='run inference on a downscaled crop around the tracked player')
+    parser.add_argument('--inference-size', type=int, default=256,
+                        help='longest side in pixels of the crop passed to the model with --roi-tracking')
+    parser.add_argument('--governor', action='store_true',
+                        help='adapt inference settings to --frame-budget-ms while replaying')
+    parser.add_argument('--frame-budget-ms', type=float, default=1000 / 30,
+                        help='target processing time per frame for --governor')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='run inference pipelined on this many worker processes (0: in the main loop)')
+    parser.add_argument('--motion-gate', action='store_true',
+                        help='skip inference and reuse the previous landmarks while the scene is static')
+    parser.add_argument('--motion-threshold', type=float, default=4.0,
+                        help='mean grayscale difference (0-255) below which --motion-gate skips a frame')
+    parser.add_argument('--lanes', type=int, default=1,
+                        help='number of player lanes, each with its own pose graph')
+    parser.add_argument('--record-landmarks', action='store_true',
+                        help='save the landmark stream of each video next to it as <video>.bplm')
+    parser.add_argument('--headless', action='store_true',
+                        help='do not draw overlays, as in main.py between preview frames')
+    parser.add_argument('--no-buffer-pool', action='store_true',
+                        help='allocate new images for every frame instead of reusing pooled ones')
+    parser.add_argument('--trace-allocations', action='store_true',
+                        help='trace Python and NumPy allocations and count the frames that allocate a frame-sized '
+                             'image (slows the run down)')
+    return parser.parse_args()
+
+
+def main():
+    """Run the benchmark and write the results as JSON"""
+    args = parse_args()
+    if args.workers and (args.governor or args.roi_tracking or args.motion_gate):
+        print("Error: --workers cannot be combined with --governor, --roi-tracking or --motion-gate")
+        return
+    if args.lanes > len(LANE_KEY_MAPS):
+        print(f"Error: --lanes supports at most {len(LANE_KEY_MAPS)} lanes")
+        return
+    if args.lanes > 1 and (args.workers or args.governor or args.roi_tracking or args.record_landmarks
+                           or args.motion_gate):
+        print("Error: --lanes cannot be combined with --workers, --governor, --roi-tracking, --record-landmarks "
+              "or --motion-gate")
+        return
+    if args.pose_engine == 'landmarker' and (args.workers or args.lanes > 1 or args.governor or args.roi_tracking
+                                             or args.motion_gate):
+        print("Error: --pose-engine landmarker cannot be combined with --workers, --lanes, --governor, "
+              "--roi-tracking or --motion-gate")
+        return
+
+    samples = {}
+    frames = 0
+    wall_start = perf_counter()
+    governor = QualityGovernor(args.frame_budget_ms / 1000) if args.governor else None
+    motion_stats = []
+    landmarker_stats = []
+    backend = RecordingBackend()
+    buffers = None if args.no_buffer_pool else FrameBufferPool()
+    if args.trace_allocations:
+        tracemalloc.start()
+    for path in args.videos:
+        # A new pool per video, since the shared frame ring is sized to the first frame
+        pool = InferencePool(args.workers) if args.workers else None
+        if pool is not None:
+            pose = None
+        elif args.pose_engine == 'landmarker':
+            # A new landmarker per video, its timestamps must keep increasing
+            pose = AsyncPoseLandmarker(args.pose_model)
+        elif governor is not None:
+            pose = governor
+        elif args.roi_tracking:
+            pose = RoiPoseTracker(get_pose_engine(), inference_size=args.inference_size)
+        else:
+            pose = get_pose_engine()
+        if args.motion_gate and pool is None:
+            pose = MotionGate(pose, args.motion_threshold)
+            motion_stats.append(pose)
+        try:
+            count = run_video(path, pose, samples, args.warmup_frames, args.max_frames, args.record_landmarks,
+                              governor, pool, args.lanes, backend, buffers, not args.headless,
+                              args.trace_allocations, args.source_rate)
+        finally:
+            if pool is not None:
+                pool.close()
+            if isinstance(pose, AsyncPoseLandmarker):
+                pose.close()
+                landmarker_stats.append(dict(pose.stats(), video=path))
+        print(f"{path}: {count} frames")
+        frames += count
+    wall_time = perf_counter() - wall_start
+
+    # Pipelined frames overlap, so their stage totals are latencies and throughput follows from the wall time;
+    # so does it when frames are paced or the asynchronous engine runs inference outside the stages
+    overlapped = args.workers or args.pose_engine == 'landmarker' or args.source_rate == 'native'
+    processing_time = wall_time if overlapped else sum(samples.get('total', []))
+    report = {
+        'commit': git_commit(),
+        'machine': {
+            'platform': platform.platform(),
+            'processor': platform.processor(),
+            'cpu_count': os.cpu_count(),
+            'python': sys.version.split()[0],
+            'opencv': cv2.__version__,
+            'mediapipe': mp.__version__,
+        },
+        'config': {
+            'videos': args.videos,
+            'roi_tracking': args.roi_tracking,
+            'inference_size': args.inference_size,
+            'governor': args.governor,
+            'workers': args.workers,
+            'lanes': args.lanes,
+            'pose_engine': args.pose_engine,
+            'source_rate': args.source_rate,
+            'motion_gate': args.motion_gate,
+            'motion_threshold': args.motion_threshold,
+            'frame_budget_ms': args.frame_budget_ms,
+            'warmup_frames': args.warmup_frames,
+            'headless': args.headless,
+            'buffer_pool': buffers is not None,
+        },
+        'frames': frames,
+        'buffers': buffers.stats() if buffers is not None else None,
+        'allocations': allocation_report(samples.get('allocated_frames', [])) if args.trace_allocations else None,
+        'throughput_fps': frames / processing_time if processing_time > 0 else 0.0,
+        'wall_time_s': wall_time,
+        'governor_level': governor.level_index if governor is not None else None,
+        'motion_gate': [dict(gate.stats(), video=path) for gate, path in zip(motion_stats, args.videos)],
+        'landmarker': landmarker_stats,
+        'stages_ms': {stage: summarize(samples.get(stage, [])) for stage in STAGES + PIPELINE_STAGES + ('total',)
+                      if stage in STAGES or stage in samples or stage == 'total'},
+        'capture_to_key_ms': summarize(samples.get('capture_to_key', [])),
+        'keys_pressed': backend.key_counts(),
+    }
+
+    with open(args.output, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    # Short summary on the console
+    print(f"Throughput: {report['throughput_fps']:.1f} FPS over {frames} frames")
+    for stage, stats in report['stages_ms'].items():
+        print(f"  {stage:<10} p50 {stats['p50']:7.2f} ms  p95 {stats['p95']:7.2f} ms  p99 {stats['p99']:7.2f} ms")
+    if report['allocations'] is not None:
+        print(f"Frames allocating a frame-sized image: {report['allocations']['frames_over_frame_size']} "
+              f"of {report['allocations']['frames']}")
+    print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
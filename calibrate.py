@@ -0,0 +1,165 @@
+# calibrate.py
+# Derive a resolution-independent threshold profile from calibration clips and recorded sessions
+#
+# Video clips are run through the pose model on a pool of worker processes, one
+# clip per worker at a time; landmark recordings (.bplm) are used directly.
+#
+# Usage:
+# python calibrate.py calibration_clips/ session1.bplm --output profile.json
+# python main.py --profile profile.json
+
+import argparse
+import multiprocessing
+import os
+import signal
+from time import perf_counter
+
+import cv2
+import numpy as np
+
+from frame_source import VideoFileSource
+from landmarks import NUM_LANDMARKS
+from landmark_recording import LandmarkRecording
+from threshold_profile import derive_profile, measure
+
+VIDEO_EXTENSIONS = ('.mp4', '.avi', '.mov', '.mkv', '.webm')
+RECORDING_EXTENSION = '.bplm'
+
+
+def _ignore_sigint():
+    """Pool worker initializer: leave Ctrl+C to the parent, which terminates the pool"""
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+
+def _measure_clip(task):
+    """
+    Worker process: detect the pose in every frame of a clip
+
+    Args:
+        task: Tuple of (clip path, 'video' or 'image' pose, model complexity, frame stride)
+
+    Returns:
+        Tuple of (clip path, landmark array (N, 33, 4) with NaN where nobody was detected, width, height)
+    """
+    path, mode, model_complexity, stride = task
+    # Imported here so the parent process never loads MediaPipe
+    from pose_detection import create_pose_image, create_pose_video
+
+    pose = create_pose_image(model_complexity) if mode == 'image' else create_pose_video(model_complexity)
+    source = VideoFileSource(path, rate='max')
+    stack = []
+    width = height = 0
+    index = 0
+    try:
+        while True:
+            ok, image, _ = source.read()
+            if not ok:
+                break
+            index += 1
+            if (index - 1) % stride:
+                continue
+            # Flipped like the live loop, so left and right match
+            image_rgb = cv2.cvtColor(cv2.flip(image, 1), cv2.COLOR_BGR2RGB)
+            height, width, _ = image_rgb.shape
+            landmarks = pose.process(image_rgb).pose_landmarks
+            if landmarks:
+                stack.append([(landmark.x, landmark.y, landmark.z, landmark.visibility)
+                              for landmark in landmarks.landmark])
+            else:
+                stack.append(np.full((NUM_LANDMARKS, 4), np.nan))
+    finally:
+        source.release()
+        pose.close()
+    return path, np.asarray(stack, dtype=np.float32).reshape(-1, NUM_LANDMARKS, 4), width, height
+
+
+def find_inputs(paths):
+    """
+    Expand directories into the video clips and landmark recordings they contain
+
+    Returns:
+        Tuple of (list of video paths, list of recording paths)
+    """
+    videos, recordings = [], []
+    for path in paths:
+        files = [os.path.join(path, name) for name in sorted(os.listdir(path))] if os.path.isdir(path) else [path]
+        for file in files:
+            if file.lower().endswith(RECORDING_EXTENSION):
+                recordings.append(file)
+            elif file.lower().endswith(VIDEO_EXTENSIONS) or not os.path.isdir(path):
+                videos.append(file)
+    return videos, recordings
+
+
+def calibrate(videos, recordings, mode='image', model_complexity=1, stride=1, workers=None):
+    """
+    Measure every clip and recording and derive a profile
+
+    Args:
+        videos: Video clip paths, processed in parallel
+        recordings: Landmark recording paths
+        mode: 'image' runs the static-image pose model on every frame independently,
+              'video' the tracking model used by the live loop
+        model_complexity: Pose landmark model complexity
+        stride: Use every stride-th frame of the clips (only with mode 'image')
+        workers: Number of worker processes (default: one per CPU)
+
+    Returns:
+        ThresholdProfile
+    """
+    measurements = []
+    for path in recordings:
+        recording = LandmarkRecording(path)
+        measurements.append(measure(recording.landmarks, recording.width, recording.height))
+        print(f"{path}: {int(recording.valid.sum())} frames with a person")
+
+    if videos:
+        workers = min(workers or os.cpu_count() or 1, len(videos))
+        tasks = [(path, mode, model_complexity, stride) for path in videos]
+        # Spawned workers, like the inference pool, so no MediaPipe state is inherited
+        with multiprocessing.get_context('spawn').Pool(workers, initializer=_ignore_sigint) as pool:
+            for path, stack, width, height in pool.imap_unordered(_measure_clip, tasks):
+                detected = int((~np.isnan(stack[:, 0, 0])).sum())
+                print(f"{path}: {detected} of {len(stack)} frames with a person")
+                if detected:
+                    measurements.append(measure(stack, width, height))
+
+    if not measurements:
+        raise ValueError("No calibration data")
+    return derive_profile(measurements)
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Derive a threshold profile from calibration clips and sessions')
+    parser.add_argument('inputs', nargs='+',
+                        help='video clips, landmark recordings (.bplm) or directories containing them')
+    parser.add_argument('--mode', choices=('image', 'video'), default='image',
+                        help='static-image pose model per frame, or the tracking model of the live loop')
+    parser.add_argument('--model-complexity', type=int, choices=(0, 1, 2), default=1,
+                        help='pose landmark model complexity')
+    parser.add_argument('--stride', type=int, default=1, help='use every n-th frame of the clips (image mode)')
+    parser.add_argument('--workers', type=int, default=None, help='worker processes (default: one per CPU)')
+    parser.add_argument('--output', default='profile.json', help='profile file to write')
+    return parser.parse_args()
+
+
+def main():
+    """Calibrate and write the profile"""
+    args = parse_args()
+    if args.mode == 'video' and args.stride != 1:
+        print("Error: --stride needs --mode image, the tracking model must see every frame")
+        return
+    videos, recordings = find_inputs(args.inputs)
+    start = perf_counter()
+    profile = calibrate(videos, recordings, args.mode, args.model_complexity, args.stride, args.workers)
+    print(f"Calibrated on {profile.calibration['frames']} frames in {perf_counter() - start:.1f} s")
+    print(f"  hands joined below {profile.hands_ratio:.2f} shoulder widths ({profile.calibration['hands_source']})")
+    print(f"  columns at {profile.column_fractions[0]:.3f} / {profile.column_fractions[1]:.3f} of the width")
+    print(f"  rows at {profile.row_fractions[0]:.3f} / {profile.row_fractions[1]:.3f} of the height")
+    profile.save(args.output)
+    print(f"Profile written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,136 @@
+# capture.py
+# Background frame capture that always keeps only the newest frame
+
+import threading
+from time import sleep
+
+
+class CapturedFrame:
+    """A single camera frame tagged with its capture time and sequence number"""
+    __slots__ = ('image', 'timestamp', 'seq')
+
+    def __init__(self, image, timestamp, seq):
+        self.image = image
+        self.timestamp = timestamp  # capture time reported by the source, on the perf_counter() clock
+        self.seq = seq              # increases by one for every frame read
+
+
+class CaptureThread:
+    """
+    Read frames from a FrameSource (see frame_source.py) on a dedicated thread.
+
+    Only the most recent frame is kept, so a slow consumer never works on
+    stale frames queued up in the driver buffer. Frames that are replaced
+    before anyone picked them up are counted as dropped.
+
+    With reuse_buffers, frames are decoded into three recycled arrays instead
+    of a new array per frame: one holding the newest frame, one held by the
+    consumer and one being written. A frame returned by get_latest() then
+    stays valid only until the next get_latest() call.
+    """
+    def __init__(self, source, reuse_buffers=False):
+        """
+        Args:
+            source: FrameSource to read from
+            reuse_buffers: Whether to decode into recycled arrays (see above)
+        """
+        self.source = source
+        self.reuse_buffers = reuse_buffers
+        self.frames_captured = 0
+        self.frames_dropped = 0
+        self.read_failures = 0
+
+        self._latest = None
+        self._last_taken_seq = 0
+        self._taken = None    # image of the frame the consumer holds
+        self._buffers = []    # recycled images, at most three
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Start the capture thread"""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='capture', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the capture thread and wait for it to exit"""
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def is_running(self):
+        """Return whether the capture thread is still delivering frames."""
+        return self._running and self.source.is_opened()
+
+    def _run(self):
+        """Capture loop running on the background thread"""
+        while self._running and self.source.is_opened():
+            ok, image, timestamp = self.source.read(self._spare_buffer() if self.reuse_buffers else None)
+
+            if not ok:
+                self.read_failures += 1
+                sleep(0.001)  # Avoid spinning on a source that keeps failing
+                continue
+
+            with self._condition:
+                self.frames_captured += 1
+
+                # The previous frame was never taken, so it is dropped
+                if self._latest is not None and self._latest.seq > self._last_taken_seq:
+                    self.frames_dropped += 1
+
+                self._latest = CapturedFrame(image, timestamp, self.frames_captured)
+                if self.reuse_buffers and len(self._buffers) < 3 and not any(image is b for b in self._buffers):
+                    self._buffers.append(image)
+                self._condition.notify_all()
+
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+
+    def _spare_buffer(self):
+        """Return a recycled image that is neither the newest frame nor the consumer's, or None."""
+        with self._condition:
+            latest = self._latest.image if self._latest is not None else None
+            for buffer in self._buffers:
+                if buffer is not latest and buffer is not self._taken:
+                    return buffer
+        return None
+
+    def get_latest(self, timeout=None):
+        """
+        Return the newest frame that has not been returned before
+
+        Args:
+            timeout: Maximum time in seconds to wait for a new frame (None waits forever)
+
+        Returns:
+            CapturedFrame, or None if no new frame arrived in time or capture stopped
+        """
+        with self._condition:
+            has_new_frame = lambda: (self._latest is not None and self._latest.seq > self._last_taken_seq) \
+                or not self._running
+            if not self._condition.wait_for(has_new_frame, timeout):
+                return None
+
+            if self._latest is None or self._latest.seq <= self._last_taken_seq:
+                return None
+
+            self._last_taken_seq = self._latest.seq
+            self._taken = self._latest.image
+            return self._latest
+
+    def stats(self):
+        """Return capture counters as a dictionary"""
+        with self._condition:
+            return {
+                'captured': self.frames_captured,
+                'dropped': self.frames_dropped,
+                'read_failures': self.read_failures,
+            }
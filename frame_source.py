@@ -0,0 +1,374 @@
+# frame_source.py
+# Frame sources for the capture thread: tuned live cameras, video files, image directories and synthetic frames
+#
+# Every source returns (ok, image, timestamp) from read(), where timestamp is the
+# capture time on the perf_counter() clock, and describes the format it actually
+# got with describe(). File and synthetic sources make every performance
+# measurement reproducible without a camera.
+
+import os
+from time import perf_counter, sleep
+
+import cv2
+import numpy as np
+
+# OpenCV capture backends by name
+CAMERA_BACKENDS = {
+    'auto': cv2.CAP_ANY,
+    'v4l2': cv2.CAP_V4L2,
+    'dshow': cv2.CAP_DSHOW,
+    'msmf': cv2.CAP_MSMF,
+    'avfoundation': cv2.CAP_AVFOUNDATION,
+    'gstreamer': cv2.CAP_GSTREAMER,
+}
+
+# Rates file and synthetic sources can deliver frames at
+SOURCE_RATES = ('native', 'max')
+
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg', '.bmp', '.tif', '.tiff', '.webp')
+
+# Driver timestamps further than this from the read time are ignored (seconds)
+MAX_DRIVER_TIMESTAMP_AGE = 1.0
+
+
+def fourcc_name(value):
+    """Return the four-character code of an OpenCV FOURCC property value (empty if unset)."""
+    value = int(value)
+    return ''.join(chr((value >> (8 * i)) & 0xFF) for i in range(4)).strip('\x00')
+
+
+class FrameSource:
+    """
+    Base class of the frame sources.
+
+    File and synthetic sources either deliver frames at their native rate,
+    paced against the wall clock as a camera would, or as fast as they can be
+    read ('max', for benchmarks). At the native rate a frame's timestamp is the
+    time it is due; at the maximum rate it is the time it was read.
+    """
+    def __init__(self, rate='native'):
+        if rate not in SOURCE_RATES:
+            raise ValueError(f"Unknown rate {rate!r}, expected one of {', '.join(SOURCE_RATES)}")
+        self.rate = rate
+        self.frames_read = 0
+        self._started_at = None
+
+    def read(self, image=None):
+        """
+        Read the next frame
+
+        Args:
+            image: Optional array of the frame's shape to decode into instead of allocating a new one
+
+        Returns:
+            Tuple of (ok, BGR image, capture timestamp on the perf_counter() clock)
+        """
+        raise NotImplementedError
+
+    def is_opened(self):
+        """Return whether the source can deliver more frames."""
+        raise NotImplementedError
+
+    def release(self):
+        """Release the underlying device or file"""
+
+    def describe(self):
+        """Return the source's negotiated format as a dictionary."""
+        raise NotImplementedError
+
+    def _timestamp(self, stream_time):
+        """
+        Wait until a frame is due and return its capture timestamp
+
+        Args:
+            stream_time: Time of the frame in seconds since the first frame
+        """
+        now = perf_counter()
+        if self.rate == 'max':
+            return now
+        if self._started_at is None:
+            self._started_at = now - stream_time
+        due = self._started_at + stream_time
+        if due > now:
+            sleep(due - now)
+        return due
+
+
+class CameraSource(FrameSource):
+    """
+    Live camera with the settings that matter for latency.
+
+    MJPG lets USB cameras deliver full resolution at full frame rate where
+    uncompressed YUYV is limited by USB bandwidth, and a buffer of one frame
+    keeps the driver from handing out frames that queued up while the loop was
+    busy. The values the driver actually granted are read back and mismatches
+    are printed. Where the driver reports buffer timestamps on the same clock
+    as perf_counter() (V4L2 on Linux), those are used as capture times.
+    """
+    def __init__(self, camera_id=0, width=1280, height=960, fps=None, fourcc='MJPG', buffer_size=1,
+                 backend='auto'):
+        """
+        Args:
+            camera_id: Camera device ID
+            width: Requested frame width
+            height: Requested frame height
+            fps: Requested frame rate (None keeps the driver default)
+            fourcc: Requested pixel format, e.g. 'MJPG' or 'YUYV' (None keeps the driver default)
+            buffer_size: Requested number of driver buffers (None keeps the driver default)
+            backend: Capture backend name, see CAMERA_BACKENDS
+        """
+        super().__init__()
+        self.camera_id = camera_id
+        self.requested = {'width': width, 'height': height, 'fps': fps, 'fourcc': fourcc,
+                          'buffer_size': buffer_size}
+        self.driver_timestamps = 0
+        self.camera = cv2.VideoCapture(camera_id, CAMERA_BACKENDS[backend])
+
+        # The pixel format must be set before the resolution for V4L2 to pick a mode that supports it
+        if fourcc is not None:
+            self.camera.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*fourcc))
+        self.camera.set(cv2.CAP_PROP_FRAME_WIDTH, width)
+        self.camera.set(cv2.CAP_PROP_FRAME_HEIGHT, height)
+        if fps is not None:
+            self.camera.set(cv2.CAP_PROP_FPS, fps)
+        if buffer_size is not None:
+            self.camera.set(cv2.CAP_PROP_BUFFERSIZE, buffer_size)
+
+        if self.camera.isOpened():
+            self._report_mismatches()
+
+    def _report_mismatches(self):
+        """Print every requested setting the driver did not grant"""
+        granted = self.describe()
+        for name, requested in self.requested.items():
+            if requested is not None and granted[name] != requested:
+                print(f"Camera {self.camera_id}: requested {name}={requested}, got {granted[name]}")
+
+    def read(self, image=None):
+        ok, image = self.camera.read(image)
+        now = perf_counter()
+        if not ok:
+            return False, None, now
+        self.frames_read += 1
+
+        # Prefer the driver's buffer timestamp, the time the frame was actually captured
+        driver_time = self.camera.get(cv2.CAP_PROP_POS_MSEC) / 1000
+        if 0 < now - driver_time < MAX_DRIVER_TIMESTAMP_AGE:
+            self.driver_timestamps += 1
+            return True, image, driver_time
+        return True, image, now
+
+    def is_opened(self):
+        return self.camera.isOpened()
+
+    def release(self):
+        self.camera.release()
+
+    def describe(self):
+        return {
+            'source': 'camera',
+            'camera_id': self.camera_id,
+            'backend': self.camera.getBackendName() if self.camera.isOpened() else None,
+            'width': int(self.camera.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(self.camera.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fps': self.camera.get(cv2.CAP_PROP_FPS),
+            'fourcc': fourcc_name(self.camera.get(cv2.CAP_PROP_FOURCC)),
+            'buffer_size': int(self.camera.get(cv2.CAP_PROP_BUFFERSIZE)),
+            'timestamps': 'driver' if self.driver_timestamps else 'read',
+        }
+
+
+class VideoFileSource(FrameSource):
+    """Frames of a video file, at the file's frame rate or as fast as they decode"""
+    def __init__(self, path, rate='native', loop=False):
+        """
+        Args:
+            path: Video file path
+            rate: 'native' paces frames by their presentation time, 'max' reads them as fast as possible
+            loop: Whether to start over at the end of the file
+        """
+        super().__init__(rate)
+        self.path = path
+        self.loop = loop
+        self.video = cv2.VideoCapture(path)
+        self._offset = 0.0  # stream time of the current loop's first frame
+        self._last_time = 0.0
+        self._ended = False
+
+    def read(self, image=None):
+        ok, frame = self.video.read(image)
+        if not ok and self.loop and self.frames_read:
+            # Continue the timeline one frame after the last frame of the previous pass
+            self._offset = self._last_time + 1 / self._fps()
+            self.video.set(cv2.CAP_PROP_POS_FRAMES, 0)
+            ok, frame = self.video.read(image)
+        if not ok:
+            self._ended = True
+            return False, None, perf_counter()
+        self.frames_read += 1
+        self._last_time = self._offset + self.video.get(cv2.CAP_PROP_POS_MSEC) / 1000
+        return True, frame, self._timestamp(self._last_time)
+
+    def _fps(self):
+        """Return the file's frame rate, assuming 30 if the container does not say."""
+        return self.video.get(cv2.CAP_PROP_FPS) or 30.0
+
+    def is_opened(self):
+        return self.video.isOpened() and not self._ended
+
+    def release(self):
+        self.video.release()
+
+    def describe(self):
+        return {
+            'source': 'file',
+            'path': self.path,
+            'width': int(self.video.get(cv2.CAP_PROP_FRAME_WIDTH)),
+            'height': int(self.video.get(cv2.CAP_PROP_FRAME_HEIGHT)),
+            'fps': self._fps(),
+            'fourcc': fourcc_name(self.video.get(cv2.CAP_PROP_FOURCC)),
+            'frames': int(self.video.get(cv2.CAP_PROP_FRAME_COUNT)),
+            'rate': self.rate,
+        }
+
+
+class ImageDirectorySource(FrameSource):
+    """Image files of a directory in name order, played at a fixed frame rate or as fast as they decode"""
+    def __init__(self, path, fps=30.0, rate='native', loop=False):
+        """
+        Args:
+            path: Directory with the images
+            fps: Frame rate the images are played at with rate 'native'
+            rate: 'native' or 'max'
+            loop: Whether to start over after the last image
+        """
+        super().__init__(rate)
+        self.path = path
+        self.fps = fps
+        self.loop = loop
+        self.files = sorted(os.path.join(path, name) for name in os.listdir(path)
+                            if name.lower().endswith(IMAGE_EXTENSIONS))
+        self._index = 0
+        self._shape = None
+
+    def read(self, image=None):
+        # Decoding always allocates, the buffer is not used
+        if self._index >= len(self.files) and self.loop:
+            self._index = 0
+        if self._index >= len(self.files):
+            return False, None, perf_counter()
+        image = cv2.imread(self.files[self._index])
+        self._index += 1
+        if image is None:
+            return False, None, perf_counter()
+        self._shape = image.shape
+        timestamp = self._timestamp(self.frames_read / self.fps)
+        self.frames_read += 1
+        return True, image, timestamp
+
+    def is_opened(self):
+        return bool(self.files) and (self.loop or self._index < len(self.files))
+
+    def describe(self):
+        if self._shape is None and self.files:
+            first = cv2.imread(self.files[0])
+            self._shape = first.shape if first is not None else None
+        height, width = self._shape[:2] if self._shape is not None else (0, 0)
+        return {
+            'source': 'images',
+            'path': self.path,
+            'width': width,
+            'height': height,
+            'fps': self.fps,
+            'frames': len(self.files),
+            'rate': self.rate,
+        }
+
+
+class SyntheticSource(FrameSource):
+    """
+    Generated frames: a ball bouncing over a static gradient, with the frame number.
+
+    No person is ever detected in them, but they exercise capture, conversion,
+    inference, rendering and the motion gate exactly the same every run.
+    """
+    def __init__(self, width=1280, height=960, fps=30.0, rate='native', frames=None):
+        """
+        Args:
+            width: Frame width
+            height: Frame height
+            fps: Frame rate with rate 'native' (also the ball's time step)
+            rate: 'native' or 'max'
+            frames: Number of frames to generate (None for no end)
+        """
+        super().__init__(rate)
+        self.width = width
+        self.height = height
+        self.fps = fps
+        self.frames = frames
+        gradient = np.linspace(40, 200, width, dtype=np.uint8)
+        self._background = np.repeat(np.tile(gradient, (height, 1))[:, :, np.newaxis], 3, axis=2)
+
+    def read(self, image=None):
+        if not self.is_opened():
+            return False, None, perf_counter()
+        if image is None or image.shape != self._background.shape:
+            image = np.empty_like(self._background)
+        np.copyto(image, self._background)
+        radius = min(self.width, self.height) // 10
+        x = self._bounce(self.frames_read * 7, self.width - 2 * radius) + radius
+        y = self._bounce(self.frames_read * 5, self.height - 2 * radius) + radius
+        cv2.circle(image, (x, y), radius, (0, 0, 255), -1)
+        cv2.putText(image, str(self.frames_read), (10, 40), cv2.FONT_HERSHEY_PLAIN, 3, (255, 255, 255), 3)
+        timestamp = self._timestamp(self.frames_read / self.fps)
+        self.frames_read += 1
+        return True, image, timestamp
+
+    @staticmethod
+    def _bounce(position, span):
+        """Return a position moving back and forth between 0 and span."""
+        position %= 2 * span
+        return position if position < span else 2 * span - position
+
+    def is_opened(self):
+        return self.frames is None or self.frames_read < self.frames
+
+    def describe(self):
+        return {
+            'source': 'synthetic',
+            'width': self.width,
+            'height': self.height,
+            'fps': self.fps,
+            'frames': self.frames,
+            'rate': self.rate,
+        }
+
+
+def create_frame_source(spec, rate='native', loop=False, width=1280, height=960, fps=None, fourcc='MJPG',
+                        buffer_size=1, backend='auto', frames=None):
+    """
+    Create a frame source from a command line specification
+
+    Args:
+        spec: Camera ID (e.g. '0'), video file, image directory or 'synthetic'
+        rate: Rate of file and synthetic sources, 'native' or 'max'
+        loop: Whether file sources start over at the end
+        width: Camera or synthetic frame width
+        height: Camera or synthetic frame height
+        fps: Camera frame rate, image directory and synthetic frame rate (default: driver default or 30)
+        fourcc: Camera pixel format
+        buffer_size: Camera driver buffers
+        backend: Camera capture backend name
+        frames: Number of synthetic frames (None for no end)
+
+    Returns:
+        FrameSource
+    """
+    spec = str(spec)
+    if spec.isdigit():
+        return CameraSource(int(spec), width, height, fps, fourcc, buffer_size, backend)
+    if spec == 'synthetic':
+        return SyntheticSource(width, height, fps or 30.0, rate, frames)
+    if os.path.isdir(spec):
+        return ImageDirectorySource(spec, fps or 30.0, rate, loop)
+    return VideoFileSource(spec, rate, loop)
@@ -1,49 +1,68 @@
 # game_controller.py
 # Handle all game control functions
 
-import pyautogui
-from time import sleep
+from key_dispatcher import KeyDispatcher
+from landmarks import LEFT_SHOULDER, RIGHT_SHOULDER, Y
+from gestures import GestureEngine, HysteresisClassifier, start_gestures
+
+# Keys sent for each game action
+DEFAULT_KEYS = {'left': 'left', 'right': 'right', 'up': 'up', 'down': 'down', 'start': 'space'}
 
 class GameController:
-    def __init__(self):
+    def __init__(self, dispatcher=None, verbose=True, keys=None, gestures=None, classifier=None):
         # Game state variables
         self.game_started = False
         self.x_pos_index = 1  # 0: left, 1: center, 2: right
         self.y_pos_index = 1  # 0: crouch, 1: stand, 2: jump
         self.mid_y = None
-        self.counter = 0
-        self.num_of_frames = 10
         self.key_delay = 0  # delay between key presses in seconds
         self.activate_window_needed = True
+        self.frame_timestamp = None  # capture time of the frame being processed
+        self.verbose = verbose  # print jumps and crouches
+        self.keys = dict(DEFAULT_KEYS, **(keys or {}))  # action -> key name
+        
+        # Gestures are timed on the frames' capture timestamps, so the hands must be
+        # joined for the same time (default 0.3 s) at any frame rate
+        self.gestures = GestureEngine(gestures if gestures is not None else start_gestures())
+        
+        # Sticky classification of this player's pose (see HysteresisClassifier)
+        self.classifier = classifier if classifier is not None else HysteresisClassifier()
+        
+        # Key presses are sent from a background thread so the frame loop never waits on them
+        if dispatcher is None:
+            dispatcher = KeyDispatcher(key_interval=self.key_delay).start()
+        self.dispatcher = dispatcher
     
     def is_game_started(self):
         """Return whether the game has started."""
         return self.game_started
     
+    def close(self):
+        """Stop the key dispatcher thread."""
+        self.dispatcher.stop()
+    
     def move_left(self):
         """Press left arrow key and update position index."""
-        # pyautogui.press('left')
-        sleep(self.key_delay)
+        self.dispatcher.press(self.keys['left'], channel='horizontal', origin_timestamp=self.frame_timestamp)
         self.x_pos_index -= 1
     
     def move_right(self):
         """Press right arrow key and update position index."""
-        # pyautogui.press('right')
-        sleep(self.key_delay)
+        self.dispatcher.press(self.keys['right'], channel='horizontal', origin_timestamp=self.frame_timestamp)
         self.x_pos_index += 1
     
     def jump(self):
         """Press up arrow key and update position index."""
-        pyautogui.press('up')
-        print("Jump")
-        sleep(self.key_delay)
+        self.dispatcher.press(self.keys['up'], channel='vertical', origin_timestamp=self.frame_timestamp)
+        if self.verbose:
+            print("Jump")
         self.y_pos_index += 1
     
     def crouch(self):
         """Press down arrow key and update position index."""
-        pyautogui.press('down')
-        print("Crouch")
-        sleep(self.key_delay)
+        self.dispatcher.press(self.keys['down'], channel='vertical', origin_timestamp=self.frame_timestamp)
+        if self.verbose:
+            print("Crouch")
         self.y_pos_index -= 1
     
     def stand(self):
@@ -52,20 +71,19 @@ class GameController:
     
     def press_space(self):
         """Press space key."""
-        pyautogui.press('space')
-        sleep(self.key_delay)
+        self.dispatcher.press(self.keys['start'])
     
-    def increment_counter(self):
-        """Increment counter for hands joined detection."""
-        self.counter += 1
+    def classify(self, landmarks):
+        """
+        Classify a frame's pose with this player's hysteresis state.
         
-    def reset_counter(self):
-        """Reset counter for hands joined detection."""
-        self.counter = 0
-    
-    def should_start_game(self):
-        """Check if the counter has reached the threshold to start the game."""
-        return self.counter == self.num_of_frames
+        Args:
+            landmarks: LandmarkFrame of the frame
+            
+        Returns:
+            Tuple of (hand status, horizontal position, shoulder midpoint x, posture, shoulder midpoint y)
+        """
+        return self.classifier.classify(landmarks)
     
     def start_game(self, left_y, right_y, frame_height):
         """
@@ -79,27 +97,16 @@ class GameController:
         self.game_started = True
         self.mid_y = abs(right_y + left_y) // 2
         
-        # Directly activate the game window in the main thread
+        # Queue activation of the game window, the click happens on the dispatcher thread
         if self.activate_window_needed:
             self._activate_game_window()
     
     def _activate_game_window(self):
         """Activate the game window and start the game."""
-        try:
-            # Get screen size
-            screen_width, screen_height = pyautogui.size()
-            
-            # Click near the center of the screen where the game likely is
-            pyautogui.click(x=screen_width//2, y=screen_height//2, button='left')
-            sleep(0.5)
-            
-            # Press space to start (many games use this)
-            pyautogui.press('space')
-            
-            self.activate_window_needed = False
-        except Exception as e:
-            # Log the error but continue execution
-            print(f"Error activating game window: {e}")
+        # Click near the center of the screen where the game likely is,
+        # then press space to start (many games use this)
+        self.dispatcher.activate_window(self.keys['start'])
+        self.activate_window_needed = False
     
     def process_horizontal_position(self, horizontal_position):
         """
@@ -131,17 +138,55 @@ class GameController:
         
         # Jump if top position detected and not already jumping
         if posture == 'Top' and self.y_pos_index != 2:
-            pyautogui.press('up')
-            print("Jump")
-            sleep(self.key_delay)
+            self.dispatcher.press(self.keys['up'], channel='vertical', origin_timestamp=self.frame_timestamp)
+            if self.verbose:
+                print("Jump")
             self.y_pos_index = 2
         # Crouch if bottom position detected and not already crouching
         elif posture == 'Bottom' and self.y_pos_index != 0:
-            pyautogui.press('down')
-            print("Crouch")
-            sleep(self.key_delay)
+            self.dispatcher.press(self.keys['down'], channel='vertical', origin_timestamp=self.frame_timestamp)
+            if self.verbose:
+                print("Crouch")
             self.y_pos_index = 0
         # Stand if middle position detected and not already standing
         elif posture == 'Middle':
             self.y_pos_index = 1
-            # No key press needed for middle position
\ No newline at end of file
+            # No key press needed for middle position
+    
+    def update(self, landmarks, hand_status, horizontal_position, posture):
+        """
+        Update game state and queue key presses for one classified frame.
+        
+        Args:
+            landmarks: LandmarkFrame of the frame, or None if no person was detected
+            hand_status: Hands joined status ('Hands Joined', 'Hands Not Joined')
+            horizontal_position: Current horizontal position ('Left', 'Center', 'Right')
+            posture: Current vertical posture ('Top', 'Middle', 'Bottom')
+        """
+        if landmarks is None:
+            # Losing the player interrupts any gesture in progress, and the next person
+            # is classified without the sticky labels of the last one
+            self.gestures.reset()
+            self.classifier.reset()
+            return
+        
+        # Key presses queued below are attributed to this frame's capture time
+        self.frame_timestamp = landmarks.timestamp
+        
+        if self.game_started:
+            # Process horizontal movement
+            self.process_horizontal_position(horizontal_position)
+            
+            # Process vertical movement if mid_y is set
+            if self.mid_y:
+                self.process_vertical_position(posture)
+        
+        fired = self.gestures.update(landmarks.timestamp, {
+            'hands': hand_status, 'horizontal': horizontal_position, 'posture': posture})
+        
+        # Start the game once the hands have been joined long enough
+        if 'start' in fired and not self.game_started:
+            # Get shoulder coordinates to calculate mid_y
+            left_y = int(landmarks.data[RIGHT_SHOULDER, Y] * landmarks.height)
+            right_y = int(landmarks.data[LEFT_SHOULDER, Y] * landmarks.height)
+            self.start_game(left_y, right_y, landmarks.height)
@@ -0,0 +1,255 @@
+# gestures.py
+# Time-based gesture recognition and pose classification with hysteresis
+#
+# Gestures are declared as conditions on the classified pose state, e.g.
+# "hands joined for 0.3 s". They are evaluated against the capture timestamps
+# of the frames, so a gesture takes the same time to recognize at any frame
+# rate, including when frames are dropped or skipped.
+
+from landmarks import (
+    HAND_STATUSES, HORIZONTAL_POSITIONS, VERTICAL_POSTURES, HANDS_JOINED_THRESHOLD,
+    classify_hands_joined, classify_position_horizontal, classify_position_vertical, shoulder_width_batch
+)
+
+# Wrist distance must rise this much above the threshold before joined hands count as apart again
+HANDS_EXIT_RATIO = 1.2
+
+# Distance past a grid line, as a fraction of the frame size, needed to change column or row
+POSITION_MARGIN = 0.02
+
+
+class Gesture:
+    """
+    A condition on the pose state that fires an event.
+
+    The condition is a dictionary of state values that must all match, e.g.
+    {'hands': 'Hands Joined'}. After firing, the gesture stays quiet for
+    cooldown seconds.
+    """
+    def __init__(self, name, when, cooldown=0.0):
+        """
+        Args:
+            name: Event name returned when the gesture fires
+            when: Dictionary of state key -> required value
+            cooldown: Minimum time in seconds between two firings
+        """
+        self.name = name
+        self.when = when
+        self.cooldown = cooldown
+        self._active_since = None  # timestamp the condition became true, None while false
+        self._fired = False        # fired during the current activation
+        self._last_fired = None
+
+    def matches(self, state):
+        """Return whether the state satisfies the condition."""
+        return all(state.get(key) == value for key, value in self.when.items())
+
+    def reset(self):
+        """Treat the condition as false, e.g. while nobody is detected"""
+        self._active_since = None
+        self._fired = False
+
+    def update(self, timestamp, state):
+        """
+        Evaluate the gesture for one frame
+
+        Args:
+            timestamp: Capture time of the frame in seconds
+            state: Dictionary with the frame's classified pose
+
+        Returns:
+            True if the gesture fires on this frame
+        """
+        if not self.matches(state):
+            self.reset()
+            return False
+        if self._active_since is None:
+            self._active_since = timestamp
+        if self._fired or not self._ready(timestamp):
+            return False
+        if self._cooling_down(timestamp):
+            return False
+        self._fired = True
+        self._last_fired = timestamp
+        return True
+
+    def _ready(self, timestamp):
+        """Return whether the active condition fires at this time (edge: immediately)."""
+        return True
+
+    def _cooling_down(self, timestamp):
+        """Return whether the gesture fired less than cooldown seconds ago."""
+        return self._last_fired is not None and timestamp - self._last_fired < self.cooldown
+
+
+class EdgeGesture(Gesture):
+    """Fire when the condition becomes true (unless cooling down)"""
+    def _ready(self, timestamp):
+        return timestamp == self._active_since
+
+
+class HoldGesture(Gesture):
+    """Fire once when the condition has been true for hold seconds without interruption"""
+    def __init__(self, name, when, hold, cooldown=0.0):
+        """
+        Args:
+            name: Event name returned when the gesture fires
+            when: Dictionary of state key -> required value
+            hold: Time in seconds the condition must hold
+            cooldown: Minimum time in seconds between two firings
+        """
+        super().__init__(name, when, cooldown)
+        self.hold = hold
+
+    def _ready(self, timestamp):
+        return timestamp - self._active_since >= self.hold
+
+    def progress(self, timestamp):
+        """Return how far the hold has progressed, from 0 to 1."""
+        if self._active_since is None:
+            return 0.0
+        return min(1.0, (timestamp - self._active_since) / self.hold) if self.hold > 0 else 1.0
+
+
+class GestureEngine:
+    """Evaluate a set of gestures on every classified frame"""
+    def __init__(self, gestures):
+        self.gestures = {gesture.name: gesture for gesture in gestures}
+
+    def update(self, timestamp, state):
+        """
+        Evaluate every gesture for one frame
+
+        Args:
+            timestamp: Capture time of the frame in seconds
+            state: Dictionary with the frame's classified pose ('hands', 'horizontal', 'posture')
+
+        Returns:
+            List of names of the gestures that fired
+        """
+        return [name for name, gesture in self.gestures.items() if gesture.update(timestamp, state)]
+
+    def reset(self):
+        """Interrupt every gesture, e.g. while nobody is detected"""
+        for gesture in self.gestures.values():
+            gesture.reset()
+
+
+def start_gestures(hold=0.3):
+    """Return the default gestures: hands joined for hold seconds starts the game."""
+    return (HoldGesture('start', {'hands': 'Hands Joined'}, hold=hold, cooldown=1.0),)
+
+
+def _index_with_hysteresis(value, current, bounds, margin):
+    """Return the grid cell of value, leaving the current cell only once value is margin past its edge."""
+    if current is None:
+        return (value >= bounds[0]) + (value >= bounds[1])
+    index = current
+    while index < 2 and value >= bounds[index] + margin:
+        index += 1
+    while index > 0 and value < bounds[index - 1] - margin:
+        index -= 1
+    return index
+
+
+class HysteresisClassifier:
+    """
+    Classify hands, column and row like the landmarks classifiers, but sticky.
+
+    Hands count as joined below threshold and as apart again only above
+    threshold * exit_ratio. The column and row only change once the shoulder
+    midpoint is margin (a fraction of the frame size) past the grid line, so
+    jitter around a line does not flip the label back and forth.
+
+    With hands_ratio (from a calibrated ThresholdProfile) the threshold is
+    body-relative: hands_ratio times the shoulder width of each frame, so it
+    holds at any capture resolution and distance from the camera. Grid lines
+    given as fractions of the frame size are resolution-independent as well.
+    """
+    def __init__(self, threshold=HANDS_JOINED_THRESHOLD, exit_ratio=HANDS_EXIT_RATIO, margin=POSITION_MARGIN,
+                 column_bounds=None, row_bounds=None, hands_ratio=None, column_fractions=None,
+                 row_fractions=None):
+        """
+        Args:
+            threshold: Wrist distance in pixels below which hands become joined
+            exit_ratio: Factor of threshold above which joined hands become apart
+            margin: Distance past a grid line needed to change cell, as a fraction of the frame size
+            column_bounds: Optional (left, right) column boundaries in pixels (default: thirds of the width)
+            row_bounds: Optional (top, bottom) row boundaries in pixels (default: thirds of the height)
+            hands_ratio: Optional wrist distance in shoulder widths below which hands become joined
+                         (replaces threshold)
+            column_fractions: Optional (left, right) column boundaries as fractions of the width
+            row_fractions: Optional (top, bottom) row boundaries as fractions of the height
+        """
+        self.threshold = threshold
+        self.exit_ratio = exit_ratio
+        self.margin = margin
+        self.column_bounds = column_bounds
+        self.row_bounds = row_bounds
+        self.hands_ratio = hands_ratio
+        self.column_fractions = column_fractions
+        self.row_fractions = row_fractions
+        self.reset()
+
+    def reset(self):
+        """Forget the current labels, the next frame is classified without hysteresis"""
+        self._joined = None
+        self._column = None
+        self._row = None
+
+    def grid_bounds(self, width, height):
+        """Return the (left, right) column and (top, bottom) row boundaries in pixels for a frame size."""
+        if self.column_bounds:
+            column_bounds = self.column_bounds
+        elif self.column_fractions:
+            column_bounds = tuple(int(fraction * width) for fraction in self.column_fractions)
+        else:
+            column_bounds = (width // 3, 2 * (width // 3))
+        if self.row_bounds:
+            row_bounds = self.row_bounds
+        elif self.row_fractions:
+            row_bounds = tuple(int(fraction * height) for fraction in self.row_fractions)
+        else:
+            row_bounds = (height // 3, 2 * (height // 3))
+        return column_bounds, row_bounds
+
+    def classify_values(self, distance, mid_x, mid_y, width, height, shoulder_width=None):
+        """
+        Classify from precomputed wrist distance and shoulder midpoint (e.g. from the batch classifiers)
+
+        Args:
+            shoulder_width: Shoulder distance in pixels, needed with hands_ratio
+
+        Returns:
+            Tuple of (hand status, horizontal position, posture)
+        """
+        threshold = self.threshold if self.hands_ratio is None else self.hands_ratio * shoulder_width
+        if self._joined:
+            threshold *= self.exit_ratio
+        self._joined = bool(distance < threshold)
+
+        column_bounds, row_bounds = self.grid_bounds(width, height)
+        self._column = int(_index_with_hysteresis(mid_x, self._column, column_bounds, self.margin * width))
+        self._row = int(_index_with_hysteresis(mid_y, self._row, row_bounds, self.margin * height))
+        return HAND_STATUSES[self._joined], HORIZONTAL_POSITIONS[self._column], VERTICAL_POSTURES[self._row]
+
+    def classify(self, landmarks):
+        """
+        Classify one frame
+
+        Args:
+            landmarks: LandmarkFrame
+
+        Returns:
+            Tuple of (hand status, horizontal position, shoulder midpoint x, posture, shoulder midpoint y)
+        """
+        column_bounds, row_bounds = self.grid_bounds(landmarks.width, landmarks.height)
+        _, distance = classify_hands_joined(landmarks, self.threshold)
+        _, mid_x = classify_position_horizontal(landmarks, column_bounds)
+        _, mid_y = classify_position_vertical(landmarks, row_bounds)
+        shoulder_width = None
+        if self.hands_ratio is not None:
+            shoulder_width = float(shoulder_width_batch(landmarks.data, landmarks.width, landmarks.height))
+        hand_status, horizontal_position, posture = self.classify_values(
+            distance, mid_x, mid_y, landmarks.width, landmarks.height, shoulder_width)
+        return hand_status, horizontal_position, mid_x, posture, mid_y
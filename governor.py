@@ -0,0 +1,146 @@
+# governor.py
+# Adapt model complexity, inference resolution and frame skipping to a latency budget
+
+from pose_detection import get_pose_engine, RoiPoseTracker
+
+
+class QualityLevel:
+    """One combination of inference settings the governor can switch to"""
+    __slots__ = ('model_complexity', 'inference_size', 'search_size', 'frame_skip')
+
+    def __init__(self, model_complexity, inference_size, search_size, frame_skip):
+        self.model_complexity = model_complexity  # pose landmark model (0, 1 or 2)
+        self.inference_size = inference_size      # longest crop side around the player (None: full resolution)
+        self.search_size = search_size            # longest frame side when searching (None: full resolution)
+        self.frame_skip = frame_skip              # run inference on every n-th frame
+
+    def __str__(self):
+        return (f'complexity {self.model_complexity}, size {self.inference_size or "full"}/'
+                f'{self.search_size or "full"}, every {self.frame_skip} frame(s)')
+
+
+# Ordered from cheapest to most accurate
+QUALITY_LEVELS = (
+    QualityLevel(0, 160, 320, 2),
+    QualityLevel(0, 192, 480, 1),
+    QualityLevel(0, 256, 640, 1),
+    QualityLevel(1, 256, 640, 1),
+    QualityLevel(1, None, None, 1),
+    QualityLevel(2, None, None, 1),
+)
+
+
+class QualityGovernor:
+    """
+    Pose engine that steps between quality levels to stay within a frame budget.
+
+    It is used in place of a pose object (it has the same process() method) and
+    is told the measured time of every frame through observe(). Frame times are
+    averaged over a window; the level drops after down_after windows over budget
+    and rises after up_after windows comfortably under it (below
+    budget * headroom). Every change starts a fresh window, which together with
+    the asymmetric counts keeps the level from oscillating.
+    """
+    def __init__(self, budget, levels=QUALITY_LEVELS, start_level=4, window=30, down_after=2, up_after=5,
+                 headroom=0.7):
+        """
+        Args:
+            budget: Target time per frame in seconds
+            levels: Quality levels ordered from cheapest to most accurate
+            start_level: Index of the level to start at
+            window: Number of frames averaged per evaluation
+            down_after: Consecutive windows over budget before lowering the level
+            up_after: Consecutive windows under budget * headroom before raising the level
+            headroom: Fraction of the budget a window must stay under to count towards raising
+        """
+        self.budget = budget
+        self.levels = levels
+        self.window = window
+        self.down_after = down_after
+        self.up_after = up_after
+        self.headroom = headroom
+
+        self.changes = 0
+        self._unavailable = set()      # model complexities whose graph could not be built
+        self._frame_times = []
+        self._over = 0
+        self._under = 0
+        self._frame_index = 0
+        self._last_results = None
+        self._set_level(start_level)
+
+    def _set_level(self, index):
+        """Switch to a quality level, reusing Pose graphs built for earlier levels."""
+        self.level_index = index
+        self.level = level = self.levels[index]
+        pose = get_pose_engine('video', level.model_complexity)
+        self.tracker = RoiPoseTracker(pose, inference_size=level.inference_size, search_size=level.search_size)
+
+    def process(self, image_rgb):
+        """
+        Detect pose landmarks at the current quality level
+
+        Args:
+            image_rgb: Full RGB frame
+
+        Returns:
+            Pose detection results; on skipped frames the previous results are returned
+        """
+        self._frame_index += 1
+        if self._last_results is not None and self._frame_index % self.level.frame_skip:
+            return self._last_results
+        self._last_results = self.tracker.process(image_rgb)
+        return self._last_results
+
+    def observe(self, frame_time):
+        """
+        Record the processing time of a frame and adjust the quality level if needed
+
+        Args:
+            frame_time: Time spent on the frame in seconds
+        """
+        self._frame_times.append(frame_time)
+        if len(self._frame_times) < self.window:
+            return
+
+        mean = sum(self._frame_times) / len(self._frame_times)
+        self._frame_times.clear()
+
+        if mean > self.budget:
+            self._over += 1
+            self._under = 0
+        elif mean < self.budget * self.headroom:
+            self._under += 1
+            self._over = 0
+        else:
+            self._over = self._under = 0
+
+        if self._over >= self.down_after:
+            self._change(-1, mean)
+        elif self._under >= self.up_after:
+            self._change(1, mean)
+
+    def _change(self, step, mean):
+        """Move one usable level down (-1) or up (1), log the change and start a new evaluation period."""
+        self._over = self._under = 0
+        previous = self.level_index
+        index = previous + step
+        while 0 <= index < len(self.levels):
+            if self.levels[index].model_complexity in self._unavailable:
+                index += step
+                continue
+            try:
+                self._set_level(index)
+                break
+            except Exception as e:
+                # e.g. the model file could not be downloaded, never try this complexity again
+                print(f"[governor] cannot use level {index}: {e}")
+                self._unavailable.add(self.levels[index].model_complexity)
+                self._set_level(previous)
+        else:
+            return
+
+        self._last_results = None
+        self.changes += 1
+        print(f"[governor] level {previous} -> {index} ({self.level}): "
+              f"mean frame time {mean * 1000:.1f} ms, budget {self.budget * 1000:.1f} ms")
@@ -0,0 +1,240 @@
+# inference_pool.py
+# Pipelined pose inference on a pool of worker processes sharing frame buffers
+#
+# Frames are copied into a ring of slots in one multiprocessing.shared_memory
+# block, so only a small task tuple travels to the workers. Each worker owns
+# its own Pose graph and sends back the landmarks as a (33, 4) array. Results
+# are released strictly in submission order, so the classifiers and the
+# GameController see the same sequence of frames as in the single-threaded loop.
+
+import multiprocessing
+import queue
+import signal
+from collections import deque
+from multiprocessing import shared_memory
+from time import perf_counter
+
+import numpy as np
+
+from telemetry import RollingStats
+
+# Task sent to stop a worker
+_STOP = None
+
+
+def _worker(shm_name, ring_size, shape, model_complexity, tasks, results):
+    """
+    Worker process: run pose inference on frames in the shared ring
+
+    Args:
+        shm_name: Name of the shared memory block holding the ring
+        ring_size: Number of frame slots in the ring
+        shape: Shape (height, width, 3) of every frame
+        model_complexity: Pose landmark model complexity
+        tasks: Queue of (index, slot) tasks
+        results: Queue receiving (index, slot, landmarks array or None)
+    """
+    # Ctrl+C reaches the whole process group; the parent stops the workers in close()
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    # Imported here so only the workers load MediaPipe when the pool is created first
+    from pose_detection import create_pose_video
+
+    # Results still queued when the pool closes may be lost rather than blocking exit
+    results.cancel_join_thread()
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        frames = np.ndarray((ring_size,) + shape, dtype=np.uint8, buffer=shm.buf)
+        pose = create_pose_video(model_complexity)
+
+        # Warm up the graph before the first real frame arrives
+        pose.process(np.zeros(shape, dtype=np.uint8))
+
+        while True:
+            task = tasks.get()
+            if task is _STOP:
+                break
+            index, slot = task
+            try:
+                landmarks = pose.process(frames[slot]).pose_landmarks
+            except Exception as e:
+                print(f"Error in inference worker: {e}")
+                landmarks = None
+            data = None
+            if landmarks:
+                data = np.array([(landmark.x, landmark.y, landmark.z, landmark.visibility)
+                                 for landmark in landmarks.landmark], dtype=np.float32)
+            results.put((index, slot, data))
+        pose.close()
+    finally:
+        # Drop the array view before closing, the buffer cannot be closed while exported
+        frames = None
+        shm.close()
+
+
+class InferencePool:
+    """
+    Run pose inference for a stream of frames on several worker processes.
+
+    submit() copies an RGB frame into a free slot of the shared ring and hands
+    it to the next idle worker; it returns False (and the frame is dropped) when
+    every slot is still in flight, like the capture thread drops stale frames.
+    collect() returns the finished results in submission order; a result that
+    arrives before an earlier one waits in the reorder buffer. A worker that
+    dies would never return its frames, so collect() raises RuntimeError then.
+    """
+    def __init__(self, num_workers=2, ring_size=None, model_complexity=1, window=300):
+        """
+        Args:
+            num_workers: Number of worker processes, each with its own Pose graph
+            ring_size: Number of shared frame slots (default: 2 per worker)
+            model_complexity: Pose landmark model complexity
+            window: Number of samples kept for the latency statistics
+        """
+        self.num_workers = num_workers
+        self.ring_size = ring_size or 2 * num_workers
+        self.model_complexity = model_complexity
+
+        self.submitted = 0
+        self.completed = 0
+        self.dropped = 0
+        self.reordered = 0                         # results that arrived before an earlier frame's
+        self.inference_latency = RollingStats(window)  # submit -> result received
+        self.reorder_latency = RollingStats(window)    # result received -> released in order
+
+        self._context = multiprocessing.get_context('spawn')
+        self._shm = None
+        self._frames = None
+        self._shape = None
+        self._workers = []
+        self._tasks = None
+        self._results = None
+        self._free_slots = deque(range(self.ring_size))
+        self._pending = {}   # index -> (slot, item, submitted_at)
+        self._finished = {}  # index -> (item, data, received_at, submitted_at)
+        self._next_index = 0       # index given to the next submitted frame
+        self._next_release = 0     # index of the next frame to release in order
+
+    def _start(self, shape):
+        """Allocate the shared ring for frames of the given shape and start the workers."""
+        self._shape = shape
+        frame_bytes = int(np.prod(shape))
+        self._shm = shared_memory.SharedMemory(create=True, size=frame_bytes * self.ring_size)
+        self._frames = np.ndarray((self.ring_size,) + shape, dtype=np.uint8, buffer=self._shm.buf)
+        self._tasks = self._context.Queue()
+        self._results = self._context.Queue()
+        for i in range(self.num_workers):
+            worker = self._context.Process(
+                target=_worker, name=f'pose-worker-{i}', daemon=True,
+                args=(self._shm.name, self.ring_size, shape, self.model_complexity, self._tasks, self._results))
+            worker.start()
+            self._workers.append(worker)
+
+    def submit(self, image_rgb, item=None):
+        """
+        Queue a frame for inference
+
+        Args:
+            image_rgb: RGB frame (every frame must have the same shape)
+            item: Anything to hand back with the result, e.g. the frame to draw on
+
+        Returns:
+            True if the frame was queued, False if it was dropped because the ring is full
+        """
+        if self._shm is None:
+            self._start(image_rgb.shape)
+        elif image_rgb.shape != self._shape:
+            raise ValueError(f"Frame shape {image_rgb.shape} differs from the pool's {self._shape}")
+
+        if not self._free_slots:
+            self.dropped += 1
+            return False
+
+        slot = self._free_slots.popleft()
+        self._frames[slot] = image_rgb
+        index = self._next_index
+        self._next_index += 1
+        self._pending[index] = (slot, item, perf_counter())
+        self._tasks.put((index, slot))
+        self.submitted += 1
+        return True
+
+    def collect(self, timeout=0.0):
+        """
+        Receive finished results and release the ones that are next in order
+
+        Args:
+            timeout: Seconds to wait for the first result if none is ready to release
+
+        Returns:
+            List of (item, landmarks array or None, inference latency, reorder latency) in submission order
+        """
+        block = timeout > 0 and self._next_release not in self._finished
+        while self._pending:
+            try:
+                if block:
+                    index, slot, data = self._results.get(timeout=timeout)
+                    block = False
+                else:
+                    index, slot, data = self._results.get_nowait()
+            except queue.Empty:
+                self._check_workers()
+                break
+            received_at = perf_counter()
+            _, item, submitted_at = self._pending.pop(index)
+            self._free_slots.append(slot)
+            if index != self._next_release:
+                self.reordered += 1
+            self._finished[index] = (item, data, received_at, submitted_at)
+
+        released = []
+        now = perf_counter()
+        while self._next_release in self._finished:
+            item, data, received_at, submitted_at = self._finished.pop(self._next_release)
+            self._next_release += 1
+            self.completed += 1
+            self.inference_latency.add(received_at - submitted_at)
+            self.reorder_latency.add(now - received_at)
+            released.append((item, data, received_at - submitted_at, now - received_at))
+        return released
+
+    def _check_workers(self):
+        """Raise if a worker has exited, the frames it was given would never come back."""
+        for worker in self._workers:
+            if worker.exitcode is not None:
+                raise RuntimeError(f"Inference worker {worker.name} exited with code {worker.exitcode}")
+
+    def is_full(self):
+        """Return whether every frame slot is in flight, so the next submit() would drop its frame."""
+        return self._shm is not None and not self._free_slots
+
+    def queue_depth(self):
+        """Return the number of frames submitted but not yet released."""
+        return self._next_index - self._next_release
+
+    def stats(self):
+        """Return counters for telemetry reports."""
+        return {
+            'submitted': self.submitted,
+            'completed': self.completed,
+            'dropped': self.dropped,
+            'reordered': self.reordered,
+            'queue_depth': self.queue_depth(),
+            'reorder_ms_p95': round(self.reorder_latency.summary()['p95'] * 1000, 2),
+        }
+
+    def close(self):
+        """Stop the workers and free the shared ring"""
+        for _ in self._workers:
+            self._tasks.put(_STOP)
+        for worker in self._workers:
+            worker.join(timeout=2.0)
+            if worker.is_alive():
+                worker.terminate()
+        self._workers = []
+        if self._shm is not None:
+            self._frames = None
+            self._shm.close()
+            self._shm.unlink()
+            self._shm = None
@@ -0,0 +1,197 @@
+# input_backends.py
+# Input backends the key dispatcher injects key presses and clicks through
+#
+# Every backend has press(key) and click_center(). Key names are the ones the
+# game controller uses: 'left', 'right', 'up', 'down', 'space' and single
+# letters or digits.
+
+import shutil
+import subprocess
+import threading
+from time import perf_counter
+
+INPUT_BACKENDS = ('pyautogui', 'uinput', 'xdotool', 'none')
+
+# Key names that differ from the evdev KEY_* and X keysym names
+UINPUT_KEY_NAMES = {'esc': 'ESC', 'escape': 'ESC', 'return': 'ENTER', 'ctrl': 'LEFTCTRL', 'shift': 'LEFTSHIFT',
+                    'alt': 'LEFTALT'}
+XDOTOOL_KEY_NAMES = {'left': 'Left', 'right': 'Right', 'up': 'Up', 'down': 'Down', 'enter': 'Return',
+                     'esc': 'Escape'}
+
+# Range of the virtual absolute pointer's axes; the compositor maps it onto the whole screen
+UINPUT_POINTER_RANGE = 65535
+
+
+class PyAutoGUIBackend:
+    """Inject keyboard and mouse input through pyautogui"""
+    def __init__(self):
+        # Imported here so headless users of the dispatcher do not need a display
+        import pyautogui
+
+        # The dispatcher does its own pacing, pyautogui's 0.1 s pause per call is not needed
+        pyautogui.PAUSE = 0
+        self._pyautogui = pyautogui
+        # Several dispatchers (one per lane) may share the backend, pyautogui is not thread-safe
+        self._lock = threading.Lock()
+
+    def press(self, key):
+        """Press and release a key."""
+        with self._lock:
+            self._pyautogui.press(key)
+
+    def click_center(self):
+        """Click the center of the primary screen."""
+        with self._lock:
+            screen_width, screen_height = self._pyautogui.size()
+            self._pyautogui.click(x=screen_width//2, y=screen_height//2, button='left')
+
+
+class UinputBackend:
+    """
+    Inject input as a virtual Linux input device through uinput (python-evdev).
+
+    Events go straight into the kernel's input subsystem, so a key press costs
+    a few system calls (microseconds) and works under X11, Wayland and on the
+    console alike. Needs write access to /dev/uinput, e.g. membership of the
+    'input' group or a udev rule. Compositors may take a moment to pick up the
+    new device, so create the backend before the game starts.
+    """
+    def __init__(self, name='body-pose-game-controller'):
+        # Imported here so only users of this backend need python-evdev
+        from evdev import UInput, AbsInfo, ecodes
+
+        self._ecodes = ecodes
+        # The keyboard keys proper, mouse buttons go to a separate pointer device
+        keys = [code for code in ecodes.keys if ecodes.KEY_ESC <= code <= ecodes.KEY_MICMUTE]
+        self._keyboard = UInput({ecodes.EV_KEY: keys}, name=name)
+        axis = AbsInfo(value=0, min=0, max=UINPUT_POINTER_RANGE, fuzz=0, flat=0, resolution=0)
+        self._pointer = UInput({ecodes.EV_KEY: [ecodes.BTN_LEFT],
+                                ecodes.EV_ABS: [(ecodes.ABS_X, axis), (ecodes.ABS_Y, axis)]},
+                               name=f'{name}-pointer')
+        # Several dispatchers (one per lane) may share the backend
+        self._lock = threading.Lock()
+
+    def _code(self, key):
+        """Return the evdev key code of a key name."""
+        name = UINPUT_KEY_NAMES.get(key.lower(), key.upper())
+        return self._ecodes.ecodes[f'KEY_{name}']
+
+    def press(self, key):
+        """Press and release a key."""
+        code = self._code(key)
+        with self._lock:
+            self._keyboard.write(self._ecodes.EV_KEY, code, 1)
+            self._keyboard.syn()
+            self._keyboard.write(self._ecodes.EV_KEY, code, 0)
+            self._keyboard.syn()
+
+    def click_center(self):
+        """Click the center of the screen."""
+        ecodes = self._ecodes
+        with self._lock:
+            self._pointer.write(ecodes.EV_ABS, ecodes.ABS_X, UINPUT_POINTER_RANGE // 2)
+            self._pointer.write(ecodes.EV_ABS, ecodes.ABS_Y, UINPUT_POINTER_RANGE // 2)
+            self._pointer.syn()
+            self._pointer.write(ecodes.EV_KEY, ecodes.BTN_LEFT, 1)
+            self._pointer.syn()
+            self._pointer.write(ecodes.EV_KEY, ecodes.BTN_LEFT, 0)
+            self._pointer.syn()
+
+    def close(self):
+        """Remove the virtual devices"""
+        self._keyboard.close()
+        self._pointer.close()
+
+
+class XdotoolBackend:
+    """
+    Inject input into the X11 display through the xdotool command.
+
+    Every event starts an xdotool process (a few milliseconds), which runs on
+    the dispatcher thread, so the frame loop does not wait for it.
+    """
+    def __init__(self):
+        self._xdotool = shutil.which('xdotool')
+        if self._xdotool is None:
+            raise RuntimeError("xdotool not found, install it or choose another input backend")
+        # Several dispatchers (one per lane) may share the backend, their events must not interleave
+        self._lock = threading.Lock()
+
+    def _run(self, *args):
+        """Run one xdotool command, raising on failure."""
+        subprocess.run((self._xdotool,) + args, check=True, stdout=subprocess.PIPE, stderr=subprocess.PIPE)
+
+    def press(self, key):
+        """Press and release a key."""
+        with self._lock:
+            self._run('key', '--clearmodifiers', XDOTOOL_KEY_NAMES.get(key.lower(), key))
+
+    def click_center(self):
+        """Click the center of the screen."""
+        with self._lock:
+            geometry = subprocess.run((self._xdotool, 'getdisplaygeometry'), check=True, stdout=subprocess.PIPE,
+                                      text=True).stdout.split()
+            width, height = int(geometry[0]), int(geometry[1])
+            self._run('mousemove', str(width // 2), str(height // 2), 'click', '1')
+
+
+class NullBackend:
+    """Discard all input, for benchmarks and headless runs"""
+    def press(self, key):
+        """Ignore a key press."""
+
+    def click_center(self):
+        """Ignore a click."""
+
+
+class RecordingBackend:
+    """
+    Record input with the time it was injected instead of sending it.
+
+    Used with a KeyDispatcher, the recorded times include the dispatcher's
+    queueing and coalescing, so gesture-to-key latency can be measured exactly
+    as it would be with a real backend, without a display.
+    """
+    def __init__(self):
+        self.events = []  # (perf_counter() time, 'press' or 'click', key or None)
+        self._lock = threading.Lock()
+
+    def press(self, key):
+        """Record a key press."""
+        with self._lock:
+            self.events.append((perf_counter(), 'press', key))
+
+    def click_center(self):
+        """Record a click."""
+        with self._lock:
+            self.events.append((perf_counter(), 'click', None))
+
+    def key_counts(self):
+        """Return the number of presses of each key."""
+        with self._lock:
+            counts = {}
+            for _, action, key in self.events:
+                if action == 'press':
+                    counts[key] = counts.get(key, 0) + 1
+            return counts
+
+
+def create_backend(name):
+    """
+    Create an input backend by name
+
+    Args:
+        name: 'pyautogui', 'uinput', 'xdotool' or 'none'
+
+    Returns:
+        Input backend with press() and click_center()
+    """
+    if name == 'pyautogui':
+        return PyAutoGUIBackend()
+    if name == 'uinput':
+        return UinputBackend()
+    if name == 'xdotool':
+        return XdotoolBackend()
+    if name == 'none':
+        return NullBackend()
+    raise ValueError(f"Unknown input backend {name!r}, expected one of {', '.join(INPUT_BACKENDS)}")
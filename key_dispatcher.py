@@ -0,0 +1,198 @@
+# key_dispatcher.py
+# Send key presses from a background thread so the frame loop never blocks
+
+import threading
+from collections import deque
+from time import perf_counter, sleep
+
+# Backends are importable from here as before
+from input_backends import PyAutoGUIBackend, NullBackend, RecordingBackend
+
+
+class KeyIntent:
+    """A request to send input, waiting in the dispatcher queue"""
+    __slots__ = ('action', 'key', 'channel', 'enqueued_at', 'origin_timestamp')
+
+    def __init__(self, action, key, channel, enqueued_at, origin_timestamp=None):
+        self.action = action        # 'press' or 'activate'
+        self.key = key
+        self.channel = channel      # 'horizontal', 'vertical' or None
+        self.enqueued_at = enqueued_at
+        self.origin_timestamp = origin_timestamp  # capture time of the frame that caused it
+
+
+# Keys on the horizontal channel that undo each other while still queued
+OPPOSITE_KEYS = {'left': 'right', 'right': 'left'}
+
+
+class KeyDispatcher:
+    """
+    Background thread that injects queued key intents.
+
+    Pending intents are coalesced before they are sent:
+    - 'vertical' intents replace any vertical intent that has not been sent yet,
+      so a crouch queued behind an unsent jump replaces the jump.
+    - 'horizontal' intents cancel a pending move in the opposite direction.
+    - Intents without a channel are sent in order.
+    """
+    def __init__(self, backend=None, key_interval=0.0, activation_delay=0.5, history_size=1000, on_sent=None,
+                 opposite_keys=OPPOSITE_KEYS):
+        """
+        Args:
+            backend: Input backend with press() and click_center() (default: pyautogui, see input_backends.py)
+            key_interval: Minimum time in seconds between two injected events
+            activation_delay: Time to wait between clicking the game window and pressing space
+            history_size: Number of enqueue-to-sent latencies to keep
+            on_sent: Optional callback(origin_timestamp, sent_at) for intents with an origin timestamp
+            opposite_keys: Horizontal keys that cancel each other out while queued
+        """
+        self.backend = backend if backend is not None else PyAutoGUIBackend()
+        self.key_interval = key_interval
+        self.activation_delay = activation_delay
+        self.on_sent = on_sent
+        self.opposite_keys = opposite_keys
+
+        self.sent_count = 0
+        self.coalesced_count = 0
+        self.latencies = deque(maxlen=history_size)
+
+        self._pending = deque()
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._last_sent_at = 0.0
+
+    def start(self):
+        """Start the dispatcher thread"""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='key-dispatcher', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the dispatcher thread, discarding intents that were not sent"""
+        with self._condition:
+            self._running = False
+            self._pending.clear()
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def press(self, key, channel=None, origin_timestamp=None):
+        """
+        Queue a key press without blocking
+
+        Args:
+            key: Key name understood by the backend (e.g. 'up', 'space')
+            channel: Coalescing channel ('horizontal', 'vertical' or None)
+            origin_timestamp: Capture time of the frame that caused the press, for latency tracking
+        """
+        self._enqueue(KeyIntent('press', key, channel, perf_counter(), origin_timestamp))
+
+    def activate_window(self, key='space'):
+        """Queue a click on the game window followed by a key press (space by default)."""
+        self._enqueue(KeyIntent('activate', key, None, perf_counter()))
+
+    def _enqueue(self, intent):
+        """Add an intent to the queue, coalescing it with pending ones."""
+        with self._condition:
+            if intent.channel == 'vertical':
+                # Newer vertical intent supersedes whatever is still queued
+                kept = [pending for pending in self._pending if pending.channel != 'vertical']
+                self.coalesced_count += len(self._pending) - len(kept)
+                self._pending = deque(kept)
+
+            elif intent.channel == 'horizontal':
+                # A queued move in the opposite direction cancels out with this one
+                opposite = self.opposite_keys.get(intent.key)
+                for pending in reversed(self._pending):
+                    if pending.channel == 'horizontal' and pending.key == opposite:
+                        self._pending.remove(pending)
+                        self.coalesced_count += 2
+                        return
+
+            self._pending.append(intent)
+            self._condition.notify()
+
+    def pending_count(self):
+        """Return the number of intents waiting to be sent."""
+        with self._condition:
+            return len(self._pending)
+
+    def _run(self):
+        """Dispatch loop running on the background thread"""
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or not self._running)
+                if not self._running:
+                    return
+
+                # Respect the minimum interval between injected events
+                wait = self._last_sent_at + self.key_interval - perf_counter()
+                if wait > 0:
+                    # Release the lock while waiting so newer intents can still coalesce
+                    self._condition.wait(wait)
+                    continue
+
+                intent = self._pending.popleft()
+
+            self._send(intent)
+
+    def _send(self, intent):
+        """Inject a single intent through the backend."""
+        try:
+            if intent.action == 'activate':
+                self.backend.click_center()
+                sleep(self.activation_delay)
+            self.backend.press(intent.key)
+        except Exception as e:
+            # Log the error but keep the dispatcher alive
+            print(f"Error sending {intent.action} '{intent.key}': {e}")
+            return
+
+        self._last_sent_at = perf_counter()
+        self.sent_count += 1
+        self.latencies.append(self._last_sent_at - intent.enqueued_at)
+        if self.on_sent is not None and intent.origin_timestamp is not None:
+            self.on_sent(intent.origin_timestamp, self._last_sent_at)
+
+    def latency_stats(self):
+        """
+        Summarize recent enqueue-to-sent latencies
+
+        Returns:
+            Dictionary with count, mean and max latency in seconds
+        """
+        latencies = list(self.latencies)
+        if not latencies:
+            return {'count': 0, 'mean': 0.0, 'max': 0.0}
+        return {
+            'count': len(latencies),
+            'mean': sum(latencies) / len(latencies),
+            'max': max(latencies),
+        }
+
+
+class RecordingDispatcher:
+    """Record key intents synchronously instead of injecting them, for replays and tuning"""
+    def __init__(self):
+        self.events = []  # (origin timestamp, key) in the order the intents were made
+        self.sent_count = 0
+        self.coalesced_count = 0
+
+    def stop(self):
+        """Nothing to stop, kept for interface compatibility with KeyDispatcher."""
+
+    def press(self, key, channel=None, origin_timestamp=None):
+        """Record a key press."""
+        self.events.append((origin_timestamp, key))
+        self.sent_count += 1
+
+    def activate_window(self, key='space'):
+        """Record the game window activation."""
+        self.events.append((None, 'activate'))
+
+    def latency_stats(self):
+        """Return empty latency statistics, recorded intents are never delayed."""
+        return {'count': 0, 'mean': 0.0, 'max': 0.0}
@@ -0,0 +1,217 @@
+# landmark_filter.py
+# Smooth the landmark stream and extrapolate it slightly ahead in time
+#
+# The classifiers compare raw shoulder positions against fixed grid lines, so
+# a jump is only recognized once the shoulders have crossed a row and jitter
+# near a line makes the label flicker. The filters here smooth the x and y
+# coordinates of every landmark and add velocity * lead to the output, so a
+# fast movement crosses the line a little before the body does.
+
+import numpy as np
+
+from landmarks import LandmarkFrame, X, Y
+
+# Default time in seconds the filtered landmarks are extrapolated ahead
+DEFAULT_LEAD = 0.03
+
+# Longest gap in seconds between frames before the filter starts over
+MAX_GAP = 0.5
+
+
+class LandmarkFilter:
+    """
+    Base class of the landmark filters: tracks time between frames and restarts after gaps.
+
+    Subclasses implement _initialize(xy) and _step(xy, dt), both working on a
+    float64 (33, 2) array of normalized x, y coordinates, and return the
+    filtered position and velocity.
+    """
+    def __init__(self, lead=DEFAULT_LEAD):
+        """
+        Args:
+            lead: Time in seconds the output is extrapolated ahead using the estimated velocity
+        """
+        self.lead = lead
+        self._last_timestamp = None
+
+    def reset(self):
+        """Forget the filter state, the next frame starts a new track"""
+        self._last_timestamp = None
+
+    def apply(self, landmarks):
+        """
+        Filter one frame of landmarks
+
+        Args:
+            landmarks: LandmarkFrame, or None if no person was detected (restarts the filter)
+
+        Returns:
+            New LandmarkFrame with filtered x and y (z and visibility unchanged), or None
+        """
+        if landmarks is None:
+            self.reset()
+            return None
+
+        xy = landmarks.data[:, [X, Y]].astype(np.float64)
+        dt = None if self._last_timestamp is None else landmarks.timestamp - self._last_timestamp
+        if dt is None or dt <= 0 or dt > MAX_GAP:
+            position, velocity = self._initialize(xy)
+        else:
+            position, velocity = self._step(xy, dt)
+        self._last_timestamp = landmarks.timestamp
+
+        data = landmarks.data.copy()
+        data[:, [X, Y]] = position + velocity * self.lead
+        return LandmarkFrame(data, landmarks.timestamp, landmarks.width, landmarks.height)
+
+    def _initialize(self, xy):
+        raise NotImplementedError
+
+    def _step(self, xy, dt):
+        raise NotImplementedError
+
+
+class OneEuroFilter(LandmarkFilter):
+    """
+    One Euro filter (Casiez et al. 2012) applied to every coordinate at once.
+
+    A low-pass filter whose cutoff frequency rises with the speed of the
+    signal: slow movements are smoothed heavily, fast ones pass with little lag.
+    """
+    def __init__(self, min_cutoff=1.0, beta=5.0, derivative_cutoff=1.0, lead=DEFAULT_LEAD):
+        """
+        Args:
+            min_cutoff: Cutoff frequency in Hz at rest (lower smooths more)
+            beta: Increase of the cutoff per unit of speed (normalized coordinates per second)
+            derivative_cutoff: Cutoff frequency in Hz for the velocity estimate
+            lead: Time in seconds the output is extrapolated ahead
+        """
+        super().__init__(lead)
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.derivative_cutoff = derivative_cutoff
+        self._position = None
+        self._velocity = None
+
+    @staticmethod
+    def _alpha(cutoff, dt):
+        """Smoothing factor of an exponential filter with the given cutoff frequency (scalar or array) and time step."""
+        return 1.0 / (1.0 + 1.0 / (2 * np.pi * cutoff * dt))
+
+    def _initialize(self, xy):
+        self._position = xy
+        self._velocity = np.zeros_like(xy)
+        return self._position, self._velocity
+
+    def _step(self, xy, dt):
+        # Smoothed velocity drives the cutoff of the position filter
+        raw_velocity = (xy - self._position) / dt
+        a = self._alpha(self.derivative_cutoff, dt)
+        self._velocity = a * raw_velocity + (1 - a) * self._velocity
+
+        cutoff = self.min_cutoff + self.beta * np.abs(self._velocity)
+        a = self._alpha(cutoff, dt)
+        self._position = a * xy + (1 - a) * self._position
+        return self._position, self._velocity
+
+
+class KalmanFilter(LandmarkFilter):
+    """
+    Constant-velocity Kalman filter, run independently for every coordinate.
+
+    The state of each coordinate is its position and velocity; the 2x2
+    covariances are kept as three arrays so all coordinates update together.
+    """
+    def __init__(self, process_noise=50.0, measurement_noise=1e-5, lead=DEFAULT_LEAD):
+        """
+        Args:
+            process_noise: Variance of the unmodelled acceleration (higher follows changes faster)
+            measurement_noise: Variance of the measured coordinates (higher smooths more)
+            lead: Time in seconds the output is extrapolated ahead
+        """
+        super().__init__(lead)
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self._position = None
+        self._velocity = None
+        self._p00 = self._p01 = self._p11 = None
+
+    def _initialize(self, xy):
+        self._position = xy
+        self._velocity = np.zeros_like(xy)
+        # Covariance [[p00, p01], [p01, p11]]: position known, velocity unknown
+        self._p00 = np.full_like(xy, self.measurement_noise)
+        self._p01 = np.zeros_like(xy)
+        self._p11 = np.full_like(xy, 1.0)
+        return self._position, self._velocity
+
+    def _step(self, xy, dt):
+        q = self.process_noise
+
+        # Predict with constant velocity
+        position = self._position + self._velocity * dt
+        p00 = self._p00 + dt * (2 * self._p01 + dt * self._p11) + q * dt ** 4 / 4
+        p01 = self._p01 + dt * self._p11 + q * dt ** 3 / 2
+        p11 = self._p11 + q * dt ** 2
+
+        # Update with the measured position
+        gain0 = p00 / (p00 + self.measurement_noise)
+        gain1 = p01 / (p00 + self.measurement_noise)
+        innovation = xy - position
+        self._position = position + gain0 * innovation
+        self._velocity = self._velocity + gain1 * innovation
+        self._p00 = (1 - gain0) * p00
+        self._p01 = (1 - gain0) * p01
+        self._p11 = p11 - gain1 * p01
+        return self._position, self._velocity
+
+
+# Filters selectable by name, e.g. from the command line
+FILTERS = {
+    'one_euro': OneEuroFilter,
+    'kalman': KalmanFilter,
+}
+
+
+def create_filter(name, **params):
+    """
+    Create a landmark filter by name
+
+    Args:
+        name: 'none', 'one_euro' or 'kalman'
+        **params: Keyword arguments for the filter class (e.g. lead, beta)
+
+    Returns:
+        LandmarkFilter, or None for 'none'
+    """
+    if name in (None, 'none'):
+        return None
+    if name not in FILTERS:
+        raise ValueError(f"Unknown landmark filter: {name}")
+    return FILTERS[name](**params)
+
+
+def filter_stack(stack, timestamps, valid, landmark_filter, width=0, height=0):
+    """
+    Run a filter over a whole recorded landmark stack
+
+    Args:
+        stack: Landmark array of shape (N, 33, 4), NaN where nobody was detected
+        timestamps: Capture times of the frames, shape (N,)
+        valid: Boolean array of frames with a person, shape (N,)
+        landmark_filter: LandmarkFilter to apply
+        width: Frame width passed through to the frames
+        height: Frame height passed through to the frames
+
+    Returns:
+        New (N, 33, 4) array with the filtered landmarks
+    """
+    filtered = np.array(stack, dtype=np.float32)
+    landmark_filter.reset()
+    for index in range(len(filtered)):
+        if not valid[index]:
+            landmark_filter.apply(None)
+            continue
+        frame = LandmarkFrame(filtered[index], float(timestamps[index]), width, height)
+        filtered[index] = landmark_filter.apply(frame).data
+    return filtered
@@ -0,0 +1,119 @@
+# landmark_recording.py
+# Record the landmark stream of a session to a compact binary file and replay it
+#
+# File layout (little endian):
+#   header:  magic b'BPLM', version (uint32), frame width (uint32), frame height (uint32)
+#   records: timestamp (float64) followed by 33 x 4 float32 landmarks (x, y, z, visibility)
+# Frames without a detected person are stored with NaN landmarks. The record
+# count follows from the file size, so a recording that was cut off is still readable.
+
+import struct
+from time import perf_counter, sleep
+
+import numpy as np
+
+from landmarks import LandmarkFrame, NUM_LANDMARKS
+
+MAGIC = b'BPLM'
+VERSION = 1
+HEADER = struct.Struct('<4sIII')
+RECORD_DTYPE = np.dtype([('timestamp', '<f8'), ('landmarks', '<f4', (NUM_LANDMARKS, 4))])
+
+
+class LandmarkRecorder:
+    """Append each frame's landmarks to a recording file"""
+    def __init__(self, path):
+        self.path = path
+        self.frames = 0
+        self._file = None
+        self._record = np.zeros(1, dtype=RECORD_DTYPE)  # reused for every frame
+
+    def write(self, landmarks, timestamp, width, height):
+        """
+        Append one frame to the recording
+
+        Args:
+            landmarks: LandmarkFrame, or None if no person was detected
+            timestamp: Capture time of the frame
+            width: Frame width in pixels
+            height: Frame height in pixels
+        """
+        if self._file is None:
+            # The header is written with the size of the first frame
+            self._file = open(self.path, 'wb')
+            self._file.write(HEADER.pack(MAGIC, VERSION, width, height))
+
+        self._record['timestamp'] = timestamp
+        if landmarks is None:
+            self._record['landmarks'] = np.nan
+        else:
+            self._record['landmarks'] = landmarks.data
+        self._file.write(self._record.tobytes())
+        self.frames += 1
+
+    def close(self):
+        """Flush and close the recording file"""
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class LandmarkRecording:
+    """Memory-mapped view of a recording file"""
+    def __init__(self, path):
+        with open(path, 'rb') as f:
+            magic, version, self.width, self.height = HEADER.unpack(f.read(HEADER.size))
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a landmark recording (version {VERSION})")
+
+        self.path = path
+        records = np.memmap(path, dtype=np.uint8, mode='r', offset=HEADER.size)
+
+        # Ignore a partially written last record
+        count = len(records) // RECORD_DTYPE.itemsize
+        self.records = records[:count * RECORD_DTYPE.itemsize].view(RECORD_DTYPE)
+
+        self.timestamps = self.records['timestamp']  # shape (N,)
+        self.landmarks = self.records['landmarks']   # shape (N, 33, 4), NaN where nobody was detected
+        self.valid = ~np.isnan(self.landmarks[:, 0, 0])
+
+    def __len__(self):
+        return len(self.records)
+
+    def duration(self):
+        """Return the recorded time span in seconds."""
+        return float(self.timestamps[-1] - self.timestamps[0]) if len(self) > 1 else 0.0
+
+    def frame(self, index):
+        """Return frame index as a LandmarkFrame, or None if nobody was detected."""
+        if not self.valid[index]:
+            return None
+        return LandmarkFrame(self.landmarks[index], float(self.timestamps[index]), self.width, self.height)
+
+
+class LandmarkReplay:
+    """
+    Iterate over a recording as (timestamp, LandmarkFrame or None) pairs.
+
+    With speed=None frames are produced as fast as they are consumed; otherwise
+    the original frame timing is reproduced, scaled by speed (2.0 replays twice
+    as fast).
+    """
+    def __init__(self, recording, speed=None):
+        self.recording = recording
+        self.speed = speed
+
+    def __iter__(self):
+        recording = self.recording
+        if len(recording) == 0:
+            return
+        first_timestamp = float(recording.timestamps[0])
+        start = perf_counter()
+
+        for index in range(len(recording)):
+            timestamp = float(recording.timestamps[index])
+            if self.speed is not None:
+                wait = (timestamp - first_timestamp) / self.speed - (perf_counter() - start)
+                if wait > 0:
+                    sleep(wait)
+            yield timestamp, recording.frame(index)
@@ -0,0 +1,183 @@
+# landmarks.py
+# Compact array representation of pose landmarks and vectorized pose classifiers
+
+import numpy as np
+
+# Number of landmarks in the MediaPipe pose model
+NUM_LANDMARKS = 33
+
+# Landmark indices (same values as mp_pose.PoseLandmark)
+LEFT_SHOULDER = 11
+RIGHT_SHOULDER = 12
+LEFT_WRIST = 15
+RIGHT_WRIST = 16
+
+# Pairs of landmarks joined by a line when drawing the skeleton (same as mp_pose.POSE_CONNECTIONS)
+POSE_CONNECTIONS = (
+    (0, 1), (0, 4), (1, 2), (2, 3), (3, 7), (4, 5), (5, 6), (6, 8), (9, 10), (11, 12), (11, 13), (11, 23),
+    (12, 14), (12, 24), (13, 15), (14, 16), (15, 17), (15, 19), (15, 21), (16, 18), (16, 20), (16, 22),
+    (17, 19), (18, 20), (23, 24), (23, 25), (24, 26), (25, 27), (26, 28), (27, 29), (27, 31), (28, 30),
+    (28, 32), (29, 31), (30, 32),
+)
+
+# Columns of the landmark array
+X, Y, Z, VISIBILITY = 0, 1, 2, 3
+
+# Labels indexed by the values returned from the batch classifiers
+HAND_STATUSES = ('Hands Not Joined', 'Hands Joined')
+HORIZONTAL_POSITIONS = ('Left', 'Center', 'Right')
+VERTICAL_POSTURES = ('Top', 'Middle', 'Bottom')
+
+# Wrist distance in pixels below which hands count as joined
+HANDS_JOINED_THRESHOLD = 300
+
+
+class LandmarkFrame:
+    """All 33 pose landmarks of one frame as a float32 (33, 4) array of x, y, z, visibility"""
+    __slots__ = ('data', 'timestamp', 'width', 'height')
+
+    def __init__(self, data, timestamp, width, height):
+        self.data = data            # normalized coordinates, shape (33, 4)
+        self.timestamp = timestamp  # capture time of the frame in seconds
+        self.width = width          # size of the frame the landmarks refer to
+        self.height = height
+
+    @classmethod
+    def from_results(cls, results, width, height, timestamp=0.0):
+        """
+        Convert MediaPipe pose results into a landmark frame
+
+        Args:
+            results: Pose detection results
+            width: Width of the image the landmarks were detected in
+            height: Height of the image the landmarks were detected in
+            timestamp: Capture time of the frame
+
+        Returns:
+            LandmarkFrame, or None if no landmarks were detected
+        """
+        if not results.pose_landmarks:
+            return None
+        data = np.array([(landmark.x, landmark.y, landmark.z, landmark.visibility)
+                         for landmark in results.pose_landmarks.landmark], dtype=np.float32)
+        return cls(data, timestamp, width, height)
+
+
+def classify_hands_joined_batch(stack, width, height, threshold=HANDS_JOINED_THRESHOLD):
+    """
+    Classify whether hands are joined for any number of frames
+
+    Args:
+        stack: Landmark array of shape (..., 33, 4), e.g. (N, 33, 4)
+        width: Frame width in pixels
+        height: Frame height in pixels
+        threshold: Wrist distance in pixels below which hands count as joined
+
+    Returns:
+        Tuple of (boolean joined array, wrist distance array in pixels)
+    """
+    # Work in float64 pixels so results match the per-landmark computation exactly
+    left_wrist = stack[..., LEFT_WRIST, :2].astype(np.float64) * (width, height)
+    right_wrist = stack[..., RIGHT_WRIST, :2].astype(np.float64) * (width, height)
+    distance = np.hypot(*np.moveaxis(left_wrist - right_wrist, -1, 0))
+    return distance < threshold, distance
+
+
+def shoulder_width_batch(stack, width, height):
+    """
+    Measure the distance between the shoulders for any number of frames
+
+    Args:
+        stack: Landmark array of shape (..., 33, 4)
+        width: Frame width in pixels
+        height: Frame height in pixels
+
+    Returns:
+        Shoulder distance array in pixels, the body-relative unit of the calibrated thresholds
+    """
+    left_shoulder = stack[..., LEFT_SHOULDER, :2].astype(np.float64) * (width, height)
+    right_shoulder = stack[..., RIGHT_SHOULDER, :2].astype(np.float64) * (width, height)
+    return np.hypot(*np.moveaxis(left_shoulder - right_shoulder, -1, 0))
+
+
+def classify_position_horizontal_batch(stack, width, bounds=None):
+    """
+    Classify horizontal position on a 3-column grid for any number of frames
+
+    Args:
+        stack: Landmark array of shape (..., 33, 4)
+        width: Frame width in pixels
+        bounds: Optional (left, right) column boundaries in pixels (default: thirds of the width)
+
+    Returns:
+        Tuple of (index array into HORIZONTAL_POSITIONS, shoulder midpoint x array in pixels)
+    """
+    left_bound, right_bound = bounds if bounds is not None else (width // 3, 2 * (width // 3))
+    shoulder_x = np.trunc(stack[..., [LEFT_SHOULDER, RIGHT_SHOULDER], X].astype(np.float64) * width).astype(np.int64)
+    mid_x = shoulder_x.sum(axis=-1) // 2
+    index = (mid_x >= left_bound).astype(np.int64) + (mid_x >= right_bound)
+    return index, mid_x
+
+
+def classify_position_vertical_batch(stack, height, bounds=None):
+    """
+    Classify vertical position on a 3-row grid for any number of frames
+
+    Args:
+        stack: Landmark array of shape (..., 33, 4)
+        height: Frame height in pixels
+        bounds: Optional (top, bottom) row boundaries in pixels (default: thirds of the height)
+
+    Returns:
+        Tuple of (index array into VERTICAL_POSTURES, shoulder midpoint y array in pixels)
+    """
+    top_bound, bottom_bound = bounds if bounds is not None else (height // 3, 2 * (height // 3))
+    shoulder_y = np.trunc(stack[..., [LEFT_SHOULDER, RIGHT_SHOULDER], Y].astype(np.float64) * height).astype(np.int64)
+    mid_y = np.abs(shoulder_y.sum(axis=-1)) // 2
+    index = (mid_y >= top_bound).astype(np.int64) + (mid_y >= bottom_bound)
+    return index, mid_y
+
+
+def classify_hands_joined(landmarks, threshold=HANDS_JOINED_THRESHOLD):
+    """
+    Check if hands are joined based on wrist landmarks distance
+
+    Args:
+        landmarks: LandmarkFrame
+        threshold: Wrist distance in pixels below which hands count as joined
+
+    Returns:
+        Tuple of (hands joined status, wrist distance in pixels)
+    """
+    joined, distance = classify_hands_joined_batch(landmarks.data, landmarks.width, landmarks.height, threshold)
+    return HAND_STATUSES[int(joined)], int(distance)
+
+
+def classify_position_horizontal(landmarks, bounds=None):
+    """
+    Determine horizontal position (left, center, right) of the person based on 3-column grid
+
+    Args:
+        landmarks: LandmarkFrame
+        bounds: Optional (left, right) column boundaries in pixels (default: thirds of the width)
+
+    Returns:
+        Tuple of (horizontal position, shoulder midpoint x in pixels)
+    """
+    index, mid_x = classify_position_horizontal_batch(landmarks.data, landmarks.width, bounds)
+    return HORIZONTAL_POSITIONS[int(index)], int(mid_x)
+
+
+def classify_position_vertical(landmarks, bounds=None):
+    """
+    Determine vertical position (top, middle, bottom) of the person based on 3-row grid
+
+    Args:
+        landmarks: LandmarkFrame
+        bounds: Optional (top, bottom) row boundaries in pixels (default: thirds of the height)
+
+    Returns:
+        Tuple of (posture, shoulder midpoint y in pixels)
+    """
+    index, mid_y = classify_position_vertical_batch(landmarks.data, landmarks.height, bounds)
+    return VERTICAL_POSTURES[int(index)], int(mid_y)
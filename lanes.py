@@ -0,0 +1,202 @@
+# lanes.py
+# Multi-player mode: the frame is split into side-by-side lanes, one player per lane
+#
+# MediaPipe's Pose follows a single person, so every lane gets its own Pose
+# graph running on its column of the frame, its own GameController state and
+# its own key map. The lanes' inferences run in parallel threads (MediaPipe
+# releases the GIL while its graph runs), so two players cost about as much
+# wall time per frame as one on a machine with a spare core.
+
+from concurrent.futures import ThreadPoolExecutor
+
+import cv2
+import numpy as np
+
+from pose_detection import create_pose_video
+from landmarks import LandmarkFrame
+from game_controller import GameController
+from key_dispatcher import KeyDispatcher
+
+# Key map of each lane from left to right; further lanes need explicit key maps
+LANE_KEY_MAPS = (
+    {'left': 'left', 'right': 'right', 'up': 'up', 'down': 'down', 'start': 'space'},
+    {'left': 'a', 'right': 'd', 'up': 'w', 'down': 's', 'start': 'space'},
+)
+
+LANE_COLOR = (0, 255, 255)
+
+# Actions of a key map given as comma-separated keys, in this order (start is optional)
+KEY_MAP_ACTIONS = ('left', 'right', 'up', 'down', 'start')
+
+
+def parse_key_map(spec):
+    """
+    Parse a key map given as LEFT,RIGHT,UP,DOWN[,START], e.g. 'j,l,i,k'
+
+    Returns:
+        Dictionary of action -> key name (start defaults to space)
+    """
+    keys = [key.strip() for key in spec.split(',')]
+    if len(keys) not in (4, 5) or not all(keys):
+        raise ValueError(f"key map {spec!r} must be LEFT,RIGHT,UP,DOWN or LEFT,RIGHT,UP,DOWN,START")
+    return dict({'start': 'space'}, **dict(zip(KEY_MAP_ACTIONS, keys)))
+
+
+def create_lane_controllers(num_lanes, key_maps=LANE_KEY_MAPS, backend=None, on_sent=None, verbose=True,
+                            create_classifier=None):
+    """
+    Create one GameController per lane, each with its own key dispatcher
+
+    Only the first lane activates the game window when its player starts.
+
+    Args:
+        num_lanes: Number of lanes
+        key_maps: Key map per lane (action -> key name)
+        backend: Input backend for the dispatchers (default: pyautogui)
+        on_sent: Optional callback(origin_timestamp, sent_at) for sent keys
+        verbose: Whether the controllers print jumps and crouches
+        create_classifier: Optional callable returning a new HysteresisClassifier per lane (e.g. from a profile)
+
+    Returns:
+        List of GameController objects
+    """
+    if num_lanes > len(key_maps):
+        raise ValueError(f"{num_lanes} lanes need {num_lanes} key maps, only {len(key_maps)} given")
+
+    controllers = []
+    for index in range(num_lanes):
+        keys = key_maps[index]
+        # Horizontal moves of this lane cancel each other out while queued
+        opposite_keys = {keys['left']: keys['right'], keys['right']: keys['left']}
+        dispatcher = KeyDispatcher(backend=backend, on_sent=on_sent, opposite_keys=opposite_keys).start()
+        classifier = create_classifier() if create_classifier is not None else None
+        controller = GameController(dispatcher=dispatcher, verbose=verbose, keys=keys, classifier=classifier)
+        controller.activate_window_needed = index == 0
+        controllers.append(controller)
+    return controllers
+
+
+class Lane:
+    """One player's column of the frame with its own Pose graph and GameController"""
+    def __init__(self, index, num_lanes, controller, pose):
+        self.index = index
+        self.num_lanes = num_lanes
+        self.controller = controller
+        self.pose = pose
+
+    def bounds(self, width):
+        """Return the (x0, x1) pixel columns of this lane in a frame of the given width."""
+        return self.index * width // self.num_lanes, (self.index + 1) * width // self.num_lanes
+
+    def detect(self, image_rgb, timestamp):
+        """
+        Detect the lane's player in its column of the frame
+
+        Args:
+            image_rgb: Full RGB frame
+            timestamp: Capture time of the frame
+
+        Returns:
+            LandmarkFrame relative to the lane's column, or None if nobody was detected
+        """
+        height, width, _ = image_rgb.shape
+        x0, x1 = self.bounds(width)
+        results = self.pose.process(np.ascontiguousarray(image_rgb[:, x0:x1]))
+        return LandmarkFrame.from_results(results, x1 - x0, height, timestamp)
+
+    def view(self, frame):
+        """Return the lane's column of a frame as a view, drawing on it draws on the frame."""
+        x0, x1 = self.bounds(frame.shape[1])
+        return frame[:, x0:x1]
+
+
+class LaneSet:
+    """
+    Run several lanes on every frame.
+
+    Each lane's landmarks are relative to its own column, so the classifiers,
+    controllers and overlay renderer work on a lane exactly as they do on a
+    full frame in single-player mode.
+    """
+    def __init__(self, controllers, poses=None):
+        """
+        Args:
+            controllers: One GameController per lane, from left to right
+            poses: Optional Pose object per lane (default: a new video Pose per lane)
+        """
+        num_lanes = len(controllers)
+        if poses is None:
+            poses = [create_pose_video() for _ in range(num_lanes)]
+        self.lanes = [Lane(index, num_lanes, controller, pose)
+                      for index, (controller, pose) in enumerate(zip(controllers, poses))]
+        self._executor = ThreadPoolExecutor(max_workers=num_lanes, thread_name_prefix='lane') if num_lanes > 1 else None
+
+    @property
+    def controllers(self):
+        """GameController of every lane."""
+        return [lane.controller for lane in self.lanes]
+
+    def detect(self, image_rgb, timestamp):
+        """
+        Detect every lane's player, running the lanes in parallel
+
+        Returns:
+            List of LandmarkFrame (or None) per lane
+        """
+        if self._executor is None:
+            return [lane.detect(image_rgb, timestamp) for lane in self.lanes]
+        futures = [self._executor.submit(lane.detect, image_rgb, timestamp) for lane in self.lanes]
+        return [future.result() for future in futures]
+
+    def classify(self, all_landmarks):
+        """
+        Classify the pose in every lane
+
+        Returns:
+            List of (hand_status, horizontal_position, mid_x, posture, mid_y) per lane, None where nobody was detected
+        """
+        return [lane.controller.classify(landmarks) if landmarks is not None else None
+                for lane, landmarks in zip(self.lanes, all_landmarks)]
+
+    def overlays(self, all_landmarks, classified):
+        """Return the overlay arguments of each lane, from the game state before this frame's update."""
+        overlays = []
+        for lane, landmarks, poses in zip(self.lanes, all_landmarks, classified):
+            overlay = {}
+            if landmarks is not None:
+                _, horizontal_position, mid_x, posture, mid_y = poses
+                if lane.controller.is_game_started():
+                    overlay.update(landmarks=landmarks, show_grid=True,
+                                   horizontal_position=horizontal_position, mid_x=mid_x)
+                    if lane.controller.mid_y:
+                        overlay.update(posture=posture, mid_y=mid_y)
+                else:
+                    overlay['show_instructions'] = True
+            overlays.append(overlay)
+        return overlays
+
+    def update(self, all_landmarks, classified):
+        """Update every lane's game state and queue its key presses."""
+        for lane, landmarks, poses in zip(self.lanes, all_landmarks, classified):
+            if landmarks is None:
+                lane.controller.update(None, None, None, None)
+                continue
+            hand_status, horizontal_position, _, posture, _ = poses
+            lane.controller.update(landmarks, hand_status, horizontal_position, posture)
+
+    def render(self, frame, renderer, overlays):
+        """Draw every lane's overlays into its column of the frame, with a divider and player label."""
+        for lane, overlay in zip(self.lanes, overlays):
+            view = lane.view(frame)
+            renderer.render(view, **overlay)
+            cv2.putText(view, f'P{lane.index + 1}', (view.shape[1] - 60, 30), cv2.FONT_HERSHEY_PLAIN, 2,
+                        LANE_COLOR, 3)
+            if lane.index > 0:
+                cv2.line(view, (0, 0), (0, view.shape[0]), LANE_COLOR, 3)
+
+    def close(self):
+        """Stop the lane threads and every controller's key dispatcher"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=True)
+        for lane in self.lanes:
+            lane.controller.close()
@@ -6,122 +6,718 @@
 # pip install mediapipe
 # pip install matplotlib
 
+from time import time, sleep, perf_counter
+
+# Start of the process, for the startup metrics
+STARTED_AT = perf_counter()
+
+import argparse
 import cv2
-from time import time, sleep
 
 # Import modules from our project
-from pose_detection import (
-    mp_pose, pose_video, detect_pose, 
-    check_hands_joined, check_position_horizontal, check_position_vertical
-)
+from pose_detection import get_pose_engine, start_warm_up, RoiPoseTracker
+from landmarks import LandmarkFrame
 from game_controller import GameController
-from utils import FPSCounter, setup_camera
+from key_dispatcher import KeyDispatcher
+from input_backends import INPUT_BACKENDS, create_backend
+from overlay import OverlayRenderer
+from frame_source import CAMERA_BACKENDS, SOURCE_RATES, create_frame_source
+from capture import CaptureThread, CapturedFrame
+from telemetry import Telemetry, TelemetryExporter
+from landmark_recording import LandmarkRecorder
+from governor import QualityGovernor
+from inference_pool import InferencePool
+from lanes import LANE_KEY_MAPS, LaneSet, create_lane_controllers, parse_key_map
+from landmark_filter import FILTERS, create_filter
+from motion_gate import MotionGate
+from threshold_profile import ThresholdProfile
+from preview import PREVIEW_KINDS, create_preview
+from buffer_pool import FrameBufferPool
+from pose_landmarker import DEFAULT_POSE_MODEL, AsyncPoseLandmarker, LandmarkerResults
+from video_recording import VIDEO_KINDS, SessionRecording, SessionVideoRecorder
+from state_publisher import DEFAULT_NAME, StatePublisher, parse_target
+
+# Seconds the pipelined loop waits for results at a time while frames are in flight
+PIPELINE_POLL_INTERVAL = 0.002
 
+# Longest time in seconds spent finishing the frames still in flight at shutdown
+PIPELINE_DRAIN_TIMEOUT = 2.0
 
-def process_frame(frame, controller, fps_counter):
-    """Process a single video frame"""
+
+def prepare_frame(captured, timer, buffers=None, need_frame=True):
+    """
+    Flip a captured frame for display and convert it for inference
+    
+    Args:
+        captured: Frame to process (see capture.CapturedFrame)
+        timer: StageTimer recording the flip and convert stages
+        buffers: Optional FrameBufferPool the two images are taken from; the caller releases them
+        need_frame: Whether the flipped BGR frame is needed, i.e. whether overlays are drawn
+        
+    Returns:
+        Tuple of (flipped BGR frame, or None if not needed, flipped RGB frame)
+    """
+    shape = captured.image.shape
+    
     # Flip the frame horizontally for natural visualization
-    frame = cv2.flip(frame, 1)
+    frame = cv2.flip(captured.image, 1, dst=buffers.acquire(shape) if buffers is not None else None)
+    timer.lap('flip')
+    
+    # Convert the frame from BGR into RGB format
+    image_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=buffers.acquire(shape) if buffers is not None else None)
+    timer.lap('convert')
+    if not need_frame:
+        if buffers is not None:
+            buffers.release(frame)
+        frame = None
+    return frame, image_rgb
+
+
+def process_frame(captured, controller, telemetry, renderer, pose=None, show_hud=False, recorder=None,
+                  landmark_filter=None, buffers=None, publisher=None, on_updated=None):
+    """
+    Process a single captured frame (see capture.CapturedFrame)
     
-    # Get frame dimensions
-    frame_height, frame_width, _ = frame.shape
+    Args:
+        captured: Frame to process
+        controller: GameController receiving the classified pose
+        telemetry: Telemetry recording the time spent in each stage
+        renderer: OverlayRenderer drawing feedback onto the frame (None draws nothing)
+        pose: Pose object used for inference (default: the shared video pose engine)
+        show_hud: Whether to draw per-stage telemetry on the frame
+        recorder: Optional LandmarkRecorder receiving every frame's landmarks
+        landmark_filter: Optional LandmarkFilter smoothing the landmarks before classification
+        buffers: Optional FrameBufferPool the frame images are taken from
+        publisher: Optional StatePublisher receiving every frame's landmarks and game state
+        on_updated: Optional callback called with the captured frame after the game update; the overlays
+                    are only drawn if it returns True
+        
+    Returns:
+        Flipped frame with overlays drawn (the caller releases it to buffers), or None if nothing was drawn
+    """
+    timer = telemetry.timer
+    timer.start()
+    frame, image_rgb = prepare_frame(captured, timer, buffers, need_frame=renderer is not None)
     
     # Perform pose detection
-    frame, results = detect_pose(frame, pose_video, draw=controller.is_game_started())
+    if pose is None:
+        pose = get_pose_engine()
+    if isinstance(pose, AsyncPoseLandmarker):
+        # Only submits the frame, the results returned are the newest ones that arrived
+        results = pose.process(image_rgb, captured.timestamp)
+    else:
+        results = pose.process(image_rgb)
+    timer.lap('inference')
+    if buffers is not None:
+        buffers.release(image_rgb)
+    
+    # Asynchronous results already processed on an earlier frame (or none yet) are only drawn again,
+    # so the game, the filter and the recording see every result exactly once
+    if isinstance(results, LandmarkerResults) and (results.timestamp is None or results.overlay is not None):
+        draw = on_updated(captured) if on_updated is not None else True
+        return draw_frame(frame, results.overlay or {}, telemetry, renderer, show_hud, draw, buffers)
+    
+    # Convert the landmarks into a compact array once, timestamped with the frame they were detected in
+    timestamp = getattr(results, 'timestamp', captured.timestamp)
+    frame_height, frame_width, _ = captured.image.shape
+    landmarks = LandmarkFrame.from_results(results, frame_width, frame_height, timestamp)
+    overlay = update_game(captured, landmarks, controller, telemetry, recorder, landmark_filter, publisher,
+                          timestamp)
+    if isinstance(results, LandmarkerResults):
+        results.overlay = overlay
+    draw = on_updated(captured) if on_updated is not None else True
+    return draw_frame(frame, overlay, telemetry, renderer, show_hud, draw, buffers)
+
+
+def finish_frame(captured, frame, landmarks, controller, telemetry, renderer, show_hud=False, recorder=None,
+                 landmark_filter=None, publisher=None, buffers=None, on_updated=None):
+    """
+    Classify a frame's landmarks, update the game and draw the overlays
+    
+    The stages before inference must already be recorded in telemetry.timer.
+    
+    Args:
+        captured: Frame the landmarks were detected in
+        frame: Flipped BGR frame to draw on, or None if nothing is drawn
+        landmarks: LandmarkFrame, or None if no person was detected
+        controller: GameController receiving the classified pose
+        telemetry: Telemetry recording the time spent in each stage
+        renderer: OverlayRenderer drawing feedback onto the frame (None draws nothing)
+        show_hud: Whether to draw per-stage telemetry on the frame
+        recorder: Optional LandmarkRecorder receiving every frame's landmarks
+        landmark_filter: Optional LandmarkFilter smoothing the landmarks before classification
+        publisher: Optional StatePublisher receiving the landmarks and the updated game state
+        buffers: Optional FrameBufferPool a frame that is not drawn on is released to
+        on_updated: Optional callback called with the captured frame after the game update; the overlays
+                    are only drawn if it returns True
+        
+    Returns:
+        Frame with overlays drawn, or None if nothing was drawn
+    """
+    overlay = update_game(captured, landmarks, controller, telemetry, recorder, landmark_filter, publisher)
+    draw = on_updated(captured) if on_updated is not None else True
+    return draw_frame(frame, overlay, telemetry, renderer, show_hud, draw, buffers)
+
+
+def update_game(captured, landmarks, controller, telemetry, recorder=None, landmark_filter=None, publisher=None,
+                timestamp=None):
+    """
+    Classify a frame's landmarks and update the game
+    
+    Args:
+        captured: Frame the landmarks were detected in
+        landmarks: LandmarkFrame, or None if no person was detected
+        controller: GameController receiving the classified pose
+        telemetry: Telemetry recording the time spent in each stage
+        recorder: Optional LandmarkRecorder receiving every frame's landmarks
+        landmark_filter: Optional LandmarkFilter smoothing the landmarks before classification
+        publisher: Optional StatePublisher receiving the landmarks and the updated game state
+        timestamp: Capture time of the frame the landmarks were detected in (default: captured.timestamp)
+        
+    Returns:
+        Dictionary of overlays to draw (see OverlayRenderer.render)
+    """
+    timer = telemetry.timer
+    frame_height, frame_width, _ = captured.image.shape
+    if timestamp is None:
+        timestamp = captured.timestamp
     
-    # Check if pose landmarks are detected
-    if results.pose_landmarks:
+    # Raw landmarks are recorded, so filters can be tuned on the recording later
+    if recorder is not None:
+        recorder.write(landmarks, timestamp, frame_width, frame_height)
+    if landmark_filter is not None:
+        landmarks = landmark_filter.apply(landmarks)
+    
+    # Classify the pose
+    hand_status = horizontal_position = posture = None
+    if landmarks is not None:
+        hand_status, horizontal_position, mid_x, posture, mid_y = controller.classify(landmarks)
+        telemetry.startup.mark('first_landmarks')
+    timer.lap('classify')
+    
+    # Overlay content depends on the state before this frame's update
+    overlay = {}
+    if landmarks is not None:
         if controller.is_game_started():
-            # Process horizontal movement
-            frame, horizontal_position = check_position_horizontal(frame, results, draw=True)
-            controller.process_horizontal_position(horizontal_position)
-            
-            # Process vertical movement if mid_y is set
+            overlay.update(landmarks=landmarks, show_grid=True,
+                           horizontal_position=horizontal_position, mid_x=mid_x)
             if controller.mid_y:
-                frame, posture = check_position_vertical(frame, results, controller.mid_y, draw=True)
-                controller.process_vertical_position(posture)
+                overlay.update(posture=posture, mid_y=mid_y)
         else:
             # Show instructions to start the game
-            cv2.putText(
-                frame, 
-                'JOIN BOTH HANDS TO START THE GAME.', 
-                (5, frame_height - 10), 
-                cv2.FONT_HERSHEY_PLAIN,
-                2, 
-                (0, 255, 0), 
-                3
-            )
+            overlay['show_instructions'] = True
+    
+    # Update game state and queue key presses
+    controller.update(landmarks, hand_status, horizontal_position, posture)
+    if publisher is not None:
+        publisher.publish(timestamp, [landmarks], [controller])
+    timer.lap('dispatch')
+    return overlay
+
+
+def draw_frame(frame, overlay, telemetry, renderer, show_hud=False, draw=True, buffers=None):
+    """
+    Draw the overlays on a frame and count it in the telemetry
+    
+    Args:
+        frame: Flipped BGR frame to draw on, or None if nothing is drawn
+        overlay: Dictionary of overlays returned by update_game
+        telemetry: Telemetry recording the time spent in each stage
+        renderer: OverlayRenderer drawing feedback onto the frame (None draws nothing)
+        show_hud: Whether to draw per-stage telemetry on the frame
+        draw: Whether anybody is going to see the frame; if not, it is released to buffers
+        buffers: Optional FrameBufferPool the frame was taken from
+        
+    Returns:
+        Frame with overlays drawn, or None if nothing was drawn
+    """
+    if not draw and frame is not None:
+        if buffers is not None:
+            buffers.release(frame)
+        frame = None
+    
+    # Draw all overlays on the frame, unless nobody is going to see it
+    if renderer is not None and frame is not None:
+        hud_lines = telemetry.hud_lines() if show_hud else None
+        frame = renderer.render(frame, fps=telemetry.fps, hud_lines=hud_lines, **overlay)
+        telemetry.timer.lap('overlay')
+    
+    telemetry.record_frame()
+    return frame
+
+
+def process_frame_pipelined(captured, pool, controller, telemetry, renderer, show_hud=False, recorder=None,
+                            timeout=0.0, on_finished=None, landmark_filter=None, buffers=None, publisher=None,
+                            on_updated=None, keep_image=False):
+    """
+    Submit a captured frame to an InferencePool and finish the frames whose results are ready
+    
+    Frames are finished in capture order. Their 'inference' stage is the time from
+    submission to the result arriving and 'reorder' the time the result waited for
+    earlier frames, so the stage total is the frame's latency through the pipeline.
+    
+    Args:
+        captured: Frame to submit, or None to only collect results
+        pool: InferencePool running the inference
+        controller: GameController receiving the classified pose
+        telemetry: Telemetry recording the time spent in each stage
+        renderer: OverlayRenderer drawing feedback onto the frame (None draws nothing)
+        show_hud: Whether to draw per-stage telemetry on the frame
+        recorder: Optional LandmarkRecorder receiving every frame's landmarks
+        timeout: Seconds to wait for a result if none is ready
+        on_finished: Optional callback called with each finished frame while telemetry.timer holds its stages
+        landmark_filter: Optional LandmarkFilter smoothing the landmarks before classification
+        buffers: Optional FrameBufferPool the frame images are taken from
+        publisher: Optional StatePublisher receiving every frame's landmarks and game state
+        on_updated: Optional callback called with each finished frame's CapturedFrame after its game update;
+                    its overlays are only drawn if it returns True
+        keep_image: Whether on_updated needs the captured image, which is then copied at submission, since
+                    the capture thread reuses the original before the frame is finished
         
-        # Check if hands are joined
-        _, hand_status = check_hands_joined(frame, results)
+    Returns:
+        List of finished frames with overlays drawn, None for frames nothing was drawn on
+        (may be empty; the caller releases the frames to buffers)
+    """
+    timer = telemetry.timer
+    if captured is not None:
+        timer.start()
+        frame, image_rgb = prepare_frame(captured, timer, buffers, need_frame=renderer is not None)
+        if keep_image:
+            if buffers is not None:
+                image = buffers.acquire(captured.image.shape)
+                image[...] = captured.image
+            else:
+                image = captured.image.copy()
+            captured = CapturedFrame(image, captured.timestamp, captured.seq)
+        # The pool copies the RGB image into its shared ring
+        queued = pool.submit(image_rgb, (captured, frame, dict(timer.laps)))
+        if buffers is not None:
+            buffers.release(image_rgb)
+            if not queued:
+                buffers.release(frame)
+                if keep_image:
+                    buffers.release(captured.image)
+    
+    finished = []
+    for (captured, frame, laps), data, inference_time, reorder_time in pool.collect(timeout):
+        timer.start()
+        for stage, duration in laps.items():
+            timer.add(stage, duration)
+        timer.add('inference', inference_time)
+        timer.add('reorder', reorder_time)
         
-        if hand_status == 'Hands Joined':
-            controller.increment_counter()
-            
-            # Start or resume game if counter threshold is reached
-            if controller.should_start_game():
-                if not controller.is_game_started():
-                    # Get shoulder coordinates to calculate mid_y
-                    left_y = int(results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER].y * frame_height)
-                    right_y = int(results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER].y * frame_height)
-                    
-                    # Start the game
-                    controller.start_game(left_y, right_y, frame_height)
+        landmarks = None
+        if data is not None:
+            frame_height, frame_width, _ = captured.image.shape
+            landmarks = LandmarkFrame(data, captured.timestamp, frame_width, frame_height)
+        frame = finish_frame(captured, frame, landmarks, controller, telemetry, renderer, show_hud, recorder,
+                             landmark_filter, publisher, buffers, on_updated)
+        if keep_image and buffers is not None:
+            buffers.release(captured.image)
+        if on_finished is not None:
+            on_finished(frame)
+        finished.append(frame)
+    return finished
 
-        else:
-            controller.reset_counter()
-    else:
-        controller.reset_counter()
+
+def process_frame_lanes(captured, lanes, telemetry, renderer, show_hud=False, buffers=None, publisher=None,
+                        on_updated=None):
+    """
+    Process a single captured frame in multi-player mode
+    
+    Args:
+        captured: Frame to process
+        lanes: LaneSet with one player per lane
+        telemetry: Telemetry recording the time spent in each stage
+        renderer: OverlayRenderer drawing feedback onto the frame (None draws nothing)
+        show_hud: Whether to draw per-stage telemetry on the frame
+        buffers: Optional FrameBufferPool the frame images are taken from
+        publisher: Optional StatePublisher receiving every lane's landmarks and game state
+        on_updated: Optional callback called with the captured frame after the game update; the overlays
+                    are only drawn if it returns True
+        
+    Returns:
+        Flipped frame with every lane's overlays drawn (the caller releases it to buffers), or None if
+        nothing was drawn
+    """
+    timer = telemetry.timer
+    timer.start()
+    frame, image_rgb = prepare_frame(captured, timer, buffers, need_frame=renderer is not None)
     
-    # Update FPS counter and draw on frame
-    fps_counter.update()
-    frame = fps_counter.draw_fps(frame)
+    # Every lane runs its own pose graph on its column, in parallel
+    all_landmarks = lanes.detect(image_rgb, captured.timestamp)
+    timer.lap('inference')
+    if buffers is not None:
+        buffers.release(image_rgb)
     
+    classified = lanes.classify(all_landmarks)
+    if any(landmarks is not None for landmarks in all_landmarks):
+        telemetry.startup.mark('first_landmarks')
+    timer.lap('classify')
+    
+    # Overlay content depends on the state before this frame's update
+    overlays = lanes.overlays(all_landmarks, classified)
+    lanes.update(all_landmarks, classified)
+    if publisher is not None:
+        publisher.publish(captured.timestamp, all_landmarks, lanes.controllers)
+    timer.lap('dispatch')
+    
+    if on_updated is not None and not on_updated(captured) and frame is not None:
+        if buffers is not None:
+            buffers.release(frame)
+        frame = None
+    if renderer is not None and frame is not None:
+        lanes.render(frame, renderer, overlays)
+        hud_lines = telemetry.hud_lines() if show_hud else None
+        renderer.render(frame, fps=telemetry.fps, hud_lines=hud_lines)
+        timer.lap('overlay')
+    
+    telemetry.record_frame()
     return frame
 
 
+def game_state(controllers):
+    """Return the game state of every player; frames on which it changes are keyframes of the video recording."""
+    return tuple((controller.game_started, controller.x_pos_index, controller.y_pos_index)
+                 for controller in controllers)
+
+
+def lane_key_map(spec):
+    """Parse a --lane-keys value for argparse."""
+    try:
+        return parse_key_map(spec)
+    except ValueError as e:
+        raise argparse.ArgumentTypeError(str(e))
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Control games with body movements captured by a webcam')
+    parser.add_argument('--source', default='0',
+                        help="camera ID, video file, image directory or 'synthetic' to read frames from")
+    parser.add_argument('--source-rate', choices=SOURCE_RATES, default='native',
+                        help='play file and synthetic sources at their own frame rate or as fast as possible')
+    parser.add_argument('--loop', action='store_true', help='start file sources over at the end')
+    parser.add_argument('--camera-width', type=int, default=1280, help='requested camera frame width')
+    parser.add_argument('--camera-height', type=int, default=960, help='requested camera frame height')
+    parser.add_argument('--camera-fps', type=float, default=None,
+                        help='requested camera frame rate (also the rate of image directories and synthetic frames)')
+    parser.add_argument('--camera-fourcc', default='MJPG',
+                        help="requested camera pixel format, e.g. MJPG or YUYV ('default' keeps the driver's)")
+    parser.add_argument('--camera-buffer-size', type=int, default=1,
+                        help='requested number of camera driver buffers (0 keeps the driver default)')
+    parser.add_argument('--camera-backend', choices=tuple(CAMERA_BACKENDS), default='auto',
+                        help='OpenCV capture backend for cameras')
+    parser.add_argument('--input-backend', choices=INPUT_BACKENDS, default='pyautogui',
+                        help='how key presses are injected: pyautogui, a Linux uinput device, xdotool (X11) or not at all')
+    parser.add_argument('--pose-engine', choices=('solutions', 'landmarker'), default='solutions',
+                        help='blocking legacy pose graph, or the Tasks PoseLandmarker running asynchronously '
+                             '(LIVE_STREAM) while the loop goes on')
+    parser.add_argument('--pose-model', default=DEFAULT_POSE_MODEL,
+                        help='PoseLandmarker model bundle (.task) for --pose-engine landmarker')
+    parser.add_argument('--roi-tracking', action='store_true',
+                        help='run inference on a downscaled crop around the tracked player')
+    parser.add_argument('--inference-size', type=int, default=256,
+                        help='longest side in pixels of the crop passed to the model with --roi-tracking')
+    parser.add_argument('--governor', action='store_true',
+                        help='adapt model complexity, inference size and frame skipping to --frame-budget-ms')
+    parser.add_argument('--frame-budget-ms', type=float, default=1000 / 30,
+                        help='target processing time per frame for --governor')
+    parser.add_argument('--max-fps', type=float, default=60.0,
+                        help='highest number of frames processed per second (0: no limit)')
+    parser.add_argument('--workers', type=int, default=0,
+                        help='run inference pipelined on this many worker processes (0: in the main loop)')
+    parser.add_argument('--motion-gate', action='store_true',
+                        help='skip inference and reuse the previous landmarks while the scene is static')
+    parser.add_argument('--motion-threshold', type=float, default=4.0,
+                        help='mean grayscale difference (0-255) below which --motion-gate skips a frame')
+    parser.add_argument('--motion-refresh-ms', type=float, default=250.0,
+                        help='longest time --motion-gate reuses landmarks before running inference anyway')
+    parser.add_argument('--lanes', type=int, default=1,
+                        help='number of players side by side, each tracked in their own column of the frame')
+    parser.add_argument('--lane-keys', action='append', default=[], type=lane_key_map,
+                        metavar='LEFT,RIGHT,UP,DOWN[,START]',
+                        help='keys of one more lane after the built-in two (player 1: arrow keys, player 2: W/A/S/D), '
+                             'e.g. j,l,i,k (repeatable)')
+    parser.add_argument('--profile', default=None,
+                        help='threshold profile from calibrate.py (resolution-independent hands and grid thresholds)')
+    parser.add_argument('--filter', choices=('none',) + tuple(FILTERS), default='none',
+                        help='smooth the landmarks and extrapolate them ahead before classification')
+    parser.add_argument('--filter-lead-ms', type=float, default=30.0,
+                        help='time the filtered landmarks are extrapolated ahead with --filter')
+    parser.add_argument('--preview', choices=PREVIEW_KINDS + ('none',), default='window',
+                        help='show the annotated frames in a local window, as an MJPEG stream on localhost, '
+                             'or not at all')
+    parser.add_argument('--headless', action='store_true',
+                        help='no preview and no overlay rendering (same as --preview none)')
+    parser.add_argument('--preview-fps', type=float, default=15.0, help='highest preview frame rate')
+    parser.add_argument('--preview-width', type=int, default=640, help='width in pixels of the preview frames')
+    parser.add_argument('--preview-port', type=int, default=8080, help='port of the --preview mjpeg stream')
+    parser.add_argument('--hud', action='store_true', help='show per-stage timings on screen')
+    parser.add_argument('--log-interval', type=float, default=10.0,
+                        help='seconds between telemetry log lines')
+    parser.add_argument('--telemetry-file', default=None,
+                        help='write telemetry in Prometheus text format to this file at every log interval')
+    parser.add_argument('--record-landmarks', default=None,
+                        help='record the landmark stream of the session to this file')
+    parser.add_argument('--publish-state', nargs='?', const=DEFAULT_NAME, default=None, metavar='NAME',
+                        help='publish every frame\'s landmarks and game state in a shared memory ring for other '
+                             f'local processes (see state_publisher.py; default name: {DEFAULT_NAME})')
+    parser.add_argument('--publish-udp', action='append', default=[], metavar='HOST:PORT',
+                        help='also send the published state to this UDP address, e.g. a remote dashboard (repeatable, '
+                             'implies --publish-state)')
+    parser.add_argument('--publish-udp-rate', type=float, default=30.0,
+                        help='highest number of UDP state datagrams per second')
+    parser.add_argument('--publish-force', action='store_true',
+                        help='replace an existing shared memory block of the --publish-state name, even if another '
+                             'publisher is using it')
+    parser.add_argument('--record-video', default=None,
+                        help='record the session as rotating video files in this directory, encoded on a '
+                             'background thread')
+    parser.add_argument('--record-video-kind', choices=VIDEO_KINDS, default='annotated',
+                        help='record the camera frames, the frames with overlays, or both')
+    parser.add_argument('--record-video-width', type=int, default=640,
+                        help='width in pixels the recorded frames are downscaled to')
+    parser.add_argument('--record-video-every', type=int, default=1, help='record every N-th frame')
+    parser.add_argument('--record-video-keyframes', action='store_true',
+                        help='only record frames on which the game state changed (a key was pressed)')
+    parser.add_argument('--record-video-max-mb', type=float, default=100.0,
+                        help='size in MB at which a new video file is started')
+    parser.add_argument('--record-video-max-files', type=int, default=10,
+                        help='number of video files kept per kind, older ones are deleted')
+    return parser.parse_args()
+
+
 def main():
     """Main function to run the game controller"""
-    # Setup camera
-    camera_video = setup_camera()
+    args = parse_args()
+    if args.max_fps < 0:
+        print("Error: --max-fps must be 0 (no limit) or positive")
+        return
+    if args.workers and (args.governor or args.roi_tracking or args.motion_gate):
+        print("Error: --workers cannot be combined with --governor, --roi-tracking or --motion-gate")
+        return
+    key_maps = LANE_KEY_MAPS + tuple(args.lane_keys)
+    if args.lanes > len(key_maps):
+        print(f"Error: --lanes {args.lanes} needs a key map per lane, add --lane-keys for the lanes after the "
+              f"first {len(key_maps)}")
+        return
+    if args.lanes > 1 and (args.workers or args.governor or args.roi_tracking or args.record_landmarks
+                           or args.filter != 'none' or args.motion_gate):
+        print("Error: --lanes cannot be combined with --workers, --governor, --roi-tracking, --record-landmarks, "
+              "--filter or --motion-gate")
+        return
+    if args.pose_engine == 'landmarker' and (args.workers or args.lanes > 1 or args.governor or args.roi_tracking
+                                             or args.motion_gate):
+        print("Error: --pose-engine landmarker cannot be combined with --workers, --lanes, --governor, "
+              "--roi-tracking or --motion-gate")
+        return
+    
+    # Telemetry first, so every startup phase can be recorded
+    exporter = TelemetryExporter(args.telemetry_file) if args.telemetry_file else None
+    telemetry = Telemetry(log_interval=args.log_interval, exporter=exporter, started_at=STARTED_AT)
+    startup = telemetry.startup
+    startup.mark('imports')
+    
+    # Optionally share the landmarks and game state with other processes (one record entry per lane)
+    publisher = None
+    if args.publish_state or args.publish_udp:
+        try:
+            publisher = StatePublisher(args.publish_state or DEFAULT_NAME, args.lanes,
+                                       udp_targets=[parse_target(target) for target in args.publish_udp],
+                                       udp_rate=args.publish_udp_rate, force=args.publish_force)
+        except FileExistsError as e:
+            print(f"Error: {e} (--publish-force replaces it)")
+            return
+        telemetry.add_counters('publish', publisher.stats)
+    
+    # Import MediaPipe, build the pose graph and run a first inference while the camera opens
+    # (pipelined workers build and warm up their own graphs)
+    pool = None
+    if args.workers:
+        pool = InferencePool(args.workers)
+    elif args.lanes == 1 and args.pose_engine == 'solutions':
+        start_warm_up(on_ready=lambda: startup.mark('model_ready'))
+    
+    # Open the camera (or file or synthetic source) and start reading frames on a background thread
+    source = create_frame_source(args.source, args.source_rate, args.loop, args.camera_width, args.camera_height,
+                                 args.camera_fps, None if args.camera_fourcc == 'default' else args.camera_fourcc,
+                                 args.camera_buffer_size or None, args.camera_backend)
+    if not source.is_opened():
+        print(f"Error: cannot open frame source {args.source}")
+        if pool is not None:
+            pool.close()
+        if publisher is not None:
+            publisher.close()
+        return
+    print(f"Frame source: {source.describe()}")
+    capture = CaptureThread(source, reuse_buffers=True).start()
+    startup.mark('camera_open')
+    
+    # Flipped and converted images are recycled instead of allocated for every frame
+    buffers = FrameBufferPool()
+    
+    # Show the annotated frames on a separate thread at a lower rate, or not at all
+    preview = None
+    if not args.headless and args.preview != 'none':
+        preview = create_preview(args.preview, args.preview_fps, args.preview_width, args.preview_port)
+        telemetry.add_counters('preview', preview.stats)
+    
+    # Initialize game controllers (one per player lane), sharing one input backend, and overlay renderer
+    backend = create_backend(args.input_backend)
+    profile = ThresholdProfile.load(args.profile) if args.profile else None
+    create_classifier = profile.create_classifier if profile is not None else None
+    lanes = None
+    if args.lanes > 1:
+        lanes = LaneSet(create_lane_controllers(args.lanes, key_maps, backend=backend, on_sent=telemetry.record_key,
+                                                create_classifier=create_classifier))
+        startup.mark('model_ready')
+        controllers = lanes.controllers
+    else:
+        dispatcher = KeyDispatcher(backend=backend, on_sent=telemetry.record_key).start()
+        classifier = create_classifier() if create_classifier is not None else None
+        controllers = [GameController(dispatcher=dispatcher, classifier=classifier)]
+    controller = controllers[0]
+    if profile is not None:
+        renderer = OverlayRenderer(profile.column_fractions, profile.row_fractions)
+    else:
+        renderer = OverlayRenderer()
+    recorder = LandmarkRecorder(args.record_landmarks) if args.record_landmarks else None
+    landmark_filter = create_filter(args.filter, lead=args.filter_lead_ms / 1000) if args.filter != 'none' else None
+    
+    # Include capture and key dispatch counters in the telemetry reports
+    telemetry.add_counters('capture', capture.stats)
+    telemetry.add_counters('buffers', buffers.stats)
+    telemetry.add_counters('keys', lambda: {
+        'sent': sum(controller.dispatcher.sent_count for controller in controllers),
+        'coalesced': sum(controller.dispatcher.coalesced_count for controller in controllers)})
+    if pool is not None:
+        telemetry.add_counters('pool', pool.stats)
+    
+    # Optionally record the camera frames and/or the annotated frames to video files
+    # (frames are placed in the files by their capture time, so they play back in real time at any loop rate)
+    video_recorders = {}
+    recording = None
+    if args.record_video:
+        kinds = ('raw', 'annotated') if args.record_video_kind == 'both' else (args.record_video_kind,)
+        fps = (source.describe().get('fps') or 30.0) / max(1, args.record_video_every)
+        for kind in kinds:
+            video_recorders[kind] = SessionVideoRecorder(
+                args.record_video, kind, fps, args.record_video_width, args.record_video_every,
+                args.record_video_keyframes, int(args.record_video_max_mb * 1024 * 1024),
+                args.record_video_max_files).start()
+            telemetry.add_counters(f'video_{kind}', video_recorders[kind].stats)
+        recording = SessionRecording(video_recorders.get('raw'), video_recorders.get('annotated'),
+                                     lambda: game_state(controllers))
     
-    # Create named window for resizing
-    cv2.namedWindow('Tiktok Scroller', cv2.WINDOW_NORMAL)
     
-    # Initialize game controller and FPS counter
-    controller = GameController()
-    fps_counter = FPSCounter()
+    # Optionally track the player and only run inference on a crop around them,
+    # or let the governor pick the inference settings from the measured frame time
+    pose = None
+    governor = None
+    if args.pose_engine == 'landmarker':
+        pose = AsyncPoseLandmarker(args.pose_model)
+        startup.mark('model_ready')
+        telemetry.add_counters('landmarker', pose.stats)
+    elif args.governor:
+        # Processing faster than --max-fps only adds idle time, so the governor is never asked to
+        # give up quality for a frame time below the rate limit's frame interval
+        budget = args.frame_budget_ms / 1000
+        if args.max_fps:
+            budget = max(budget, 1.0 / args.max_fps)
+        pose = governor = QualityGovernor(budget)
+    elif args.roi_tracking:
+        pose = RoiPoseTracker(get_pose_engine(), inference_size=args.inference_size)
     
-    # Limit update rate to prevent too many PyAutoGUI commands at once
-    frame_limit = 60  # max frames per second to process
-    frame_delay = 1.0 / frame_limit
+    # Optionally only run inference when the player moved
+    if args.motion_gate:
+        pose = MotionGate(pose if pose is not None else get_pose_engine(), args.motion_threshold,
+                          args.motion_refresh_ms / 1000)
+        telemetry.add_counters('motion', pose.stats)
+    
+    # Frames captured faster than --max-fps are dropped by the capture thread
+    frame_delay = 1.0 / args.max_fps if args.max_fps else 0.0
     last_frame_time = 0
     
     # Main loop
     try:
-        while camera_video.isOpened():
-            # Check for key press to exit
-            if cv2.waitKey(1) & 0xFF == 27:  # ESC key
+        while capture.is_running():
+            # ESC in the preview window exits
+            if preview is not None and preview.closed:
                 break
                 
-            # Rate limiting to prevent processing too many frames
+            # Rate limiting to --max-fps
             current_time = time()
+            in_flight = pool is not None and pool.queue_depth() > 0
             if current_time - last_frame_time < frame_delay:
-                # Skip this frame if we're processing too quickly
-                sleep(0.001)  # Small sleep to prevent CPU hogging
-                continue
+                if not in_flight:
+                    # Skip this frame if we're processing too quickly
+                    sleep(0.001)  # Small sleep to prevent CPU hogging
+                    continue
+                # Finish pipelined frames as their results arrive instead of sleeping
+                frame = None
+            else:
+                last_frame_time = current_time
                 
-            last_frame_time = current_time
+                # Take the newest captured frame, older ones are dropped
+                # (only waiting briefly while pipelined results may arrive)
+                frame = capture.get_latest(timeout=PIPELINE_POLL_INTERVAL if in_flight else 0.1)
             
-            # Read a frame
-            ok, frame = camera_video.read()
+            # Overlays are only drawn on frames the preview is going to show or that are recorded,
+            # which the recording decides once each frame's game update is done
+            show = preview is not None and preview.due()
+            on_updated = on_drawn = None
+            if recording is not None:
+                recording.show = show
+                on_updated, on_drawn = recording.after_update, recording.drawn
+            frame_renderer = renderer if show or video_recorders.get('annotated') is not None else None
             
-            if not ok:
+            if pool is not None:
+                # Hand the frame to the worker processes and preview the newest finished frame; results are
+                # collected right away, waiting briefly when polling or when no slot is free for the next frame
+                if frame is not None:
+                    startup.mark('first_frame')
+                timeout = PIPELINE_POLL_INTERVAL if frame is None or pool.is_full() else 0.0
+                finished = process_frame_pipelined(frame, pool, controller, telemetry, frame_renderer, args.hud,
+                                                   recorder, timeout, on_drawn, landmark_filter=landmark_filter,
+                                                   buffers=buffers, publisher=publisher, on_updated=on_updated,
+                                                   keep_image='raw' in video_recorders)
+                if finished:
+                    telemetry.maybe_report()
+                    # Preview the newest frame that was drawn on, the preview thread releases it once shown
+                    drawn = [finished_frame for finished_frame in finished if finished_frame is not None]
+                    if show and drawn:
+                        preview.submit(drawn.pop(), release=buffers.release)
+                    for finished_frame in drawn:
+                        buffers.release(finished_frame)
+                if frame is not None:
+                    buffers.frame_done()
                 continue
             
+            if frame is None:
+                continue
+            startup.mark('first_frame')
+            
             # Process the frame directly in the main thread
-            processed_frame = process_frame(frame, controller, fps_counter)
-            cv2.imshow('Body Pose Game Controller', processed_frame)
+            if lanes is not None:
+                processed_frame = process_frame_lanes(frame, lanes, telemetry, frame_renderer, args.hud, buffers,
+                                                      publisher, on_updated)
+            else:
+                processed_frame = process_frame(frame, controller, telemetry, frame_renderer, pose, args.hud,
+                                                recorder, landmark_filter, buffers, publisher, on_updated)
+            telemetry.maybe_report()
+            if governor is not None:
+                governor.observe(telemetry.timer.total())
+            
+            # Recorded frames are copied into the recorder's queue before the preview takes the frame
+            if on_drawn is not None:
+                on_drawn(processed_frame)
+            if show:
+                # The preview thread releases the frame once it has been shown
+                preview.submit(processed_frame, release=buffers.release)
+            else:
+                buffers.release(processed_frame)
+            buffers.frame_done()
     
     except KeyboardInterrupt:
         print("Program interrupted by user")
@@ -129,8 +725,46 @@ def main():
         print(f"Error: {e}")
     finally:
         # Release resources
-        camera_video.release()
-        cv2.destroyAllWindows()
+        capture.stop()
+        if preview is not None:
+            preview.stop()
+        if pool is not None:
+            # Finish the frames still in flight, so they reach the game and the recordings
+            if recording is not None:
+                recording.show = False
+            try:
+                deadline = perf_counter() + PIPELINE_DRAIN_TIMEOUT
+                while pool.queue_depth() and perf_counter() < deadline:
+                    finished = process_frame_pipelined(
+                        None, pool, controller, telemetry,
+                        renderer if video_recorders.get('annotated') is not None else None, args.hud, recorder,
+                        PIPELINE_POLL_INTERVAL, recording.drawn if recording is not None else None,
+                        landmark_filter, buffers, publisher,
+                        recording.after_update if recording is not None else None, 'raw' in video_recorders)
+                    for finished_frame in finished:
+                        buffers.release(finished_frame)
+            except Exception as e:
+                print(f"Error finishing pipelined frames: {e}")
+            pool.close()
+        if lanes is not None:
+            lanes.close()
+        else:
+            controller.close()
+        if recorder is not None:
+            recorder.close()
+        for video_recorder in video_recorders.values():
+            video_recorder.stop()
+        if publisher is not None:
+            publisher.close()
+        if isinstance(pose, AsyncPoseLandmarker):
+            pose.close()
+        if hasattr(backend, 'close'):
+            backend.close()
+        source.release()
+        print(f"Capture stats: {capture.stats()}")
+        for controller in controllers:
+            print(f"Key dispatch latency: {controller.dispatcher.latency_stats()}")
+        print(f"[telemetry] {telemetry.log_line()}")
 
 
 if __name__ == '__main__':
@@ -0,0 +1,131 @@
+# motion_gate.py
+# Skip pose inference while the scene is static and reuse the previous results
+
+from time import perf_counter, process_time, thread_time
+
+import cv2
+import numpy as np
+
+# Size of the grayscale thumbnail frames are compared at
+THUMBNAIL_SIZE = (80, 60)
+
+
+class MotionGate:
+    """
+    Pose engine wrapper that only runs inference when something moved.
+
+    Each frame is reduced to a small grayscale thumbnail and compared with the
+    thumbnail of the frame inference last ran on. While the player is tracked,
+    only the area around their landmark bounding box is compared, so movement
+    elsewhere in the room does not count. When the mean difference stays below
+    the threshold, the previous results are returned; inference still runs at
+    least every refresh_interval seconds so tracking never goes stale.
+
+    Like RoiPoseTracker it has the process() method of a pose object and can
+    wrap any of them.
+    """
+    def __init__(self, pose, threshold=4.0, refresh_interval=0.25, padding=0.15, min_visibility=0.5):
+        """
+        Args:
+            pose: Pose object (or wrapper with a process() method) used for inference
+            threshold: Mean absolute grayscale difference (0-255) below which the scene counts as static
+            refresh_interval: Longest time in seconds results are reused before inference runs anyway
+            padding: Padding around the landmark bounding box as a fraction of the thumbnail size
+            min_visibility: Minimum landmark visibility to count towards the bounding box
+        """
+        self.pose = pose
+        self.threshold = threshold
+        self.refresh_interval = refresh_interval
+        self.padding = padding
+        self.min_visibility = min_visibility
+
+        self.processed = 0
+        self.skipped = 0
+        self.last_motion = 0.0
+        self._inference_cpu = 0.0  # CPU seconds of the whole process while inference ran
+        self._gate_cpu = 0.0       # CPU seconds of the calling thread spent comparing thumbnails
+        self._reference = None     # thumbnail of the frame inference last ran on
+        self._results = None
+        self._processed_at = 0.0
+        self._region = None        # (x0, y0, x1, y1) in thumbnail pixels to compare, None for all
+
+    def _thumbnail(self, image_rgb):
+        """Return a small grayscale version of the frame, averaged enough to ignore sensor noise."""
+        width, height = THUMBNAIL_SIZE
+        small = cv2.resize(image_rgb, (width * 4, height * 4), interpolation=cv2.INTER_LINEAR)
+        gray = cv2.cvtColor(small, cv2.COLOR_RGB2GRAY)
+        return cv2.resize(gray, THUMBNAIL_SIZE, interpolation=cv2.INTER_AREA)
+
+    def _motion(self, thumbnail):
+        """Return the mean absolute difference to the reference thumbnail within the compared region."""
+        if self._region is None:
+            return float(cv2.absdiff(thumbnail, self._reference).mean())
+        x0, y0, x1, y1 = self._region
+        return float(cv2.absdiff(thumbnail[y0:y1, x0:x1], self._reference[y0:y1, x0:x1]).mean())
+
+    def _landmark_region(self, results):
+        """Return the padded landmark bounding box in thumbnail pixels, or None to compare the whole frame."""
+        if not results.pose_landmarks:
+            return None
+        points = np.array([(landmark.x, landmark.y) for landmark in results.pose_landmarks.landmark
+                           if landmark.visibility >= self.min_visibility])
+        if len(points) < 2:
+            return None
+        width, height = THUMBNAIL_SIZE
+        (x0, y0), (x1, y1) = points.min(axis=0) - self.padding, points.max(axis=0) + self.padding
+        x0, x1 = int(max(x0, 0) * width), int(np.ceil(min(x1, 1) * width))
+        y0, y1 = int(max(y0, 0) * height), int(np.ceil(min(y1, 1) * height))
+        if x1 - x0 < 2 or y1 - y0 < 2:
+            return None
+        return x0, y0, x1, y1
+
+    def process(self, image_rgb):
+        """
+        Detect pose landmarks, or return the previous results if nothing moved
+
+        Args:
+            image_rgb: Full RGB frame
+
+        Returns:
+            Pose detection results
+        """
+        # The gate runs entirely on this thread, so only this thread's CPU time is charged to it
+        gate_start = thread_time()
+        thumbnail = self._thumbnail(image_rgb)
+        now = perf_counter()
+        if self._reference is not None and now - self._processed_at < self.refresh_interval:
+            self.last_motion = self._motion(thumbnail)
+            if self.last_motion < self.threshold:
+                self.skipped += 1
+                self._gate_cpu += thread_time() - gate_start
+                return self._results
+        self._gate_cpu += thread_time() - gate_start
+
+        # MediaPipe runs its graph on its own threads while this one waits, so inference
+        # can only be measured process-wide (which also counts other threads' work)
+        inference_start = process_time()
+        self._results = self.pose.process(image_rgb)
+        self._inference_cpu += process_time() - inference_start
+        self.processed += 1
+        self._reference = thumbnail
+        self._processed_at = now
+        self._region = self._landmark_region(self._results)
+        return self._results
+
+    def stats(self):
+        """
+        Return counters for telemetry reports
+
+        The CPU saved is an estimate: the mean process-wide CPU time of an
+        inference times the number of skipped frames, minus the CPU time the
+        gate itself used, clamped at 0. Inference CPU includes whatever other
+        threads did at the same time.
+        """
+        frames = self.processed + self.skipped
+        mean_inference_cpu = self._inference_cpu / self.processed if self.processed else 0.0
+        return {
+            'processed': self.processed,
+            'skipped': self.skipped,
+            'skip_ratio': round(self.skipped / frames, 3) if frames else 0.0,
+            'cpu_saved_est_s': round(max(mean_inference_cpu * self.skipped - self._gate_cpu, 0.0), 3),
+        }
@@ -0,0 +1,168 @@
+# overlay.py
+# Draw all on-screen feedback in a single pass onto the frame buffer
+
+import cv2
+import numpy as np
+
+from landmarks import POSE_CONNECTIONS, X, Y, VISIBILITY
+
+WHITE = (255, 255, 255)
+GREEN = (0, 255, 0)
+CONNECTION_COLOR = (49, 125, 237)
+
+# Landmarks less visible than this are not drawn (same as mediapipe's drawing utils)
+VISIBILITY_THRESHOLD = 0.5
+
+
+class StaticLayer:
+    """Pre-rendered overlay stored as the coordinates and colors of its drawn pixels"""
+    __slots__ = ('rows', 'cols', 'pixels')
+
+    def __init__(self, layer):
+        # Only the pixels that were drawn on are composited back
+        mask = layer.any(axis=2)
+        self.rows, self.cols = np.nonzero(mask)
+        self.pixels = layer[self.rows, self.cols]
+
+    def composite(self, frame):
+        """Copy the layer's drawn pixels onto the frame in place."""
+        frame[self.rows, self.cols] = self.pixels
+
+
+class OverlayRenderer:
+    """
+    Render landmarks, grid, status text, FPS and telemetry HUD onto a frame.
+
+    Everything is drawn in place on the frame that is passed in, so no copies
+    of the full image are made. The 3x3 grid and the start instructions never
+    change for a given resolution and are rendered once, then composited.
+    """
+    def __init__(self, column_fractions=None, row_fractions=None):
+        """
+        Args:
+            column_fractions: Optional (left, right) grid columns as fractions of the width (default: thirds)
+            row_fractions: Optional (top, bottom) grid rows as fractions of the height (default: thirds)
+        """
+        self.column_fractions = column_fractions
+        self.row_fractions = row_fractions
+        self._layers = {}
+
+    def _static_layer(self, name, width, height):
+        """Return the cached static layer for a resolution, rendering it on first use."""
+        key = (name, width, height)
+        layer = self._layers.get(key)
+        if layer is None:
+            canvas = np.zeros((height, width, 3), dtype=np.uint8)
+            if name == 'grid':
+                column_bounds = row_bounds = None
+                if self.column_fractions:
+                    column_bounds = tuple(int(fraction * width) for fraction in self.column_fractions)
+                if self.row_fractions:
+                    row_bounds = tuple(int(fraction * height) for fraction in self.row_fractions)
+                draw_grid(canvas, column_bounds=column_bounds, row_bounds=row_bounds)
+            elif name == 'instructions':
+                cv2.putText(canvas, 'JOIN BOTH HANDS TO START THE GAME.', (5, height - 10),
+                            cv2.FONT_HERSHEY_PLAIN, 2, GREEN, 3)
+            layer = StaticLayer(canvas)
+            self._layers[key] = layer
+        return layer
+
+    def render(self, frame, landmarks=None, show_grid=False, show_instructions=False,
+               horizontal_position=None, mid_x=None, posture=None, mid_y=None, fps=None, hud_lines=None):
+        """
+        Draw all requested overlays onto the frame in place
+
+        Args:
+            frame: BGR image to draw on
+            landmarks: LandmarkFrame to draw (None to skip)
+            show_grid: Whether to draw the 3x3 position grid
+            show_instructions: Whether to draw the start instructions
+            horizontal_position: Horizontal position label to write (None to skip)
+            mid_x: X-coordinate of the person's midpoint
+            posture: Vertical posture label to write (None to skip)
+            mid_y: Y-coordinate of the person's midpoint
+            fps: Frames per second value to write (None to skip)
+            hud_lines: Telemetry text lines to write below the FPS (None to skip)
+
+        Returns:
+            The same frame with the overlays drawn
+        """
+        height, width, _ = frame.shape
+
+        if landmarks is not None:
+            draw_landmarks(frame, landmarks)
+
+        if show_grid:
+            self._static_layer('grid', width, height).composite(frame)
+
+        if show_instructions:
+            self._static_layer('instructions', width, height).composite(frame)
+
+        if horizontal_position is not None:
+            cv2.putText(frame, horizontal_position, (5, height - 10), cv2.FONT_HERSHEY_PLAIN, 2, WHITE, 3)
+            cv2.circle(frame, (mid_x, height//2), 5, GREEN, -1)
+
+        if posture is not None:
+            cv2.putText(frame, posture, (5, height - 50), cv2.FONT_HERSHEY_PLAIN, 2, WHITE, 3)
+            cv2.circle(frame, (width//2, mid_y), 5, GREEN, -1)
+
+        if fps is not None:
+            cv2.putText(frame, f'FPS: {int(fps)}', (10, 30), cv2.FONT_HERSHEY_PLAIN, 2, GREEN, 3)
+
+        if hud_lines:
+            for i, line in enumerate(hud_lines):
+                cv2.putText(frame, line, (10, 60 + 22 * i), cv2.FONT_HERSHEY_PLAIN, 1.3, GREEN, 2)
+
+        return frame
+
+
+def draw_grid(image, color=WHITE, thickness=2, column_bounds=None, row_bounds=None):
+    """
+    Draw the 3x3 position grid onto an image in place
+
+    Args:
+        image: Image to draw on
+        color: Line color
+        thickness: Line thickness in pixels
+        column_bounds: Optional (left, right) column boundaries in pixels (default: thirds of the width)
+        row_bounds: Optional (top, bottom) row boundaries in pixels (default: thirds of the height)
+    """
+    height, width, _ = image.shape
+    left, right = column_bounds or (width // 3, 2 * (width // 3))
+    top, bottom = row_bounds or (height // 3, 2 * (height // 3))
+
+    # Column dividing lines (vertical)
+    cv2.line(image, (left, 0), (left, height), color, thickness)
+    cv2.line(image, (right, 0), (right, height), color, thickness)
+
+    # Row dividing lines (horizontal)
+    cv2.line(image, (0, top), (width, top), color, thickness)
+    cv2.line(image, (0, bottom), (width, bottom), color, thickness)
+
+
+def draw_landmarks(image, landmarks, point_color=WHITE, line_color=CONNECTION_COLOR):
+    """
+    Draw the pose skeleton onto an image in place, like mediapipe's draw_landmarks
+
+    Args:
+        image: Image to draw on
+        landmarks: LandmarkFrame with normalized coordinates
+        point_color: Color of the landmark points
+        line_color: Color of the connections between landmarks
+    """
+    height, width, _ = image.shape
+    data = landmarks.data
+
+    # Only landmarks that are visible and inside the image are drawn
+    visible = ((data[:, VISIBILITY] >= VISIBILITY_THRESHOLD) & (data[:, X] >= 0) & (data[:, X] <= 1)
+               & (data[:, Y] >= 0) & (data[:, Y] <= 1)).tolist()
+    xs = np.minimum(data[:, X] * width, width - 1).astype(np.int32).tolist()
+    ys = np.minimum(data[:, Y] * height, height - 1).astype(np.int32).tolist()
+
+    for start, end in POSE_CONNECTIONS:
+        if visible[start] and visible[end]:
+            cv2.line(image, (xs[start], ys[start]), (xs[end], ys[end]), line_color, 2)
+
+    for index, is_visible in enumerate(visible):
+        if is_visible:
+            cv2.circle(image, (xs[index], ys[index]), 4, point_color, 3)
@@ -1,19 +1,142 @@
 # pose_detection.py
 # Handle all pose detection related functions
 
+import threading
+
 import cv2
-import mediapipe as mp
-import matplotlib.pyplot as plt
-from math import hypot
+import numpy as np
+
+from landmarks import (
+    LandmarkFrame, classify_hands_joined, classify_position_horizontal, classify_position_vertical
+)
+
+# MediaPipe is imported and its graphs are built on first use. Importing it
+# takes around a second, so the live loop does this on a background thread
+# while the camera opens (see start_warm_up). The module attributes mp_pose,
+# mp_drawing, pose_image and pose_video are still available and resolve lazily.
+_engines = {}
+_engines_lock = threading.Lock()
+
+# Warm-ups in progress: (kind, model_complexity) -> Event set once the warm-up inference has finished.
+# Pose.process() is not thread-safe, so the engine is only handed out after that.
+_warm_ups = {}
+
+
+def _solutions():
+    """Return mediapipe.solutions, importing mediapipe on first use."""
+    import mediapipe as mp
+    return mp.solutions
+
+
+def __getattr__(name):
+    """Resolve the lazily created module attributes."""
+    if name == 'mp_pose':
+        return _solutions().pose
+    if name == 'mp_drawing':
+        return _solutions().drawing_utils
+    if name == 'pose_image':
+        return get_pose_engine('image')
+    if name == 'pose_video':
+        return get_pose_engine('video')
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def create_pose_video(model_complexity=1):
+    """
+    Create a Pose object for video streams with the project's confidence settings
+    
+    Args:
+        model_complexity: Pose landmark model complexity (0, 1 or 2)
+        
+    Returns:
+        Mediapipe pose object
+    """
+    return _solutions().pose.Pose(static_image_mode=False, model_complexity=model_complexity,
+                                  min_detection_confidence=0.7, min_tracking_confidence=0.7)
+
+
+def create_pose_image(model_complexity=1):
+    """
+    Create a Pose object for independent still images
+    
+    Args:
+        model_complexity: Pose landmark model complexity (0, 1 or 2)
+        
+    Returns:
+        Mediapipe pose object
+    """
+    return _solutions().pose.Pose(static_image_mode=True, min_detection_confidence=0.5,
+                                  model_complexity=model_complexity)
+
+
+def get_pose_engine(kind='video', model_complexity=1):
+    """
+    Return the shared Pose object of a kind, building its graph on first use
+    
+    Args:
+        kind: 'video' for the tracking pose used on camera streams, 'image' for still images
+        model_complexity: Pose landmark model complexity (0, 1 or 2)
+        
+    Returns:
+        Mediapipe pose object
+    """
+    warm_up = _warm_ups.get((kind, model_complexity))
+    if warm_up is not None:
+        warm_up.wait()
+    return _build_pose_engine(kind, model_complexity)
 
-# Initialize mediapipe pose class
-mp_pose = mp.solutions.pose
-mp_drawing = mp.solutions.drawing_utils
 
-# Setup the Pose functions with optimized parameters
-pose_image = mp_pose.Pose(static_image_mode=True, min_detection_confidence=0.5, model_complexity=1)
-pose_video = mp_pose.Pose(static_image_mode=False, model_complexity=1, min_detection_confidence=0.7,
-                          min_tracking_confidence=0.7)
+def _build_pose_engine(kind, model_complexity):
+    """Return the shared Pose object of a kind, building it if needed, without waiting for a warm-up."""
+    key = (kind, model_complexity)
+    with _engines_lock:
+        engine = _engines.get(key)
+        if engine is None:
+            if kind == 'video':
+                engine = create_pose_video(model_complexity)
+            elif kind == 'image':
+                engine = create_pose_image(model_complexity)
+            else:
+                raise ValueError(f"Unknown pose engine kind: {kind}")
+            _engines[key] = engine
+        return engine
+
+
+def start_warm_up(kind='video', model_complexity=1, on_ready=None):
+    """
+    Build a pose engine and run one inference on a blank frame on a background thread
+    
+    get_pose_engine() waits for the warm-up inference to finish before it
+    returns the engine, so the first frame never runs on it at the same time.
+    
+    Args:
+        kind: Pose engine kind passed to get_pose_engine
+        model_complexity: Pose landmark model complexity (0, 1 or 2)
+        on_ready: Optional callback called once the warm-up inference has finished
+        
+    Returns:
+        The started thread
+    """
+    key = (kind, model_complexity)
+    done = _warm_ups[key] = threading.Event()
+    
+    def warm_up():
+        try:
+            engine = _build_pose_engine(kind, model_complexity)
+            engine.process(np.zeros((480, 640, 3), dtype=np.uint8))
+        except Exception as e:
+            # The live loop will report the error when it builds the engine itself
+            print(f"Error warming up pose engine: {e}")
+            return
+        finally:
+            done.set()
+            _warm_ups.pop(key, None)
+        if on_ready is not None:
+            on_ready()
+    
+    thread = threading.Thread(target=warm_up, name='pose-warm-up', daemon=True)
+    thread.start()
+    return thread
 
 
 def detect_pose(image, pose, draw=False, display=False):
@@ -29,8 +152,8 @@ def detect_pose(image, pose, draw=False, display=False):
     Returns:
         Tuple of (processed image, pose detection results)
     """
-    # Create a copy of the input image
-    output_image = image.copy()
+    # Only copy the input image when something is drawn on it
+    output_image = image.copy() if draw or display else image
     
     # Convert the image from BGR into RGB format
     imageRGB = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
@@ -41,6 +164,7 @@ def detect_pose(image, pose, draw=False, display=False):
     # Check if any landmarks are detected and are specified to be drawn
     if results.pose_landmarks and draw:
         # Draw Pose Landmarks on the output image
+        mp_pose, mp_drawing = _solutions().pose, _solutions().drawing_utils
         mp_drawing.draw_landmarks(image=output_image, landmark_list=results.pose_landmarks,
                                 connections=mp_pose.POSE_CONNECTIONS,
                                 landmark_drawing_spec=mp_drawing.DrawingSpec(color=(255,255,255),
@@ -50,6 +174,9 @@ def detect_pose(image, pose, draw=False, display=False):
 
     # Check if the original input image and the resultant image are specified to be displayed
     if display:
+        # Plotting is only needed here, keep it off the live path
+        import matplotlib.pyplot as plt
+        
         # Display the original input image and the resultant image
         plt.figure(figsize=[22,22])
         plt.subplot(121);plt.imshow(image[:,:,::-1]);plt.title("Original Image");plt.axis('off');
@@ -72,31 +199,15 @@ def check_hands_joined(image, results, draw=True, display=False):
     Returns:
         Tuple of (processed image, hands joined status)
     """
-    # Create a copy of the input image
-    output_image = image.copy()
-    
     # Get the height and width of the input image
     height, width, _ = image.shape
     
-    # Get the left wrist landmark x and y coordinates
-    left_wrist_landmark = (results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST].x * width,
-                          results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_WRIST].y * height)
-
-    # Get the right wrist landmark x and y coordinates
-    right_wrist_landmark = (results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_WRIST].x * width,
-                           results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_WRIST].y * height)
-    
-    # Calculate the euclidean distance between the left and right wrist
-    euclidean_distance = int(hypot(left_wrist_landmark[0] - right_wrist_landmark[0],
-                                   left_wrist_landmark[1] - right_wrist_landmark[1]))
+    # Classify without touching the pixels
+    hand_status, euclidean_distance = classify_hands_joined(LandmarkFrame.from_results(results, width, height))
+    color = (0, 255, 0) if hand_status == 'Hands Joined' else (0, 0, 255)  # Green / Red
     
-    # Compare the distance between the wrists with an appropriate threshold
-    if euclidean_distance < 300:  # Threshold for detection
-        hand_status = 'Hands Joined'
-        color = (0, 255, 0)  # Green
-    else:
-        hand_status = 'Hands Not Joined'
-        color = (0, 0, 255)  # Red
+    # Only copy the input image when something is drawn on it
+    output_image = image.copy() if draw or display else image
         
     # Check if the hand status and distance should be drawn on the image
     if draw:
@@ -108,6 +219,9 @@ def check_hands_joined(image, results, draw=True, display=False):
                     cv2.FONT_HERSHEY_PLAIN, 2, color, 3)
         
     if display:
+        # Plotting is only needed here, keep it off the live path
+        import matplotlib.pyplot as plt
+        
         # Display the output image
         plt.figure(figsize=[10,10])
         plt.imshow(output_image[:,:,::-1]);plt.title("Output Image");plt.axis('off');
@@ -129,35 +243,20 @@ def check_position_horizontal(image, results, draw=False, display=False):
     Returns:
         Tuple of (processed image, horizontal position)
     """
-    # Initialize horizontal position
-    horizontal_position = None
-    
     # Get the height and width of the image
     height, width, _ = image.shape
     
-    # Create a copy of the input image
-    output_image = image.copy()
-    
-    # Calculate the width of each column (divide screen into 3 columns)
-    column_width = width // 3
-    
-    # Get the x-coordinate of the left and right shoulders
-    left_x = int(results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER].x * width)
-    right_x = int(results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER].x * width)
-    
-    # Calculate midpoint between shoulders to determine person's center position
-    mid_x = (left_x + right_x) // 2
+    # Classify without touching the pixels
+    horizontal_position, mid_x = classify_position_horizontal(LandmarkFrame.from_results(results, width, height))
     
-    # Determine horizontal position based on which column the person's midpoint is in
-    if mid_x < column_width:
-        horizontal_position = 'Left'
-    elif mid_x < 2 * column_width:
-        horizontal_position = 'Center'
-    else:
-        horizontal_position = 'Right'
+    # Only copy the input image when something is drawn on it
+    output_image = image.copy() if draw or display else image
         
     # Draw position information and grid if requested
     if draw:
+        # Calculate the width of each column (divide screen into 3 columns)
+        column_width = width // 3
+        
         # Write the horizontal position on the image
         cv2.putText(output_image, horizontal_position, (5, height - 10), cv2.FONT_HERSHEY_PLAIN, 
                     2, (255, 255, 255), 3)
@@ -175,6 +274,9 @@ def check_position_horizontal(image, results, draw=False, display=False):
         cv2.circle(output_image, (mid_x, height//2), 5, (0, 255, 0), -1)
         
     if display:
+        # Plotting is only needed here, keep it off the live path
+        import matplotlib.pyplot as plt
+        
         # Display the output image
         plt.figure(figsize=[10,10])
         plt.imshow(output_image[:,:,::-1]);plt.title("Output Image");plt.axis('off');
@@ -200,26 +302,11 @@ def check_position_vertical(image, results, MID_Y=None, draw=False, display=Fals
     # Get the height and width of the image
     height, width, _ = image.shape
     
-    # Create a copy of the input image
-    output_image = image.copy()
-    
-    # Calculate the height of each row (divide screen into 3 rows)
-    row_height = height // 3
-    
-    # Get the y-coordinate of the left and right shoulders
-    left_y = int(results.pose_landmarks.landmark[mp_pose.PoseLandmark.RIGHT_SHOULDER].y * height)
-    right_y = int(results.pose_landmarks.landmark[mp_pose.PoseLandmark.LEFT_SHOULDER].y * height)
-
-    # Calculate the y-coordinate of the mid-point of both shoulders
-    actual_mid_y = abs(right_y + left_y) // 2
+    # Classify without touching the pixels
+    posture, actual_mid_y = classify_position_vertical(LandmarkFrame.from_results(results, width, height))
     
-    # Determine vertical position based on which row the person's midpoint is in
-    if actual_mid_y < row_height:
-        posture = 'Top' # Jumping
-    elif actual_mid_y < 2 * row_height:
-        posture = 'Middle' # Standing
-    else:
-        posture = 'Bottom' # Crouching
+    # Only copy the input image when something is drawn on it
+    output_image = image.copy() if draw or display else image
         
     # Draw position information and grid if requested
     if draw:
@@ -232,9 +319,135 @@ def check_position_vertical(image, results, MID_Y=None, draw=False, display=Fals
         cv2.circle(output_image, (width//2, actual_mid_y), 5, (0, 255, 0), -1)
         
     if display:
+        # Plotting is only needed here, keep it off the live path
+        import matplotlib.pyplot as plt
+        
         # Display the output image
         plt.figure(figsize=[10,10])
         plt.imshow(output_image[:,:,::-1]);plt.title("Output Image");plt.axis('off');
     else:
         # Return the output image and posture
-        return output_image, posture
\ No newline at end of file
+        return output_image, posture
+
+
+class RoiPoseTracker:
+    """
+    Run pose inference on a padded crop around the person instead of the full frame.
+
+    The crop follows the bounding box of the previous frame's landmarks and is
+    scaled down to a fixed inference size. Landmarks are mapped back to
+    normalized full-frame coordinates, so the results can be used exactly like
+    the output of pose.process(). When no person is found, or the landmarks
+    collapse into a box smaller than min_fraction of the frame, the next frame
+    is searched in full (downscaled to search_size).
+    """
+    def __init__(self, pose, inference_size=256, search_size=640, padding=0.25, min_visibility=0.5,
+                 min_fraction=0.1):
+        """
+        Args:
+            pose: Mediapipe pose object used for inference
+            inference_size: Longest side in pixels of the crop passed to the model (None to never downscale)
+            search_size: Longest side in pixels of the frame when searching the full frame (None to never downscale)
+            padding: Padding around the landmark bounding box as a fraction of its size
+            min_visibility: Minimum landmark visibility to count towards the bounding box
+            min_fraction: Smallest side of the padded region as a fraction of the frame's shorter side
+        """
+        self.pose = pose
+        self.inference_size = inference_size
+        self.search_size = search_size
+        self.padding = padding
+        self.min_visibility = min_visibility
+        self.min_fraction = min_fraction
+
+        # Region (x0, y0, x1, y1) in pixels to crop next, None searches the full frame
+        self.roi = None
+        self.tracked_frames = 0
+        self.search_frames = 0
+
+    def process(self, image_rgb):
+        """
+        Detect pose landmarks, cropping to the tracked region when available
+
+        Args:
+            image_rgb: Full RGB frame
+
+        Returns:
+            Pose detection results with landmarks in full-frame normalized coordinates
+        """
+        height, width, _ = image_rgb.shape
+
+        if self.roi is None:
+            x0, y0, x1, y1 = 0, 0, width, height
+            max_size = self.search_size
+            self.search_frames += 1
+        else:
+            x0, y0, x1, y1 = self.roi
+            max_size = self.inference_size
+            self.tracked_frames += 1
+
+        crop_width, crop_height = x1 - x0, y1 - y0
+        crop = image_rgb[y0:y1, x0:x1]
+
+        # Scale the crop down so its longest side matches the inference size
+        scale = max_size / max(crop_width, crop_height, 1) if max_size else 1
+        if scale < 1:
+            crop = cv2.resize(crop, (max(1, round(crop_width * scale)), max(1, round(crop_height * scale))),
+                              interpolation=cv2.INTER_AREA)
+        else:
+            crop = np.ascontiguousarray(crop)
+
+        results = self.pose.process(crop)
+
+        if not results.pose_landmarks:
+            # Tracking lost, search the full frame next time
+            self.roi = None
+            return results
+
+        # Map landmarks from crop coordinates back to full-frame normalized coordinates
+        for landmark in results.pose_landmarks.landmark:
+            landmark.x = (x0 + landmark.x * crop_width) / width
+            landmark.y = (y0 + landmark.y * crop_height) / height
+            landmark.z = landmark.z * crop_width / width
+
+        self.roi = self._next_roi(results.pose_landmarks, width, height)
+        return results
+
+    def _next_roi(self, pose_landmarks, width, height):
+        """Compute the padded crop region around the given landmarks, or None for the full frame."""
+        points = [(landmark.x * width, landmark.y * height) for landmark in pose_landmarks.landmark
+                  if landmark.visibility >= self.min_visibility]
+        if len(points) < 2:
+            return None
+
+        xs = [x for x, _ in points]
+        ys = [y for _, y in points]
+        center_x = (min(xs) + max(xs)) / 2
+        center_y = (min(ys) + max(ys)) / 2
+
+        # Square region around the person, padded on every side
+        side = max(max(xs) - min(xs), max(ys) - min(ys)) * (1 + 2 * self.padding)
+        
+        # Landmarks bunched together or clamped at the frame edge are not a person worth tracking
+        if side < max(1, self.min_fraction * min(width, height)):
+            return None
+        
+        # Keep the current region while the person stays well inside it, so the
+        # model's own tracking sees a stable image instead of a shifting crop
+        if self.roi is not None:
+            x0, y0, x1, y1 = self.roi
+            current_side = max(x1 - x0, y1 - y0)
+            margin = self.padding / 2 * current_side / (1 + 2 * self.padding)
+            if (min(xs) >= x0 + margin and max(xs) <= x1 - margin and min(ys) >= y0 + margin
+                    and max(ys) <= y1 - margin and side >= 0.6 * current_side):
+                return self.roi
+        crop_width = int(min(side, width))
+        crop_height = int(min(side, height))
+
+        # The crop would cover almost the whole frame anyway
+        if crop_width * crop_height >= 0.9 * width * height:
+            return None
+
+        # Shift the region inside the frame rather than shrinking it at the edges
+        x0 = int(min(max(center_x - crop_width / 2, 0), width - crop_width))
+        y0 = int(min(max(center_y - crop_height / 2, 0), height - crop_height))
+        return x0, y0, x0 + crop_width, y0 + crop_height
@@ -0,0 +1,170 @@
+# pose_landmarker.py
+# Asynchronous pose engine on the MediaPipe Tasks PoseLandmarker in LIVE_STREAM mode
+#
+# The legacy Pose.process() blocks the frame loop for the whole inference.
+# detect_async() returns at once and the landmarks arrive on MediaPipe's own
+# thread, so the frame loop keeps capturing, converting and drawing while the
+# model runs. Frames that arrive while an inference is in flight are dropped,
+# like the capture thread drops frames nobody picked up.
+#
+# The PoseLandmarker needs a model bundle, e.g. pose_landmarker_full.task from
+# https://ai.google.dev/edge/mediapipe/solutions/vision/pose_landmarker
+
+import threading
+from time import perf_counter
+
+from telemetry import RollingStats
+
+DEFAULT_POSE_MODEL = 'pose_landmarker_full.task'
+
+
+class LandmarkList:
+    """Landmarks of one pose, shaped like the legacy NormalizedLandmarkList"""
+    __slots__ = ('landmark',)
+
+    def __init__(self, landmark):
+        self.landmark = landmark
+
+
+class LandmarkerResults:
+    """
+    PoseLandmarker output shaped like the results of the legacy Pose.process()
+
+    Results arrive after the frame they were detected in, so they carry the
+    capture timestamp of that frame. The same results are returned until newer
+    ones arrive; the frame loop sets overlay once it has processed them, so it
+    only draws them again on later frames.
+    """
+    __slots__ = ('pose_landmarks', 'timestamp', 'overlay')
+
+    def __init__(self, pose_landmarks=None, timestamp=None):
+        self.pose_landmarks = pose_landmarks  # LandmarkList, or None if nobody was detected
+        self.timestamp = timestamp            # capture time of the frame, None before the first result
+        self.overlay = None                   # overlays drawn for these results, None until processed
+
+
+class AsyncPoseLandmarker:
+    """
+    Pose engine running the Tasks PoseLandmarker asynchronously.
+
+    process() hands the frame to the landmarker unless an inference is still
+    in flight (the frame is then dropped) and returns the newest results that
+    have arrived, which usually belong to an earlier frame. Like the other
+    pose engines it has a process() method, so it can be used in place of
+    pose_video; the results' timestamp tells which frame they belong to.
+    """
+    def __init__(self, model_path=DEFAULT_POSE_MODEL, num_poses=1, min_detection_confidence=0.7,
+                 min_tracking_confidence=0.7, max_in_flight=1, window=300):
+        """
+        Args:
+            model_path: PoseLandmarker model bundle (.task)
+            num_poses: Maximum number of people to detect (only the first one is returned)
+            min_detection_confidence: Minimum confidence for a person to be detected
+            min_tracking_confidence: Minimum confidence for the person to keep being tracked
+            max_in_flight: Number of frames that may be in the landmarker at once
+            window: Number of recent submit-to-result latencies to keep
+        """
+        # Imported here like in pose_detection, MediaPipe takes around a second to import
+        import mediapipe as mp
+        from mediapipe.tasks.python import BaseOptions, vision
+
+        self._mp = mp
+        self.max_in_flight = max_in_flight
+        self.submitted = 0
+        self.dropped = 0
+        self.completed = 0
+        self.latency = RollingStats(window)  # submit -> result received
+
+        self._results = LandmarkerResults()
+        self._pending = {}  # timestamp in ms -> (capture timestamp, submitted at)
+        self._last_ms = -1
+        self._condition = threading.Condition()
+
+        options = vision.PoseLandmarkerOptions(
+            base_options=BaseOptions(model_asset_path=model_path),
+            running_mode=vision.RunningMode.LIVE_STREAM,
+            num_poses=num_poses,
+            min_pose_detection_confidence=min_detection_confidence,
+            min_tracking_confidence=min_tracking_confidence,
+            result_callback=self._on_result)
+        self._landmarker = vision.PoseLandmarker.create_from_options(options)
+
+    def process(self, image_rgb, timestamp=None):
+        """
+        Submit a frame unless the landmarker is busy and return the newest results
+
+        Args:
+            image_rgb: Full RGB frame; it is copied, so it may be reused once process() returns
+            timestamp: Capture time of the frame on the perf_counter() clock (default: now)
+
+        Returns:
+            LandmarkerResults of the newest frame processed so far
+        """
+        if timestamp is None:
+            timestamp = perf_counter()
+        with self._condition:
+            if len(self._pending) >= self.max_in_flight:
+                self.dropped += 1
+                return self._results
+            # The landmarker needs strictly increasing timestamps in milliseconds
+            timestamp_ms = max(int(timestamp * 1000), self._last_ms + 1)
+            self._last_ms = timestamp_ms
+            self._pending[timestamp_ms] = (timestamp, perf_counter())
+            self.submitted += 1
+
+        try:
+            image = self._mp.Image(image_format=self._mp.ImageFormat.SRGB, data=image_rgb)
+            self._landmarker.detect_async(image, timestamp_ms)
+        except Exception:
+            # The frame never reaches the landmarker, so it must not keep its in-flight slot
+            with self._condition:
+                if self._pending.pop(timestamp_ms, None) is not None:
+                    self.dropped += 1
+                self._condition.notify_all()
+            raise
+        with self._condition:
+            return self._results
+
+    def _on_result(self, result, output_image, timestamp_ms):
+        """Store the results of a frame, called on MediaPipe's thread."""
+        received_at = perf_counter()
+        pose_landmarks = LandmarkList(result.pose_landmarks[0]) if result.pose_landmarks else None
+        with self._condition:
+            # Earlier frames the landmarker dropped itself never get a result
+            for pending_ms in [ms for ms in self._pending if ms < timestamp_ms]:
+                del self._pending[pending_ms]
+                self.dropped += 1
+            entry = self._pending.pop(timestamp_ms, None)
+            if entry is None:
+                return
+            timestamp, submitted_at = entry
+            self._results = LandmarkerResults(pose_landmarks, timestamp)
+            self.completed += 1
+            self.latency.add(received_at - submitted_at)
+            self._condition.notify_all()
+
+    def wait(self, timeout=None):
+        """
+        Wait until the frames in flight have their results
+
+        Returns:
+            True if nothing is in flight any more, False on timeout
+        """
+        with self._condition:
+            return self._condition.wait_for(lambda: not self._pending, timeout)
+
+    def close(self):
+        """Shut the landmarker down."""
+        self._landmarker.close()
+
+    def stats(self):
+        """Return counters for telemetry reports"""
+        latency = self.latency.summary()
+        with self._condition:
+            return {
+                'submitted': self.submitted,
+                'completed': self.completed,
+                'dropped': self.dropped,
+                'latency_ms_p50': round(latency['p50'] * 1000, 1),
+                'latency_ms_p95': round(latency['p95'] * 1000, 1),
+            }
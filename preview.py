@@ -0,0 +1,275 @@
+# preview.py
+# Off-thread, rate-limited preview of the annotated frames: a local window or an MJPEG stream
+#
+# The frame loop only hands over a reference to a finished frame; downscaling,
+# display and JPEG encoding happen on the preview's own thread at a lower rate,
+# so watching a kiosk does not slow down the control loop.
+
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from time import perf_counter
+
+import cv2
+
+PREVIEW_KINDS = ('window', 'mjpeg')
+
+WINDOW_NAME = 'Body Pose Game Controller'
+BOUNDARY = b'frame'
+
+
+class FramePreview:
+    """
+    Show finished frames at a limited rate and size on a background thread.
+
+    The frame loop asks due() before drawing the overlays, so overlays are
+    only rendered for the frames the preview will actually show, then passes
+    the frame to submit(). Only the newest submitted frame is kept; frames
+    replaced before the preview thread picked them up are counted as dropped.
+    """
+    def __init__(self, fps=15.0, width=640):
+        """
+        Args:
+            fps: Highest rate in frames per second the preview is updated at
+            width: Width in pixels the frames are downscaled to (None keeps the full size)
+        """
+        self.interval = 1.0 / fps
+        self.width = width
+        self.frames_shown = 0
+        self.frames_dropped = 0
+        self.closed = False  # set when the viewer asked to quit (e.g. ESC in the window)
+
+        self._frame = None
+        self._due_at = 0.0
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Start the preview thread"""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='preview', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the preview thread and wait for it to exit"""
+        self._running = False
+        with self._condition:
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+
+    def due(self):
+        """Return whether the next submitted frame would be shown, i.e. whether it is worth drawing."""
+        return perf_counter() >= self._due_at
+
+    def submit(self, frame, release=None):
+        """
+        Hand a finished frame to the preview thread without waiting
+
+        The frame must not be modified afterwards.
+
+        Args:
+            frame: BGR frame to show
+            release: Optional callback called with the frame once the preview is done with it
+                (e.g. FrameBufferPool.release), also when the frame is replaced before it was shown
+        """
+        self._due_at = perf_counter() + self.interval
+        with self._condition:
+            replaced = self._frame
+            if replaced is not None:
+                self.frames_dropped += 1
+            self._frame = (frame, release)
+            self._condition.notify()
+        self._release(replaced)
+
+    def _run(self):
+        """Preview loop running on the background thread"""
+        self._open()
+        try:
+            while self._running:
+                with self._condition:
+                    self._condition.wait_for(lambda: self._frame is not None or not self._running,
+                                             timeout=self._idle_timeout())
+                    submitted, self._frame = self._frame, None
+                if submitted is not None:
+                    self._show(self._downscale(submitted[0]))
+                    self._release(submitted)
+                    self.frames_shown += 1
+                self._poll()
+        finally:
+            with self._condition:
+                submitted, self._frame = self._frame, None
+            self._release(submitted)
+            self._close()
+
+    @staticmethod
+    def _release(submitted):
+        """Hand a submitted (frame, release) pair back to its owner."""
+        if submitted is not None and submitted[1] is not None:
+            submitted[1](submitted[0])
+
+    def _downscale(self, frame):
+        """Return the frame resized to the preview width."""
+        height, width, _ = frame.shape
+        if self.width is None or width <= self.width:
+            return frame
+        return cv2.resize(frame, (self.width, height * self.width // width), interpolation=cv2.INTER_AREA)
+
+    def _idle_timeout(self):
+        """Return how long the thread may wait for a frame before _poll() must run again."""
+        return None
+
+    def _open(self):
+        """Set up the output on the preview thread"""
+
+    def _show(self, frame):
+        """Output one downscaled frame"""
+        raise NotImplementedError
+
+    def _poll(self):
+        """Handle viewer input between frames"""
+
+    def _close(self):
+        """Tear down the output on the preview thread"""
+
+    def stats(self):
+        """Return preview counters as a dictionary"""
+        return {'shown': self.frames_shown, 'dropped': self.frames_dropped}
+
+
+class WindowPreview(FramePreview):
+    """
+    Preview in a local OpenCV window; ESC in the window sets closed.
+
+    The window is created and serviced on the preview thread, which OpenCV
+    supports with its GTK and Qt backends (Linux, Windows) but not on macOS.
+    """
+    def _idle_timeout(self):
+        # Keep the window responsive while no frames arrive
+        return 0.05
+
+    def _open(self):
+        cv2.namedWindow(WINDOW_NAME, cv2.WINDOW_NORMAL)
+
+    def _show(self, frame):
+        cv2.imshow(WINDOW_NAME, frame)
+
+    def _poll(self):
+        if cv2.waitKey(1) & 0xFF == 27:  # ESC key
+            self.closed = True
+
+    def _close(self):
+        cv2.destroyWindow(WINDOW_NAME)
+
+
+class MjpegPreview(FramePreview):
+    """
+    Serve the preview as an MJPEG stream, e.g. http://127.0.0.1:8080/ in a browser.
+
+    Frames are JPEG-encoded once on the preview thread and the same bytes are
+    sent to every connected client.
+    """
+    def __init__(self, fps=15.0, width=640, port=8080, host='127.0.0.1', quality=70):
+        """
+        Args:
+            fps: Highest rate in frames per second the preview is updated at
+            width: Width in pixels the frames are downscaled to (None keeps the full size)
+            port: TCP port to serve the stream on
+            host: Address to listen on (default: localhost only)
+            quality: JPEG quality from 0 to 100
+        """
+        super().__init__(fps, width)
+        self.port = port
+        self.host = host
+        self.quality = quality
+        self.clients = 0
+
+        self._jpeg = None
+        self._jpeg_seq = 0
+        self._jpeg_condition = threading.Condition()
+        self._server = None
+        self._server_thread = None
+
+    def start(self):
+        """Start serving (on the calling thread, so a port in use is reported right away) and the preview thread"""
+        preview = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Type', f'multipart/x-mixed-replace; boundary={BOUNDARY.decode()}')
+                self.send_header('Cache-Control', 'no-cache')
+                self.end_headers()
+                preview._stream(self.wfile)
+
+            def log_message(self, format, *args):
+                # Keep the console for the controller's own output
+                pass
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._server_thread = threading.Thread(target=self._server.serve_forever, name='preview-http', daemon=True)
+        self._server_thread.start()
+        print(f"Preview stream at http://{self.host}:{self.port}/")
+        return super().start()
+
+    def _show(self, frame):
+        ok, jpeg = cv2.imencode('.jpg', frame, (cv2.IMWRITE_JPEG_QUALITY, self.quality))
+        if not ok:
+            return
+        with self._jpeg_condition:
+            self._jpeg = jpeg.tobytes()
+            self._jpeg_seq += 1
+            self._jpeg_condition.notify_all()
+
+    def _stream(self, output):
+        """Write every new JPEG to one client until it disconnects or the preview stops"""
+        self.clients += 1
+        seq = 0
+        try:
+            while self._running:
+                with self._jpeg_condition:
+                    if not self._jpeg_condition.wait_for(lambda: self._jpeg_seq > seq or not self._running,
+                                                         timeout=1.0):
+                        continue
+                    jpeg, seq = self._jpeg, self._jpeg_seq
+                if jpeg is None:
+                    continue
+                output.write(b'--' + BOUNDARY + b'\r\nContent-Type: image/jpeg\r\n'
+                             + f'Content-Length: {len(jpeg)}\r\n\r\n'.encode() + jpeg + b'\r\n')
+        except (BrokenPipeError, ConnectionResetError):
+            pass
+        finally:
+            self.clients -= 1
+
+    def _close(self):
+        with self._jpeg_condition:
+            self._jpeg_condition.notify_all()
+        self._server.shutdown()
+        self._server.server_close()
+
+    def stats(self):
+        """Return preview counters, including the number of connected clients, as a dictionary"""
+        return dict(super().stats(), clients=self.clients)
+
+
+def create_preview(kind, fps=15.0, width=640, port=8080):
+    """
+    Create and start a preview by name
+
+    Args:
+        kind: 'window' or 'mjpeg'
+        fps: Highest preview rate in frames per second
+        width: Preview width in pixels (None keeps the full size)
+        port: TCP port of the MJPEG stream
+
+    Returns:
+        Started FramePreview
+    """
+    if kind == 'window':
+        return WindowPreview(fps, width).start()
+    if kind == 'mjpeg':
+        return MjpegPreview(fps, width, port).start()
+    raise ValueError(f"Unknown preview {kind!r}, expected one of {', '.join(PREVIEW_KINDS)}")
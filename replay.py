@@ -0,0 +1,138 @@
+# replay.py
+# Replay recorded landmark sessions through the classifiers and GameController
+# without loading a pose model, e.g. to tune thresholds
+#
+# Usage:
+# python replay.py session.bplm --start-hold-ms 200 --hands-threshold 250
+
+import argparse
+from collections import Counter
+from time import perf_counter
+
+import numpy as np
+
+from landmarks import (
+    LandmarkFrame, HANDS_JOINED_THRESHOLD,
+    classify_hands_joined_batch, classify_position_horizontal_batch, classify_position_vertical_batch,
+    shoulder_width_batch
+)
+from landmark_recording import LandmarkRecording, LandmarkReplay
+from landmark_filter import FILTERS, create_filter, filter_stack
+from game_controller import GameController
+from key_dispatcher import RecordingDispatcher
+from gestures import HysteresisClassifier, start_gestures
+from threshold_profile import ThresholdProfile
+
+
+def replay_recording(recording, controller, speed=None, landmark_filter=None):
+    """
+    Feed every frame of a recording through the controller's classifier into the controller
+
+    Args:
+        recording: LandmarkRecording to replay
+        controller: GameController receiving the classified frames (its classifier holds the thresholds)
+        speed: None to replay as fast as possible, otherwise a factor of the original speed
+        landmark_filter: Optional LandmarkFilter applied to the landmarks before classification
+    """
+    if speed is not None:
+        # Real-time replay classifies each frame as it arrives, like the live loop
+        for _, landmarks in LandmarkReplay(recording, speed):
+            if landmark_filter is not None:
+                landmarks = landmark_filter.apply(landmarks)
+            if landmarks is None:
+                controller.update(None, None, None, None)
+                continue
+            hand_status, horizontal_position, _, posture, _ = controller.classify(landmarks)
+            controller.update(landmarks, hand_status, horizontal_position, posture)
+        return
+
+    # At full speed the distances and midpoints of the whole recording are computed at once,
+    # only the hysteresis and the controller step per frame
+    stack, width, height = recording.landmarks, recording.width, recording.height
+    if landmark_filter is not None:
+        stack = filter_stack(stack, recording.timestamps, recording.valid, landmark_filter, width, height)
+    classifier = controller.classifier
+    with np.errstate(invalid='ignore'):  # NaN landmarks of frames without a person
+        _, distance = classify_hands_joined_batch(stack, width, height, classifier.threshold)
+        _, mid_x = classify_position_horizontal_batch(stack, width, classifier.column_bounds)
+        _, mid_y = classify_position_vertical_batch(stack, height, classifier.row_bounds)
+        # Body-relative hands thresholds need every frame's shoulder width
+        shoulder_width = [None] * len(recording)
+        if classifier.hands_ratio is not None:
+            shoulder_width = shoulder_width_batch(stack, width, height).tolist()
+
+    valid = recording.valid.tolist()
+    timestamps = recording.timestamps.tolist()
+    distance, mid_x, mid_y = distance.tolist(), mid_x.tolist(), mid_y.tolist()
+    for index in range(len(recording)):
+        if not valid[index]:
+            controller.update(None, None, None, None)
+            continue
+        landmarks = LandmarkFrame(stack[index], timestamps[index], width, height)
+        hand_status, horizontal_position, posture = classifier.classify_values(
+            distance[index], mid_x[index], mid_y[index], width, height, shoulder_width[index])
+        controller.update(landmarks, hand_status, horizontal_position, posture)
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Replay recorded landmark sessions without a pose model')
+    parser.add_argument('recordings', nargs='+', help='landmark recording files')
+    parser.add_argument('--speed', type=float, default=None,
+                        help='replay at this factor of the original speed (default: as fast as possible)')
+    parser.add_argument('--start-hold-ms', type=float, default=300.0,
+                        help='time the hands must stay joined to start the game')
+    parser.add_argument('--hands-threshold', type=float, default=HANDS_JOINED_THRESHOLD,
+                        help='wrist distance in pixels below which hands count as joined')
+    parser.add_argument('--column-bounds', type=float, nargs=2, default=None, metavar=('LEFT', 'RIGHT'),
+                        help='column boundaries as fractions of the frame width')
+    parser.add_argument('--row-bounds', type=float, nargs=2, default=None, metavar=('TOP', 'BOTTOM'),
+                        help='row boundaries as fractions of the frame height')
+    parser.add_argument('--profile', default=None,
+                        help='threshold profile from calibrate.py (replaces the threshold, bounds and margin options)')
+    parser.add_argument('--margin', type=float, default=None,
+                        help='distance past a grid line needed to change column or row, as a fraction of the frame')
+    parser.add_argument('--filter', choices=('none',) + tuple(FILTERS), default='none',
+                        help='landmark filter applied before classification')
+    parser.add_argument('--filter-lead-ms', type=float, default=30.0,
+                        help='time the filtered landmarks are extrapolated ahead')
+    return parser.parse_args()
+
+
+def main():
+    """Replay each recording and print what the controller would have done"""
+    args = parse_args()
+
+    for path in args.recordings:
+        recording = LandmarkRecording(path)
+        column_bounds = row_bounds = None
+        if args.column_bounds:
+            column_bounds = tuple(int(bound * recording.width) for bound in args.column_bounds)
+        if args.row_bounds:
+            row_bounds = tuple(int(bound * recording.height) for bound in args.row_bounds)
+
+        if args.profile:
+            classifier = ThresholdProfile.load(args.profile).create_classifier()
+        else:
+            classifier = HysteresisClassifier(args.hands_threshold, column_bounds=column_bounds,
+                                              row_bounds=row_bounds)
+            if args.margin is not None:
+                classifier.margin = args.margin
+        dispatcher = RecordingDispatcher()
+        controller = GameController(dispatcher=dispatcher, verbose=False,
+                                    gestures=start_gestures(args.start_hold_ms / 1000), classifier=classifier)
+
+        landmark_filter = create_filter(args.filter, lead=args.filter_lead_ms / 1000) if args.filter != 'none' else None
+        start = perf_counter()
+        replay_recording(recording, controller, args.speed, landmark_filter)
+        elapsed = perf_counter() - start
+
+        keys = Counter(key for _, key in dispatcher.events)
+        speedup = recording.duration() / elapsed if elapsed > 0 else float('inf')
+        print(f"{path}: {len(recording)} frames ({int(recording.valid.sum())} with a person), "
+              f"{recording.duration():.1f} s recorded, replayed in {elapsed * 1000:.1f} ms ({speedup:.0f}x)")
+        print(f"  game started: {controller.is_game_started()}, keys: {dict(keys)}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,391 @@
+# state_publisher.py
+# Publish every frame's landmarks and game state to other processes through shared memory
+#
+# The publisher writes one fixed-size record per frame into a ring in a named
+# multiprocessing.shared_memory block; writing it is a few hundred bytes of
+# memcpy in the frame loop. Readers in other local processes attach to the
+# block by name and copy the records out without any serialization. Each slot
+# is protected by a sequence lock: its counter is odd while the publisher is
+# writing, and a reader that sees the counter change while copying retries.
+# Retrying is bounded by a deadline, so a publisher that died halfway through
+# a record leaves readers with None instead of spinning forever.
+#
+# Block layout: a header (magic b'BPSP', version, players, ring size, number of
+# the latest published frame, process ID of the publisher) followed by
+# ring_size records of record_dtype().
+# Records can also be sent to remote dashboards as UDP datagrams (b'BPSU'
+# followed by the header's player count and the record), by a background
+# thread that reads the ring like any other reader.
+#
+# Usage from another process:
+#   reader = StateReader()
+#   record = reader.latest()
+#   record['landmarks'][0], record['x_pos_index'][0]
+
+import argparse
+import os
+import socket
+import struct
+import threading
+from multiprocessing import resource_tracker, shared_memory
+from time import perf_counter, sleep
+
+import numpy as np
+
+from landmarks import NUM_LANDMARKS
+
+DEFAULT_NAME = 'body-pose-game-state'
+MAGIC = b'BPSP'
+DATAGRAM_MAGIC = b'BPSU'
+VERSION = 2
+HEADER_DTYPE = np.dtype([('magic', 'S4'), ('version', '<u4'), ('players', '<u4'), ('ring_size', '<u4'),
+                         ('published', '<u8'), ('pid', '<u4')])
+DATAGRAM_HEADER = struct.Struct('<4sI')
+# Longest time in seconds a read waits for a record the publisher is writing
+READ_TIMEOUT = 0.1
+
+
+def record_dtype(players=1):
+    """
+    Return the dtype of one published frame
+
+    Landmarks are normalized to the frame (in multi-player mode, to the
+    player's lane) and NaN when the player was not detected. Positions are
+    the GameController's indices: x 0 left, 1 center, 2 right; y 0 crouch,
+    1 stand, 2 jump.
+    """
+    return np.dtype([
+        ('seq', '<u8'),        # sequence lock counter, odd while the record is being written
+        ('frame', '<u8'),      # number of the frame, counting from 1
+        ('timestamp', '<f8'),  # capture time on the publisher's perf_counter() clock
+        ('width', '<u4', (players,)),   # frame size of the player's landmarks, 0 when not detected
+        ('height', '<u4', (players,)),
+        ('landmarks', '<f4', (players, NUM_LANDMARKS, 4)),
+        ('game_started', 'u1', (players,)),
+        ('x_pos_index', 'i1', (players,)),
+        ('y_pos_index', 'i1', (players,)),
+    ])
+
+
+def _process_alive(pid):
+    """Return whether a process with this ID exists."""
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True  # owned by another user
+    return True
+
+
+def _layout(buffer, players, ring_size):
+    """Return (header, ring) arrays viewing a shared memory buffer."""
+    header = np.ndarray((), dtype=HEADER_DTYPE, buffer=buffer)
+    ring = np.ndarray((ring_size,), dtype=record_dtype(players), buffer=buffer, offset=HEADER_DTYPE.itemsize)
+    return header, ring
+
+
+class StatePublisher:
+    """
+    Write each frame's landmarks and game state into the shared ring.
+
+    The ring keeps the last ring_size frames, so a reader polling less often
+    than the frame rate can still read every frame it missed.
+
+    A block of the same name left behind by a publisher that did not exit
+    cleanly is replaced. A block of a publisher that is still running, or one
+    that is not a state publisher block, raises FileExistsError unless force
+    is set.
+    """
+    def __init__(self, name=DEFAULT_NAME, players=1, ring_size=64, udp_targets=None, udp_rate=30.0, force=False):
+        """
+        Args:
+            name: Name of the shared memory block readers attach to
+            players: Number of players (lanes) in every record
+            ring_size: Number of frames kept in the ring
+            udp_targets: Optional list of (host, port) the latest record is sent to
+            udp_rate: Highest number of datagrams per second sent to each target
+            force: Whether to replace an existing block even if it is in use
+        """
+        self.name = name
+        self.players = players
+        self.ring_size = ring_size
+        self.published = 0
+
+        size = HEADER_DTYPE.itemsize + ring_size * record_dtype(players).itemsize
+        try:
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        except FileExistsError:
+            self._remove_stale(name, force)
+            self._shm = shared_memory.SharedMemory(name=name, create=True, size=size)
+        self._header, self._ring = _layout(self._shm.buf, players, ring_size)
+        self._ring[...] = 0
+        self._header['magic'] = MAGIC
+        self._header['version'] = VERSION
+        self._header['players'] = players
+        self._header['ring_size'] = ring_size
+        self._header['published'] = 0
+        self._header['pid'] = os.getpid()
+
+        self._fanout = None
+        if udp_targets:
+            self._fanout = UdpFanout(StateReader(name, same_process=True), udp_targets, udp_rate).start()
+
+    @staticmethod
+    def _remove_stale(name, force):
+        """Unlink an existing block of this name, unless another publisher or program is using it."""
+        existing = shared_memory.SharedMemory(name=name)
+        owner = None
+        if existing.size >= HEADER_DTYPE.itemsize:
+            header = np.ndarray((), dtype=HEADER_DTYPE, buffer=existing.buf)
+            if bytes(header['magic']) == MAGIC and int(header['version']) == VERSION:
+                owner = int(header['pid'])
+            del header
+        if not force and (owner is None or _process_alive(owner)):
+            # Attaching registered the block with the resource tracker, which would remove it at exit
+            # (unless this process created it, then it is registered anyway)
+            if owner != os.getpid():
+                resource_tracker.unregister(existing._name, 'shared_memory')
+            existing.close()
+            if owner is None:
+                raise FileExistsError(f"shared memory block {name} exists and is not a state publisher block")
+            raise FileExistsError(f"shared memory block {name} is in use by the publisher in process {owner}")
+        existing.close()
+        existing.unlink()
+
+    def publish(self, timestamp, landmarks, controllers):
+        """
+        Write one frame into the ring
+
+        Args:
+            timestamp: Capture time of the frame
+            landmarks: LandmarkFrame (or None if nobody was detected) of every player
+            controllers: GameController of every player
+        """
+        frame = self.published + 1
+        record = self._ring[(frame - 1) % self.ring_size]
+        record['seq'] += 1  # odd: readers retry until the record is complete
+        record['frame'] = frame
+        record['timestamp'] = timestamp
+        for player, (player_landmarks, controller) in enumerate(zip(landmarks, controllers)):
+            if player_landmarks is None:
+                record['landmarks'][player] = np.nan
+                record['width'][player] = 0
+                record['height'][player] = 0
+            else:
+                record['landmarks'][player] = player_landmarks.data
+                record['width'][player] = player_landmarks.width
+                record['height'][player] = player_landmarks.height
+            record['game_started'][player] = controller.game_started
+            record['x_pos_index'][player] = controller.x_pos_index
+            record['y_pos_index'][player] = controller.y_pos_index
+        record['seq'] += 1
+        self._header['published'] = frame
+        self.published = frame
+
+    def close(self):
+        """Stop the UDP fan-out and remove the shared memory block"""
+        if self._fanout is not None:
+            self._fanout.stop()
+        # Drop the array views before closing, the buffer cannot be closed while exported
+        self._header = self._ring = None
+        self._shm.close()
+        self._shm.unlink()
+
+    def stats(self):
+        """Return publisher counters for telemetry reports"""
+        stats = {'published': self.published}
+        if self._fanout is not None:
+            stats.update(udp_sent=self._fanout.sent, udp_errors=self._fanout.errors)
+        return stats
+
+
+class StateReader:
+    """
+    Read the records published by a StatePublisher in another process.
+
+    Records are copied out of the ring into a reusable record array, which
+    is the only copy; nothing is serialized.
+    """
+    def __init__(self, name=DEFAULT_NAME, same_process=False):
+        """
+        Args:
+            name: Name of the publisher's shared memory block
+            same_process: Whether the reader runs in the publisher's process
+        """
+        self._shm = shared_memory.SharedMemory(name=name)
+        if not same_process:
+            # Attaching registers the block with this process's resource tracker, which would
+            # remove it when the reader exits, pulling it from under the publisher
+            resource_tracker.unregister(self._shm._name, 'shared_memory')
+        header = np.ndarray((), dtype=HEADER_DTYPE, buffer=self._shm.buf)
+        if bytes(header['magic']) != MAGIC or int(header['version']) != VERSION:
+            raise ValueError(f"{name}: not a state publisher block of version {VERSION}")
+        self.players = int(header['players'])
+        self.ring_size = int(header['ring_size'])
+        self.dtype = record_dtype(self.players)
+        self._header, self._ring = _layout(self._shm.buf, self.players, self.ring_size)
+
+    def published(self):
+        """Return the number of the latest published frame (0 before the first one)."""
+        return int(self._header['published'])
+
+    def publisher_alive(self):
+        """Return whether the process that created the block is still running."""
+        return _process_alive(int(self._header['pid']))
+
+    def read(self, frame, out=None, timeout=READ_TIMEOUT):
+        """
+        Copy a frame's record out of the ring
+
+        Args:
+            frame: Frame number, at most ring_size frames older than the latest
+            out: Optional record array of self.dtype to copy into (allocated if None)
+            timeout: Longest time in seconds to wait for the publisher to finish writing the record
+
+        Returns:
+            Record (a numpy structured scalar array), or None if the frame was overwritten,
+            not published yet, or still being written when the timeout ran out (see
+            publisher_alive() to tell a slow publisher from one that died mid-write)
+        """
+        if out is None:
+            out = np.zeros((), dtype=self.dtype)
+        record = self._ring[(frame - 1) % self.ring_size]
+        deadline = perf_counter() + timeout
+        while True:
+            seq = int(record['seq'])
+            if seq % 2 == 0:
+                out[...] = record
+                if int(record['seq']) == seq:
+                    break
+            if perf_counter() >= deadline:
+                return None
+            sleep(0)  # the publisher is writing this record
+        return out if int(out['frame']) == frame else None
+
+    def latest(self, out=None, timeout=READ_TIMEOUT):
+        """
+        Copy the latest record out of the ring
+
+        Returns:
+            Record, or None before the first frame or if the latest record could not
+            be read within the timeout
+        """
+        while True:
+            frame = self.published()
+            if frame == 0:
+                return None
+            record = self.read(frame, out, timeout)
+            if record is not None:
+                return record
+            if self.published() == frame:
+                return None  # the publisher is stuck on (or died writing) this record
+            # The whole ring was overwritten while reading, try the new latest frame
+
+    def close(self):
+        """Detach from the shared memory block"""
+        self._header = self._ring = None
+        self._shm.close()
+
+
+class UdpFanout:
+    """Send the latest record to UDP targets from a background thread, for remote dashboards"""
+    def __init__(self, reader, targets, rate=30.0):
+        """
+        Args:
+            reader: StateReader of the ring
+            targets: List of (host, port)
+            rate: Highest number of datagrams per second sent to each target
+        """
+        self.reader = reader
+        self.targets = list(targets)
+        self.interval = 1.0 / rate
+        self.sent = 0
+        self.errors = 0
+        self._socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self._running = False
+        self._thread = None
+
+    def start(self):
+        """Start the sender thread"""
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name='state-udp', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Stop the sender thread and detach from the ring"""
+        self._running = False
+        if self._thread is not None:
+            self._thread.join(timeout=1.0)
+            self._thread = None
+        self._socket.close()
+        self.reader.close()
+
+    def _run(self):
+        """Sender loop running on the background thread"""
+        record = np.zeros((), dtype=self.reader.dtype)
+        prefix = DATAGRAM_HEADER.pack(DATAGRAM_MAGIC, self.reader.players)
+        last_frame = 0
+        while self._running:
+            started = perf_counter()
+            frame = self.reader.published()
+            if frame != last_frame and self.reader.read(frame, record) is not None:
+                last_frame = frame
+                datagram = prefix + record.tobytes()
+                for target in self.targets:
+                    try:
+                        self._socket.sendto(datagram, target)
+                        self.sent += 1
+                    except OSError:
+                        # Nobody listening or the network is down, keep trying
+                        self.errors += 1
+            sleep(max(0.0, self.interval - (perf_counter() - started)))
+
+
+def parse_datagram(data):
+    """
+    Decode a datagram sent by UdpFanout
+
+    Returns:
+        Record of record_dtype()
+    """
+    magic, players = DATAGRAM_HEADER.unpack_from(data)
+    if magic != DATAGRAM_MAGIC:
+        raise ValueError("not a state datagram")
+    return np.frombuffer(data, dtype=record_dtype(players), count=1, offset=DATAGRAM_HEADER.size)[0]
+
+
+def parse_target(spec):
+    """Parse a UDP target given as HOST:PORT or PORT (on localhost)."""
+    host, _, port = spec.rpartition(':')
+    return host or '127.0.0.1', int(port)
+
+
+def main():
+    """Print the published game state, as an example consumer"""
+    parser = argparse.ArgumentParser(description='Show the game state published by main.py --publish-state')
+    parser.add_argument('--name', default=DEFAULT_NAME, help='name of the shared memory block')
+    parser.add_argument('--interval', type=float, default=0.5, help='seconds between lines')
+    args = parser.parse_args()
+
+    reader = StateReader(args.name)
+    record = np.zeros((), dtype=reader.dtype)
+    try:
+        while reader.publisher_alive():
+            if reader.latest(record) is not None:
+                players = ' '.join(
+                    f"[started={bool(record['game_started'][player])} x={record['x_pos_index'][player]} "
+                    f"y={record['y_pos_index'][player]} person={not np.isnan(record['landmarks'][player, 0, 0])}]"
+                    for player in range(reader.players))
+                print(f"frame {int(record['frame'])} t={float(record['timestamp']):.3f} {players}")
+            sleep(args.interval)
+        print("The publisher has exited")
+    except KeyboardInterrupt:
+        pass
+    finally:
+        reader.close()
+
+
+if __name__ == '__main__':
+    main()
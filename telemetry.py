@@ -0,0 +1,311 @@
+# telemetry.py
+# Lightweight timing of the stages of the frame loop and rolling statistics
+
+import os
+from collections import deque
+from time import perf_counter
+
+import numpy as np
+
+
+class StageTimer:
+    """Measure consecutive stages of a frame with one clock read per stage"""
+    def __init__(self):
+        self.laps = {}  # stage name -> duration in seconds for the current frame
+        self._last = 0.0
+
+    def start(self):
+        """Start timing a new frame"""
+        self.laps.clear()
+        self._last = perf_counter()
+
+    def lap(self, stage):
+        """Record the time since the previous lap (or start) under the given stage name"""
+        now = perf_counter()
+        self.laps[stage] = now - self._last
+        self._last = now
+
+    def add(self, stage, duration):
+        """Record a duration measured elsewhere (e.g. by another process) under the given stage name"""
+        self.laps[stage] = duration
+
+    def total(self):
+        """Return the summed duration of all stages of the current frame."""
+        return sum(self.laps.values())
+
+
+class RollingStats:
+    """Fixed-size window of samples; adding is O(1), statistics are computed on demand"""
+    def __init__(self, window=300):
+        self._values = np.zeros(window, dtype=np.float64)
+        self._index = 0
+        self.count = 0  # total number of samples ever added
+        self.total = 0.0  # sum of all samples ever added
+
+    def add(self, value):
+        """Add a sample, overwriting the oldest one once the window is full"""
+        self._values[self._index] = value
+        self._index = (self._index + 1) % len(self._values)
+        self.count += 1
+        self.total += value
+
+    def values(self):
+        """Return the samples currently in the window (unordered)."""
+        return self._values[:min(self.count, len(self._values))]
+
+    def summary(self):
+        """
+        Summarize the samples in the window
+
+        Returns:
+            Dictionary with mean, p50, p95, p99 and max of the window (0 when empty),
+            plus count and sum of all samples ever added
+        """
+        values = self.values()
+        if len(values) == 0:
+            return {'mean': 0.0, 'p50': 0.0, 'p95': 0.0, 'p99': 0.0, 'max': 0.0, 'count': 0, 'sum': 0.0}
+        p50, p95, p99 = np.percentile(values, [50, 95, 99])
+        return {
+            'count': self.count,
+            'sum': float(self.total),
+            'mean': float(values.mean()),
+            'p50': float(p50),
+            'p95': float(p95),
+            'p99': float(p99),
+            'max': float(values.max()),
+        }
+
+
+class StartupTimer:
+    """Record when each startup phase was first reached, in seconds since process start"""
+    def __init__(self, started_at=None, final_phase='first_landmarks'):
+        """
+        Args:
+            started_at: perf_counter() time the process started (default: now)
+            final_phase: Phase after which the startup summary is printed
+        """
+        self.started_at = perf_counter() if started_at is None else started_at
+        self.final_phase = final_phase
+        self.phases = {}  # phase name -> seconds since start
+
+    def mark(self, phase):
+        """Record that a phase was reached; only the first call per phase counts (safe from any thread)"""
+        if phase in self.phases:
+            return
+        self.phases[phase] = perf_counter() - self.started_at
+        if phase == self.final_phase:
+            print(f"[startup] {self.report()}")
+
+    def report(self):
+        """Return the recorded phases as a single line."""
+        return ' '.join(f'{phase}={seconds:.2f}s' for phase, seconds in self.phases.items())
+
+
+class Telemetry:
+    """
+    Rolling per-stage timings, frame rate and capture-to-keypress latency.
+
+    The frame loop records one frame at a time; summaries are only computed
+    when the HUD is refreshed, a log line is printed or the exporter writes,
+    so the per-frame overhead is a handful of array stores.
+    """
+    def __init__(self, window=300, hud_interval=0.5, log_interval=10.0, exporter=None, started_at=None):
+        """
+        Args:
+            window: Number of samples kept per statistic
+            hud_interval: Seconds between refreshes of the on-screen HUD text
+            log_interval: Seconds between log lines (None to disable)
+            exporter: Optional TelemetryExporter written at every log interval
+            started_at: perf_counter() time the process started, for the startup metrics
+        """
+        self.window = window
+        self.hud_interval = hud_interval
+        self.log_interval = log_interval
+        self.exporter = exporter
+
+        self.timer = StageTimer()
+        self.startup = StartupTimer(started_at)
+        self.stages = {}
+        self.key_latency = RollingStats(window)
+        self.frame_times = deque(maxlen=window)
+        self.frames = 0
+
+        # Key latencies arrive from the dispatcher thread and are drained by the frame loop
+        self._sent_keys = deque()
+        self._counter_sources = {}
+        self._hud_lines = []
+        self._hud_updated_at = 0.0
+        self._reported_at = perf_counter()
+
+    def _stage(self, name):
+        """Return the rolling statistics for a stage, creating them on first use."""
+        stats = self.stages.get(name)
+        if stats is None:
+            stats = self.stages[name] = RollingStats(self.window)
+        return stats
+
+    def record_frame(self):
+        """Record the stage timings of the frame just finished by self.timer"""
+        for stage, duration in self.timer.laps.items():
+            self._stage(stage).add(duration)
+        self._stage('total').add(self.timer.total())
+        self.frame_times.append(perf_counter())
+        self.frames += 1
+
+        while self._sent_keys:
+            self.key_latency.add(self._sent_keys.popleft())
+
+    def record_key(self, origin_timestamp, sent_at):
+        """
+        Record a key that was sent for a frame (safe to call from any thread)
+
+        Args:
+            origin_timestamp: Capture timestamp of the frame that caused the key press
+            sent_at: perf_counter() time the key was injected
+        """
+        self._sent_keys.append(sent_at - origin_timestamp)
+
+    def add_counters(self, name, source):
+        """
+        Register a callable returning a dictionary of counters to include in reports
+
+        Args:
+            name: Prefix for the counters (e.g. 'capture')
+            source: Callable returning {counter name: number}
+        """
+        self._counter_sources[name] = source
+
+    @property
+    def fps(self):
+        """Frames per second averaged over the rolling window."""
+        if len(self.frame_times) < 2:
+            return 0.0
+        elapsed = self.frame_times[-1] - self.frame_times[0]
+        return (len(self.frame_times) - 1) / elapsed if elapsed > 0 else 0.0
+
+    def counters(self):
+        """Collect the registered counters into one flat dictionary."""
+        collected = {}
+        for name, source in self._counter_sources.items():
+            for key, value in source().items():
+                collected[f'{name}_{key}'] = value
+        return collected
+
+    def summary(self):
+        """
+        Summarize all statistics
+
+        Returns:
+            Dictionary with fps, frames, per-stage and key latency summaries (seconds) and counters
+        """
+        return {
+            'fps': self.fps,
+            'frames': self.frames,
+            'stages': {name: stats.summary() for name, stats in self.stages.items()},
+            'capture_to_key': self.key_latency.summary(),
+            'counters': self.counters(),
+            'startup': dict(self.startup.phases),
+        }
+
+    def hud_lines(self):
+        """Return HUD text lines, refreshed at most every hud_interval seconds."""
+        now = perf_counter()
+        if now - self._hud_updated_at >= self.hud_interval:
+            self._hud_updated_at = now
+            lines = []
+            for name, stats in self.stages.items():
+                summary = stats.summary()
+                lines.append(f"{name}: {summary['mean'] * 1000:.1f} / p95 {summary['p95'] * 1000:.1f} ms")
+            if self.key_latency.count:
+                summary = self.key_latency.summary()
+                lines.append(f"capture->key: {summary['mean'] * 1000:.1f} / p95 {summary['p95'] * 1000:.1f} ms")
+            self._hud_lines = lines
+        return self._hud_lines
+
+    def log_line(self):
+        """Return a single-line summary suitable for periodic logging."""
+        parts = [f'fps={self.fps:.1f}']
+        for name, stats in self.stages.items():
+            summary = stats.summary()
+            parts.append(f"{name}={summary['p50'] * 1000:.1f}/{summary['p95'] * 1000:.1f}ms")
+        if self.key_latency.count:
+            summary = self.key_latency.summary()
+            parts.append(f"capture_to_key={summary['p50'] * 1000:.1f}/{summary['p95'] * 1000:.1f}ms")
+        parts.extend(f'{key}={value}' for key, value in self.counters().items())
+        return ' '.join(parts)
+
+    def maybe_report(self):
+        """Print a log line and write the exporter file if the log interval has passed"""
+        if self.log_interval is None:
+            return
+        now = perf_counter()
+        if now - self._reported_at < self.log_interval:
+            return
+        self._reported_at = now
+
+        print(f"[telemetry] {self.log_line()}")
+        if self.exporter is not None:
+            try:
+                self.exporter.write(self.summary())
+            except OSError as e:
+                print(f"Error writing telemetry: {e}")
+
+
+class TelemetryExporter:
+    """Write telemetry summaries as a Prometheus text-format file for scraping"""
+    def __init__(self, path, prefix='bodypost'):
+        self.path = path
+        self.prefix = prefix
+
+    def format(self, summary):
+        """
+        Format a Telemetry.summary() dictionary as Prometheus text exposition
+
+        Returns:
+            The file contents as a string
+        """
+        p = self.prefix
+        lines = [
+            f'# TYPE {p}_fps gauge',
+            f'{p}_fps {summary["fps"]:.3f}',
+            f'# TYPE {p}_frames_total counter',
+            f'{p}_frames_total {summary["frames"]}',
+        ]
+        stages = summary['stages']
+        # The quantiles cover the rolling window, _sum and _count every sample since start;
+        # mean and max are plain gauges and live in their own families
+        lines.append(f'# TYPE {p}_stage_seconds summary')
+        for stage, stats in stages.items():
+            for quantile in ('p50', 'p95', 'p99'):
+                lines.append(f'{p}_stage_seconds{{stage="{stage}",quantile="0.{quantile[1:]}"}} {stats[quantile]:.6f}')
+            lines.append(f'{p}_stage_seconds_sum{{stage="{stage}"}} {stats["sum"]:.6f}')
+            lines.append(f'{p}_stage_seconds_count{{stage="{stage}"}} {stats["count"]}')
+        for statistic in ('mean', 'max'):
+            lines.append(f'# TYPE {p}_stage_seconds_{statistic} gauge')
+            for stage, stats in stages.items():
+                lines.append(f'{p}_stage_seconds_{statistic}{{stage="{stage}"}} {stats[statistic]:.6f}')
+
+        key = summary['capture_to_key']
+        lines.append(f'# TYPE {p}_capture_to_key_seconds summary')
+        for quantile in ('p50', 'p95', 'p99'):
+            lines.append(f'{p}_capture_to_key_seconds{{quantile="0.{quantile[1:]}"}} {key[quantile]:.6f}')
+        lines.append(f'{p}_capture_to_key_seconds_sum {key["sum"]:.6f}')
+        lines.append(f'{p}_capture_to_key_seconds_count {key["count"]}')
+        lines.append(f'# TYPE {p}_capture_to_key_seconds_max gauge')
+        lines.append(f'{p}_capture_to_key_seconds_max {key["max"]:.6f}')
+
+        if summary['startup']:
+            lines.append(f'# TYPE {p}_startup_seconds gauge')
+        for phase, seconds in summary['startup'].items():
+            lines.append(f'{p}_startup_seconds{{phase="{phase}"}} {seconds:.3f}')
+
+        for name, value in summary['counters'].items():
+            lines.append(f'{p}_{name} {value}')
+        return '\n'.join(lines) + '\n'
+
+    def write(self, summary):
+        """Write the summary, replacing the file atomically so scrapers never see partial output"""
+        temp_path = f'{self.path}.tmp'
+        with open(temp_path, 'w') as f:
+            f.write(self.format(summary))
+        os.replace(temp_path, self.path)
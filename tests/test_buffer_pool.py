@@ -0,0 +1,125 @@
+# test_buffer_pool.py
+# Steady-state frames must not allocate frame-sized images
+
+import tracemalloc
+
+import pytest
+
+from buffer_pool import FrameBufferPool
+from capture import CapturedFrame
+from frame_source import SyntheticSource
+from game_controller import GameController
+from key_dispatcher import RecordingDispatcher
+from main import process_frame
+from overlay import OverlayRenderer
+from telemetry import Telemetry
+
+WARMUP_FRAMES = 5
+FRAMES = 50
+
+
+class NoPersonPose:
+    """Pose stub that never detects anyone, so the test needs no model"""
+    class Results:
+        pose_landmarks = None
+
+    def process(self, image_rgb):
+        return self.Results()
+
+
+class FrameLoop:
+    """Push synthetic frames through process_frame like the main loop does, decoding into one buffer"""
+    def __init__(self, buffers, renderer):
+        self.buffers = buffers
+        self.renderer = renderer
+        self.source = SyntheticSource(640, 480, rate='max')
+        self.controller = GameController(dispatcher=RecordingDispatcher(), verbose=False)
+        self.telemetry = Telemetry(log_interval=None)
+        self.pose = NoPersonPose()
+        self.image = None
+        self.seq = 0
+
+    def run(self, count, tracer=None):
+        for _ in range(count):
+            if tracer is not None:
+                tracer.before()
+            ok, self.image, timestamp = self.source.read(self.image)
+            assert ok
+            self.seq += 1
+            frame = process_frame(CapturedFrame(self.image, timestamp, self.seq), self.controller, self.telemetry,
+                                  self.renderer, self.pose, buffers=self.buffers)
+            self.buffers.release(frame)
+            self.buffers.frame_done()
+            if tracer is not None:
+                tracer.after(self.image.nbytes)
+
+
+@pytest.mark.parametrize('render', [True, False])
+def test_pool_stops_allocating_after_warm_up(render):
+    buffers = FrameBufferPool()
+    loop = FrameLoop(buffers, OverlayRenderer() if render else None)
+    loop.run(WARMUP_FRAMES)
+    allocations = buffers.stats()['allocations']
+    assert allocations > 0
+
+    loop.run(FRAMES)
+    stats = buffers.stats()
+    assert stats['allocations'] == allocations
+    assert stats['in_use'] == 0
+
+
+class AllocationTracer:
+    """Record the peak traced allocation of every frame"""
+    def __init__(self):
+        self.peaks = []  # peak allocation of each frame, in frame sizes
+
+    def before(self):
+        tracemalloc.reset_peak()
+        self._start, _ = tracemalloc.get_traced_memory()
+
+    def after(self, frame_bytes):
+        _, peak = tracemalloc.get_traced_memory()
+        self.peaks.append((peak - self._start) / frame_bytes)
+
+
+@pytest.mark.parametrize('render', [True, False])
+def test_steady_state_frames_make_no_frame_sized_allocations(render):
+    loop = FrameLoop(FrameBufferPool(), OverlayRenderer() if render else None)
+    loop.run(WARMUP_FRAMES)
+
+    tracer = AllocationTracer()
+    tracemalloc.start()
+    try:
+        loop.run(FRAMES, tracer)
+    finally:
+        tracemalloc.stop()
+    assert len(tracer.peaks) == FRAMES
+    assert max(tracer.peaks) < 1.0
+
+
+def test_frames_allocate_without_pool():
+    # Check that the tracing would catch the allocations the pool avoids
+    tracer = AllocationTracer()
+    tracemalloc.start()
+    try:
+        source = SyntheticSource(640, 480, rate='max')
+        controller = GameController(dispatcher=RecordingDispatcher(), verbose=False)
+        telemetry = Telemetry(log_interval=None)
+        for seq in range(1, 6):
+            tracer.before()
+            ok, image, timestamp = source.read()
+            process_frame(CapturedFrame(image, timestamp, seq), controller, telemetry, None, NoPersonPose())
+            tracer.after(image.nbytes)
+    finally:
+        tracemalloc.stop()
+    assert min(tracer.peaks) >= 1.0
+
+
+def test_release_ignores_none_and_reuses_arrays():
+    buffers = FrameBufferPool()
+    first = buffers.acquire((4, 4, 3))
+    buffers.release(first)
+    buffers.release(None)
+    assert buffers.acquire((4, 4, 3)) is first
+    assert buffers.acquire((4, 4, 3)) is not first
+    assert buffers.stats()['allocations'] == 2
@@ -0,0 +1,71 @@
+# test_gestures.py
+# Gestures must take the same time to recognize at any frame rate
+
+import numpy as np
+import pytest
+
+from game_controller import GameController
+from key_dispatcher import RecordingDispatcher
+from landmarks import LEFT_SHOULDER, LEFT_WRIST, NUM_LANDMARKS, RIGHT_SHOULDER, RIGHT_WRIST, X, Y, LandmarkFrame
+
+WIDTH, HEIGHT = 640, 480
+JOIN_AT = 0.4    # time the player joins their hands, a frame time at every tested rate
+HOLD = 0.3       # default hold of the start gesture
+DURATION = 1.5
+
+
+def pose(timestamp, wrist_distance):
+    """Return a standing player in the center with the wrists wrist_distance pixels apart"""
+    data = np.zeros((NUM_LANDMARKS, 4), dtype=np.float32)
+    data[LEFT_SHOULDER, (X, Y)] = (0.6, 0.5)
+    data[RIGHT_SHOULDER, (X, Y)] = (0.4, 0.5)
+    half = wrist_distance / 2 / WIDTH
+    data[LEFT_WRIST, (X, Y)] = (0.5 + half, 0.6)
+    data[RIGHT_WRIST, (X, Y)] = (0.5 - half, 0.6)
+    return LandmarkFrame(data, timestamp, WIDTH, HEIGHT)
+
+
+def replay(controller, frames):
+    """Classify and apply every frame, returning the timestamp the game started at"""
+    for landmarks in frames:
+        if landmarks is None:
+            controller.update(None, None, None, None)
+            continue
+        hand_status, horizontal_position, _, posture, _ = controller.classify(landmarks)
+        controller.update(landmarks, hand_status, horizontal_position, posture)
+        if controller.game_started:
+            return landmarks.timestamp
+    return None
+
+
+def join_hands(fps):
+    """Hands apart until JOIN_AT, joined from then on, sampled at fps"""
+    for index in range(int(DURATION * fps)):
+        timestamp = index / fps
+        yield pose(timestamp, 20 if timestamp >= JOIN_AT - 1e-9 else 500)
+
+
+@pytest.mark.parametrize('fps', [15, 30, 60])
+def test_start_gesture_is_recognized_after_the_same_time_at_any_frame_rate(fps):
+    controller = GameController(dispatcher=RecordingDispatcher(), verbose=False)
+    started_at = replay(controller, join_hands(fps))
+    assert started_at is not None
+    # Recognized on the first frame after the hold, which is at most one frame interval late
+    # (frame times are not exact in floating point, so the hold may end one frame later)
+    assert HOLD - 1e-9 <= started_at - JOIN_AT <= HOLD + 1 / fps + 1e-9
+
+
+def test_frame_rates_agree_on_recognition_time():
+    times = [replay(GameController(dispatcher=RecordingDispatcher(), verbose=False), join_hands(fps))
+             for fps in (15, 30, 60)]
+    assert max(times) - min(times) < 1 / 15
+
+
+def test_losing_the_player_resets_sticky_labels():
+    controller = GameController(dispatcher=RecordingDispatcher(), verbose=False)
+    # Between the joined threshold (300 px) and the exit threshold (360 px), the label depends on the last one
+    assert controller.classify(pose(0.0, 20))[0] == 'Hands Joined'
+    assert controller.classify(pose(0.1, 330))[0] == 'Hands Joined'
+
+    controller.update(None, None, None, None)
+    assert controller.classify(pose(0.2, 330))[0] == 'Hands Not Joined'
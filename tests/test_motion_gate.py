@@ -0,0 +1,28 @@
+# test_motion_gate.py
+# The motion gate skips static frames and never reports negative CPU savings
+
+import numpy as np
+
+from motion_gate import MotionGate
+
+
+class NoPersonPose:
+    """Pose stub that never detects anyone and costs almost no CPU"""
+    class Results:
+        pose_landmarks = None
+
+    def process(self, image_rgb):
+        return self.Results()
+
+
+def test_static_scene_is_skipped_without_negative_savings():
+    gate = MotionGate(NoPersonPose(), refresh_interval=60.0)
+    frame = np.full((480, 640, 3), 128, dtype=np.uint8)
+    for _ in range(20):
+        gate.process(frame)
+
+    stats = gate.stats()
+    assert stats['processed'] == 1
+    assert stats['skipped'] == 19
+    # Inference is nearly free here, so the gate costs more than it saves
+    assert stats['cpu_saved_est_s'] == 0.0
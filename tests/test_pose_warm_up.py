@@ -0,0 +1,40 @@
+# test_pose_warm_up.py
+# The live loop must not run inference while the warm-up inference is still running
+
+import threading
+from time import sleep
+
+import pose_detection
+
+
+class SlowPose:
+    """Pose stub that records whether two inferences ever overlapped"""
+    def __init__(self):
+        self.running = 0
+        self.overlapped = False
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def process(self, image_rgb):
+        with self._lock:
+            self.running += 1
+            self.overlapped |= self.running > 1
+            self.calls += 1
+        sleep(0.05)
+        with self._lock:
+            self.running -= 1
+
+
+def test_first_inference_waits_for_warm_up(monkeypatch):
+    engine = SlowPose()
+    monkeypatch.setattr(pose_detection, '_engines', {})
+    monkeypatch.setattr(pose_detection, 'create_pose_video', lambda model_complexity=1: engine)
+    thread = pose_detection.start_warm_up()
+    pose = pose_detection.get_pose_engine()
+    assert engine.calls == 1  # the warm-up inference has finished
+    pose.process(None)
+    thread.join()
+
+    assert pose is engine
+    assert engine.calls == 2
+    assert not engine.overlapped
@@ -0,0 +1,62 @@
+# test_roi_tracking.py
+# Degenerate landmark boxes must fall back to a full-frame search
+
+import numpy as np
+
+from landmarks import NUM_LANDMARKS
+from pose_detection import RoiPoseTracker
+
+
+class Landmark:
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+        self.z = 0.0
+        self.visibility = 1.0
+
+
+class CollapsedPose:
+    """Pose stub returning every landmark at (nearly) the same point of its input"""
+    class Results:
+        def __init__(self, landmark):
+            self.pose_landmarks = type('LandmarkList', (), {'landmark': landmark})()
+
+    def __init__(self, x=0.5, spread=0.0):
+        self.x = x
+        self.spread = spread
+
+    def process(self, image_rgb):
+        return self.Results([Landmark(self.x + self.spread * (index % 2), 0.5) for index in range(NUM_LANDMARKS)])
+
+
+def test_collapsed_landmarks_search_the_full_frame():
+    pose = CollapsedPose()
+    tracker = RoiPoseTracker(pose)
+    image = np.zeros((480, 640, 3), dtype=np.uint8)
+    for _ in range(10):
+        results = tracker.process(image)
+        assert results.pose_landmarks is not None
+        assert tracker.roi is None
+    assert tracker.tracked_frames == 0
+    assert tracker.search_frames == 10
+
+
+def test_landmarks_at_the_edge_never_give_an_empty_crop():
+    # Every landmark clamped at the right edge of the frame
+    tracker = RoiPoseTracker(CollapsedPose(x=1.0, spread=0.001))
+    image = np.zeros((480, 640, 3), dtype=np.uint8)
+    for _ in range(10):
+        tracker.process(image)
+        assert tracker.roi is None
+
+
+def test_small_regions_are_kept_at_the_minimum_size():
+    # Landmarks 8% of the frame width apart, padded to just above the minimum size
+    pose = CollapsedPose(spread=0.08)
+    tracker = RoiPoseTracker(pose)
+    image = np.zeros((480, 640, 3), dtype=np.uint8)
+    tracker.process(image)
+    x0, y0, x1, y1 = tracker.roi
+    assert min(x1 - x0, y1 - y0) >= tracker.min_fraction * 480
+    tracker.process(image)
+    assert tracker.tracked_frames == 1
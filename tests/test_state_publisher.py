@@ -0,0 +1,67 @@
+# test_state_publisher.py
+# Readers must not hang on a record left half-written by a publisher that died
+
+import os
+import subprocess
+import sys
+from time import perf_counter
+
+import numpy as np
+import pytest
+
+from game_controller import GameController
+from key_dispatcher import RecordingDispatcher
+from state_publisher import StatePublisher, StateReader
+
+NAME = f'body-pose-test-{os.getpid()}'
+
+
+@pytest.fixture
+def publisher():
+    publisher = StatePublisher(NAME)
+    yield publisher
+    publisher.close()
+
+
+def controllers():
+    return [GameController(dispatcher=RecordingDispatcher(), verbose=False)]
+
+
+def dead_pid():
+    """Return the ID of a process that has exited."""
+    process = subprocess.Popen([sys.executable, '-c', 'pass'])
+    process.wait()
+    return process.pid
+
+
+def test_read_gives_up_on_a_record_left_half_written(publisher):
+    publisher.publish(0.0, [None], controllers())
+    reader = StateReader(NAME, same_process=True)
+    try:
+        assert reader.latest() is not None
+
+        # The publisher died after marking the record as being written
+        publisher._ring[0]['seq'] += 1
+        publisher._header['pid'] = dead_pid()
+
+        started = perf_counter()
+        assert reader.read(1, timeout=0.05) is None
+        assert reader.latest(timeout=0.05) is None
+        assert perf_counter() - started < 1.0
+        assert not reader.publisher_alive()
+    finally:
+        reader.close()
+
+
+def test_read_returns_complete_records(publisher):
+    for frame in range(3):
+        publisher.publish(float(frame), [None], controllers())
+    reader = StateReader(NAME, same_process=True)
+    try:
+        assert reader.publisher_alive()
+        record = reader.read(2)
+        assert int(record['frame']) == 2
+        assert float(record['timestamp']) == 1.0
+        assert np.isnan(record['landmarks'][0]).all()
+    finally:
+        reader.close()
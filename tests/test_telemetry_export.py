@@ -0,0 +1,59 @@
+# test_telemetry_export.py
+# Every exported sample must belong to a metric family with a matching # TYPE line
+
+from telemetry import Telemetry, TelemetryExporter
+
+SUMMARY_SUFFIXES = ('_sum', '_count')
+
+
+def parse_exposition(text):
+    """Return ({family: type}, [sample metric names]) from Prometheus text exposition"""
+    types = {}
+    samples = []
+    for line in text.splitlines():
+        if line.startswith('# TYPE '):
+            _, _, family, kind = line.split()
+            assert family not in types, f'duplicate TYPE line for {family}'
+            types[family] = kind
+        elif line:
+            samples.append(line.split('{')[0].split()[0])
+    return types, samples
+
+
+def family_of(name, types):
+    """Return the family a sample belongs to under the exposition format rules"""
+    if name in types:
+        return name
+    for suffix in SUMMARY_SUFFIXES:
+        base = name[:-len(suffix)]
+        if name.endswith(suffix) and types.get(base) == 'summary':
+            return base
+    return None
+
+
+def make_summary():
+    telemetry = Telemetry(window=4)
+    for frame in range(10):
+        telemetry.timer.add('inference', 0.01 * (frame + 1))
+        telemetry.record_key(0.0, 0.05)
+        telemetry.record_frame()
+    return telemetry.summary()
+
+
+def test_samples_belong_to_typed_families():
+    types, samples = parse_exposition(TelemetryExporter('unused.prom').format(make_summary()))
+    stage_and_key = [name for name in samples if 'stage_seconds' in name or 'capture_to_key' in name]
+    assert stage_and_key
+    for name in stage_and_key:
+        assert family_of(name, types) is not None, f'{name} has no # TYPE line'
+    assert types['bodypost_stage_seconds_mean'] == 'gauge'
+    assert types['bodypost_stage_seconds_max'] == 'gauge'
+    assert types['bodypost_capture_to_key_seconds_max'] == 'gauge'
+
+
+def test_summary_sum_and_count_cover_all_samples():
+    text = TelemetryExporter('unused.prom').format(make_summary())
+    # The window holds 4 samples but _count and _sum cover all 10
+    assert 'bodypost_stage_seconds_count{stage="inference"} 10' in text
+    assert 'bodypost_stage_seconds_sum{stage="inference"} 0.550000' in text
+    assert 'bodypost_capture_to_key_seconds_count 10' in text
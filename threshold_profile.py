@@ -0,0 +1,201 @@
+# threshold_profile.py
+# Resolution-independent classification thresholds derived from calibration sessions
+#
+# A profile stores the hands-joined threshold in shoulder widths and the grid
+# lines as fractions of the frame, so the same profile works at any capture
+# resolution. calibrate.py derives profiles from recorded sessions and clips;
+# main.py and replay.py load them with --profile.
+
+import json
+
+import numpy as np
+
+from landmarks import (
+    HANDS_JOINED_THRESHOLD, LEFT_SHOULDER, RIGHT_SHOULDER, LEFT_WRIST, RIGHT_WRIST, X, Y, shoulder_width_batch
+)
+from gestures import HANDS_EXIT_RATIO, POSITION_MARGIN, HysteresisClassifier
+
+PROFILE_VERSION = 1
+
+# Smallest share of the frames each side of the hands split must have for the split to count
+MIN_CLASS_WEIGHT = 0.05
+
+# Percentiles of the shoulder midpoint taken as the far left/right and the jump/crouch positions;
+# jumps and crouches are brief, so the rows use further out percentiles
+COLUMN_PERCENTILES = (5, 95)
+ROW_PERCENTILES = (2, 98)
+
+# Smallest move away from the standing position, in shoulder widths, that counts as a column or row change
+MIN_MOVE = 0.3
+
+
+class ThresholdProfile:
+    """Body-relative hands threshold and grid lines as fractions of the frame"""
+    def __init__(self, hands_ratio, column_fractions=(1 / 3, 2 / 3), row_fractions=(1 / 3, 2 / 3),
+                 margin=POSITION_MARGIN, calibration=None):
+        """
+        Args:
+            hands_ratio: Wrist distance in shoulder widths below which hands count as joined
+            column_fractions: (left, right) column boundaries as fractions of the frame width
+            row_fractions: (top, bottom) row boundaries as fractions of the frame height
+            margin: Distance past a grid line needed to change cell, as a fraction of the frame size
+            calibration: Optional dictionary describing the data the profile was derived from
+        """
+        self.hands_ratio = hands_ratio
+        self.column_fractions = tuple(column_fractions)
+        self.row_fractions = tuple(row_fractions)
+        self.margin = margin
+        self.calibration = calibration or {}
+
+    @classmethod
+    def load(cls, path):
+        """Read a profile written by save()."""
+        with open(path) as f:
+            data = json.load(f)
+        if data.get('version') != PROFILE_VERSION:
+            raise ValueError(f"{path}: unsupported profile version {data.get('version')}")
+        return cls(data['hands_ratio'], data['column_fractions'], data['row_fractions'], data['margin'],
+                   data.get('calibration'))
+
+    def save(self, path):
+        """Write the profile as JSON"""
+        with open(path, 'w') as f:
+            json.dump({
+                'version': PROFILE_VERSION,
+                'hands_ratio': self.hands_ratio,
+                'column_fractions': self.column_fractions,
+                'row_fractions': self.row_fractions,
+                'margin': self.margin,
+                'calibration': self.calibration,
+            }, f, indent=2)
+
+    def create_classifier(self, exit_ratio=HANDS_EXIT_RATIO):
+        """Return a HysteresisClassifier using the profile's thresholds."""
+        return HysteresisClassifier(exit_ratio=exit_ratio, margin=self.margin, hands_ratio=self.hands_ratio,
+                                    column_fractions=self.column_fractions, row_fractions=self.row_fractions)
+
+
+def measure(stack, width, height):
+    """
+    Extract the body-relative measurements of every frame with a person
+
+    Args:
+        stack: Landmark array of shape (N, 33, 4), NaN where nobody was detected
+        width: Frame width in pixels
+        height: Frame height in pixels
+
+    Returns:
+        Dictionary of arrays: 'hands_ratio' (wrist distance in shoulder widths), 'mid_x' and 'mid_y'
+        (shoulder midpoint as fractions of the frame), 'shoulder_x' and 'shoulder_y' (shoulder width
+        as fractions of the frame width and height), 'shoulder_px' (shoulder width in pixels)
+    """
+    stack = stack[~np.isnan(stack[:, 0, 0])]
+    shoulder = shoulder_width_batch(stack, width, height)
+    wrists = (stack[:, LEFT_WRIST, :2] - stack[:, RIGHT_WRIST, :2]).astype(np.float64) * (width, height)
+    keep = shoulder > 1.0  # side-on poses have no usable shoulder width
+    shoulders = stack[keep][:, [LEFT_SHOULDER, RIGHT_SHOULDER]].astype(np.float64)
+    return {
+        'hands_ratio': np.hypot(*wrists[keep].T) / shoulder[keep],
+        'mid_x': shoulders[:, :, X].mean(axis=1),
+        'mid_y': shoulders[:, :, Y].mean(axis=1),
+        'shoulder_x': shoulder[keep] / width,
+        'shoulder_y': shoulder[keep] / height,
+        'shoulder_px': shoulder[keep],
+    }
+
+
+def split_bimodal(values, bins=128, min_weight=MIN_CLASS_WEIGHT):
+    """
+    Find the value separating two clusters with Otsu's method
+
+    Args:
+        values: Samples, e.g. wrist distances of frames with joined and with apart hands
+        bins: Number of histogram bins
+        min_weight: Smallest share of the samples each cluster must hold
+
+    Returns:
+        Threshold between the clusters, or None if the samples do not form two clusters
+    """
+    if len(values) < 2:
+        return None
+    counts, edges = np.histogram(values, bins=bins)
+    centers = (edges[:-1] + edges[1:]) / 2
+
+    # Split after every bin but the last: samples and summed values below each split
+    count_low = np.cumsum(counts)[:-1]
+    sum_low = np.cumsum(counts * centers)[:-1]
+    count_high = len(values) - count_low
+    sum_high = (counts * centers).sum() - sum_low
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weight_low = count_low / len(values)
+        weight_high = count_high / len(values)
+        between = weight_low * weight_high * (sum_low / count_low - sum_high / count_high) ** 2
+    between[(weight_low < min_weight) | (weight_high < min_weight)] = -1
+    best = int(np.nanargmax(between))
+    if between[best] < 0:
+        return None
+    return float(edges[best + 1])
+
+
+def bounds_around(values, percentiles, min_move, default):
+    """
+    Place the two grid lines halfway between the typical position and the extreme positions
+
+    Args:
+        values: Shoulder midpoints as fractions of the frame
+        percentiles: (low, high) percentiles taken as the extreme positions
+        min_move: Smallest distance from the typical position that counts as a move
+        default: (low, high) lines used on a side without such moves
+
+    Returns:
+        Tuple of (low, high) fractions
+    """
+    baseline = float(np.median(values))
+    low, high = np.percentile(values, percentiles)
+    low_bound = (baseline + low) / 2 if baseline - low >= min_move else default[0]
+    high_bound = (baseline + high) / 2 if high - baseline >= min_move else default[1]
+    return float(low_bound), float(high_bound)
+
+
+def derive_profile(measurements, margin=POSITION_MARGIN):
+    """
+    Derive a profile from the measurements of one or more calibration sessions
+
+    Hands: the wrist distances in shoulder widths split into a joined and an
+    apart cluster; without both, the built-in pixel threshold is converted
+    using the median shoulder width. Grid lines: halfway between the standing
+    position and the furthest left/right and jump/crouch positions, keeping
+    thirds on a side the sessions never moved to.
+
+    Args:
+        measurements: List of dictionaries returned by measure()
+        margin: Grid hysteresis margin to store in the profile
+
+    Returns:
+        ThresholdProfile
+    """
+    merged = {key: np.concatenate([m[key] for m in measurements]) for key in measurements[0]}
+    if len(merged['hands_ratio']) == 0:
+        raise ValueError("No frames with a person in the calibration data")
+
+    shoulder_px = float(np.median(merged['shoulder_px']))
+    hands_ratio = split_bimodal(merged['hands_ratio'])
+    hands_source = 'split'
+    if hands_ratio is None:
+        hands_ratio = HANDS_JOINED_THRESHOLD / shoulder_px
+        hands_source = 'default'
+
+    thirds = (1 / 3, 2 / 3)
+    column_fractions = bounds_around(merged['mid_x'], COLUMN_PERCENTILES,
+                                     MIN_MOVE * float(np.median(merged['shoulder_x'])), thirds)
+    row_fractions = bounds_around(merged['mid_y'], ROW_PERCENTILES,
+                                  MIN_MOVE * float(np.median(merged['shoulder_y'])), thirds)
+
+    calibration = {
+        'frames': int(len(merged['hands_ratio'])),
+        'sessions': len(measurements),
+        'hands_source': hands_source,
+        'median_shoulder_px': shoulder_px,
+        'standing_mid': [float(np.median(merged['mid_x'])), float(np.median(merged['mid_y']))],
+    }
+    return ThresholdProfile(hands_ratio, column_fractions, row_fractions, margin, calibration)
@@ -0,0 +1,157 @@
+# tune_filter.py
+# Compare landmark filter settings on recorded sessions: how much earlier do the
+# keys fire than with the raw landmarks, and how many presses are added or lost
+#
+# Usage:
+# python tune_filter.py session1.bplm session2.bplm --leads-ms 0 20 40 --output tuning.json
+
+import argparse
+import itertools
+import json
+
+import numpy as np
+
+from landmark_recording import LandmarkRecording
+from landmark_filter import FILTERS, create_filter
+from game_controller import GameController
+from key_dispatcher import RecordingDispatcher
+from replay import replay_recording
+from gestures import start_gestures
+
+# Parameter grid tried for each filter
+PARAMETER_GRID = {
+    'one_euro': {'min_cutoff': (0.5, 1.0, 2.0), 'beta': (1.0, 5.0, 20.0)},
+    'kalman': {'process_noise': (10.0, 50.0, 200.0), 'measurement_noise': (1e-5, 1e-4)},
+}
+
+
+def replay_keys(recording, landmark_filter=None, start_hold=None):
+    """
+    Replay a recording and return the keys the controller would have pressed
+
+    Returns:
+        List of (origin timestamp, key) for the movement key presses
+    """
+    dispatcher = RecordingDispatcher()
+    gestures = start_gestures(start_hold) if start_hold is not None else None
+    controller = GameController(dispatcher=dispatcher, verbose=False, gestures=gestures)
+    replay_recording(recording, controller, landmark_filter=landmark_filter)
+    return [(timestamp, key) for timestamp, key in dispatcher.events if timestamp is not None]
+
+
+def match_events(reference, candidate, window):
+    """
+    Pair each candidate key press with the unmatched reference press of the same key nearest in time
+
+    Args:
+        reference: (timestamp, key) presses with the raw landmarks
+        candidate: (timestamp, key) presses with the filtered landmarks
+        window: Largest time difference in seconds for two presses to count as the same
+
+    Returns:
+        Tuple of (list of reference - candidate time differences, number of unmatched candidate
+        presses (false triggers), number of unmatched reference presses (suppressed))
+    """
+    unmatched = list(reference)
+    gains = []
+    false_triggers = 0
+    for timestamp, key in candidate:
+        best = None
+        for i, (reference_timestamp, reference_key) in enumerate(unmatched):
+            difference = abs(reference_timestamp - timestamp)
+            if reference_key == key and difference <= window and (best is None or difference < best[1]):
+                best = (i, difference)
+        if best is None:
+            false_triggers += 1
+            continue
+        reference_timestamp, _ = unmatched.pop(best[0])
+        gains.append(reference_timestamp - timestamp)
+    return gains, false_triggers, len(unmatched)
+
+
+def tune(recordings, filters, leads, window, start_hold=None):
+    """
+    Evaluate every filter configuration on every recording
+
+    Args:
+        recordings: LandmarkRecording objects
+        filters: Filter names to try
+        leads: Lead times in seconds to try
+        window: Matching window in seconds
+        start_hold: Optional time in seconds the hands must stay joined to start the game
+
+    Returns:
+        List of result dictionaries, one per configuration, best mean gain first
+    """
+    references = [replay_keys(recording, start_hold=start_hold) for recording in recordings]
+
+    results = []
+    for name in filters:
+        grid = PARAMETER_GRID[name]
+        for values in itertools.product(*grid.values()):
+            for lead in leads:
+                params = dict(zip(grid, values), lead=lead)
+                gains = []
+                false_triggers = suppressed = presses = 0
+                for recording, reference in zip(recordings, references):
+                    keys = replay_keys(recording, create_filter(name, **params), start_hold)
+                    matched, added, lost = match_events(reference, keys, window)
+                    gains.extend(matched)
+                    false_triggers += added
+                    suppressed += lost
+                    presses += len(keys)
+                results.append({
+                    'filter': name,
+                    'params': params,
+                    'presses': presses,
+                    'reference_presses': sum(len(reference) for reference in references),
+                    'matched': len(gains),
+                    'mean_gain_ms': float(np.mean(gains)) * 1000 if gains else 0.0,
+                    'p50_gain_ms': float(np.median(gains)) * 1000 if gains else 0.0,
+                    'false_triggers': false_triggers,
+                    'suppressed': suppressed,
+                })
+
+    results.sort(key=lambda result: (result['false_triggers'], -result['mean_gain_ms']))
+    return results
+
+
+def parse_args():
+    """Parse command line options"""
+    parser = argparse.ArgumentParser(description='Tune landmark filters on recorded landmark sessions')
+    parser.add_argument('recordings', nargs='+', help='landmark recording files')
+    parser.add_argument('--filters', nargs='+', choices=tuple(FILTERS), default=tuple(FILTERS),
+                        help='filters to evaluate')
+    parser.add_argument('--leads-ms', type=float, nargs='+', default=(0.0, 20.0, 40.0),
+                        help='extrapolation lead times to evaluate')
+    parser.add_argument('--window-ms', type=float, default=300.0,
+                        help='largest time difference for a filtered press to match a raw one')
+    parser.add_argument('--start-hold-ms', type=float, default=None,
+                        help='time the hands must stay joined to start the game')
+    parser.add_argument('--top', type=int, default=10, help='number of configurations to print')
+    parser.add_argument('--output', default=None, help='JSON file to write all results to')
+    return parser.parse_args()
+
+
+def main():
+    """Evaluate the filter grid and print the best configurations"""
+    args = parse_args()
+    recordings = [LandmarkRecording(path) for path in args.recordings]
+    results = tune(recordings, args.filters, [lead / 1000 for lead in args.leads_ms], args.window_ms / 1000,
+                   args.start_hold_ms / 1000 if args.start_hold_ms is not None else None)
+
+    print(f"Raw landmarks: {results[0]['reference_presses'] if results else 0} movement key presses")
+    print(f"{'filter':<10} {'parameters':<58} {'gain ms':>8} {'p50 ms':>7} {'false':>6} {'suppressed':>10}")
+    for result in results[:args.top]:
+        params = ', '.join(f'{key}={value:g}' for key, value in result['params'].items())
+        print(f"{result['filter']:<10} {params:<58} {result['mean_gain_ms']:8.1f} {result['p50_gain_ms']:7.1f} "
+              f"{result['false_triggers']:6d} {result['suppressed']:10d}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,306 @@
+# video_recording.py
+# Record what the kiosk saw to rotating video files, encoding on a background thread
+#
+# cv2.VideoWriter.write takes several milliseconds per frame at 1280x960, so
+# the frame loop only copies the frames it records into a bounded queue; a
+# separate thread downscales and encodes them at the lowest CPU priority.
+# When the encoder falls behind, new frames are dropped and counted instead
+# of slowing the loop down.
+#
+# Frames are placed in the files by their capture timestamps: a frame is
+# repeated or skipped so the file plays back in real time even when the loop
+# runs slower than the file's frame rate. Keyframe recordings have no steady
+# rate, so next to every file a .txt file lists the capture timestamp of each
+# frame (on the perf_counter() clock, like landmark recordings).
+
+import glob
+import os
+import threading
+from collections import deque
+from datetime import datetime
+
+import cv2
+
+from buffer_pool import FrameBufferPool
+
+VIDEO_KINDS = ('raw', 'annotated', 'both')
+
+# How often the encoder checks the size of the current file, in frames
+SIZE_CHECK_INTERVAL = 30
+
+# Niceness of the encoder thread, so it only gets the CPU time the frame loop leaves
+ENCODER_NICENESS = 19
+
+# Longest gap in seconds filled by repeating a frame, longer pauses are cut short
+MAX_REPEAT_GAP = 1.0
+
+
+class SessionVideoRecorder:
+    """
+    Record frames to a series of video files on a background thread.
+
+    Frames are sampled every N-th frame, or only on keyframes (frames on which
+    the game state changed, e.g. a key was pressed). A new file is started
+    once the current one reaches max_file_bytes, and the oldest files with the
+    same prefix, including those of earlier sessions, are deleted to keep at
+    most max_files. If a file cannot be opened, recording stops and the
+    remaining frames count as dropped.
+    """
+    def __init__(self, directory, prefix='session', fps=30.0, width=640, every=1, keyframes_only=False,
+                 max_file_bytes=100 * 1024 * 1024, max_files=10, queue_size=8, fourcc='MJPG'):
+        """
+        Args:
+            directory: Directory the video files are written to (created if needed)
+            prefix: Start of the file names, followed by the start time and a file number
+            fps: Frame rate of the files; sampled frames are repeated or skipped to play back in real time
+            width: Width in pixels the frames are downscaled to (None keeps the original size)
+            every: Record every N-th frame
+            keyframes_only: Only record frames sampled as keyframes
+            max_file_bytes: Size at which a new file is started
+            max_files: Number of files kept, older ones are deleted (None keeps all)
+            queue_size: Number of frames that may wait for the encoder before new ones are dropped
+            fourcc: Codec of the files (MJPG encodes fastest, every frame is a keyframe)
+        """
+        self.directory = directory
+        self.prefix = prefix
+        self.fps = fps
+        self.width = width
+        self.every = max(1, every)
+        self.keyframes_only = keyframes_only
+        self.max_file_bytes = max_file_bytes
+        self.max_files = max_files
+        self.queue_size = queue_size
+        self.fourcc = fourcc
+
+        self.frames_recorded = 0
+        self.frames_dropped = 0
+        self.files_written = 0
+        self.files_deleted = 0
+        self.failed = False  # a file could not be opened, nothing more is recorded
+
+        self._index = 0   # frames sampled so far
+        self._queue = deque()
+        self._buffers = FrameBufferPool()
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._writer = None
+        self._path = None
+        self._frames_in_file = 0
+        self._file_start = None  # capture time of the first frame of the current file
+        self._timestamps = None  # .txt file listing the capture time of every frame
+        self._series = datetime.now().strftime('%Y%m%d-%H%M%S')
+
+    def start(self):
+        """Start the encoder thread"""
+        os.makedirs(self.directory, exist_ok=True)
+        self._running = True
+        self._thread = threading.Thread(target=self._run, name=f'video-{self.prefix}', daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        """Encode the frames still queued, close the current file and stop the encoder thread"""
+        with self._condition:
+            self._running = False
+            self._condition.notify_all()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def sample(self, keyframe=False):
+        """
+        Advance to the next frame and return whether it is to be recorded
+
+        Args:
+            keyframe: Whether the game state changed on this frame
+        """
+        if self.keyframes_only:
+            return keyframe
+        self._index += 1
+        return (self._index - 1) % self.every == 0
+
+    def submit(self, frame, timestamp):
+        """
+        Queue a copy of a sampled frame for encoding without waiting
+
+        Args:
+            frame: BGR frame; it is copied, so it may be reused once submit() returns
+            timestamp: Capture time of the frame on the perf_counter() clock
+
+        Returns:
+            True if the frame was queued, False if it was dropped because the queue is full or recording stopped
+        """
+        with self._condition:
+            if len(self._queue) >= self.queue_size or not self._running or self.failed:
+                self.frames_dropped += 1
+                return False
+        copy = self._buffers.acquire(frame.shape, frame.dtype)
+        copy[...] = frame
+        with self._condition:
+            self._queue.append((copy, timestamp))
+            self._condition.notify()
+        return True
+
+    def _run(self):
+        """Encoder loop running on the background thread"""
+        try:
+            # Linux applies the niceness of a thread ID to that thread only
+            os.setpriority(os.PRIO_PROCESS, threading.get_native_id(), ENCODER_NICENESS)
+        except (AttributeError, OSError):
+            pass
+        try:
+            while True:
+                with self._condition:
+                    self._condition.wait_for(lambda: self._queue or not self._running)
+                    if not self._queue:
+                        return
+                    frame, timestamp = self._queue.popleft()
+                    if self.failed:
+                        # Frames queued before the failure
+                        self.frames_dropped += 1
+                        self._buffers.release(frame)
+                        continue
+                try:
+                    self._write(frame, timestamp)
+                except Exception as e:
+                    with self._condition:
+                        self.frames_dropped += 1
+                    if self.failed:
+                        # Opening fails again for every frame (bad codec, unwritable directory), so stop
+                        print(f"Error recording video to {self._path}: {e}, video recording stopped")
+                    else:
+                        # Keep recording the next frames, e.g. after a full disk was cleaned up
+                        print(f"Error recording video to {self._path}: {e}")
+                        self._close_file()
+                finally:
+                    self._buffers.release(frame)
+        finally:
+            self._close_file()
+
+    def _write(self, frame, timestamp):
+        """Downscale and encode one frame, starting a new file when needed."""
+        if self._writer is not None and not self.keyframes_only:
+            # Repeat the frame up to its place on the file's timeline, or skip it if that is already filled
+            if timestamp - self._file_start > self._frames_in_file / self.fps + MAX_REPEAT_GAP:
+                self._file_start = timestamp - self._frames_in_file / self.fps
+            repeats = round((timestamp - self._file_start) * self.fps) + 1 - self._frames_in_file
+        else:
+            repeats = 1
+        if repeats <= 0:
+            return
+
+        height, width, _ = frame.shape
+        if self.width is not None and width > self.width:
+            frame = cv2.resize(frame, (self.width, height * self.width // width), interpolation=cv2.INTER_AREA)
+        if self._writer is None:
+            self._open_file(frame.shape[1], frame.shape[0])
+            self._file_start = timestamp
+        for _ in range(repeats):
+            self._writer.write(frame)
+            self._timestamps.write(f'{timestamp:.6f}\n')
+        self.frames_recorded += 1
+        size_checks = self._frames_in_file // SIZE_CHECK_INTERVAL
+        self._frames_in_file += repeats
+
+        if self._frames_in_file // SIZE_CHECK_INTERVAL > size_checks and \
+                os.path.getsize(self._path) >= self.max_file_bytes:
+            self._close_file()
+
+    def _open_file(self, width, height):
+        """Start the next file of the series and delete the oldest ones beyond max_files."""
+        self._path = os.path.join(self.directory,
+                                  f'{self.prefix}-{self._series}-{self.files_written + 1:03d}.avi')
+        self._writer = cv2.VideoWriter(self._path, cv2.VideoWriter_fourcc(*self.fourcc), self.fps, (width, height))
+        if not self._writer.isOpened():
+            self._writer = None
+            self.failed = True
+            raise RuntimeError(f"cannot open video writer ({self.fourcc})")
+        try:
+            self._timestamps = open(f'{os.path.splitext(self._path)[0]}.txt', 'w')
+        except OSError:
+            self._writer.release()
+            self._writer = None
+            self.failed = True
+            raise
+        self.files_written += 1
+        self._frames_in_file = 0
+
+        if self.max_files is not None:
+            # Names carry the session's start time and the file number, so they sort oldest first
+            files = sorted(glob.glob(os.path.join(self.directory, f'{self.prefix}-????????-??????-*.avi')))
+            files = [path for path in files if path != self._path]
+            for path in files[:max(0, len(files) - (self.max_files - 1))]:
+                os.remove(path)
+                timestamps_path = f'{os.path.splitext(path)[0]}.txt'
+                if os.path.exists(timestamps_path):
+                    os.remove(timestamps_path)
+                self.files_deleted += 1
+
+    def _close_file(self):
+        """Finish the current file."""
+        if self._writer is not None:
+            self._writer.release()
+            self._writer = None
+        if self._timestamps is not None:
+            self._timestamps.close()
+            self._timestamps = None
+
+    def stats(self):
+        """Return recorder counters for telemetry reports"""
+        with self._condition:
+            queued = len(self._queue)
+        return {
+            'recorded': self.frames_recorded,
+            'dropped': self.frames_dropped,
+            'queued': queued,
+            'files': self.files_written,
+            'deleted': self.files_deleted,
+            'failed': int(self.failed),
+        }
+
+
+class SessionRecording:
+    """
+    Decide for every frame what the raw and annotated recorders record.
+
+    The frame functions call after_update() once the frame's game update is
+    done and before drawing, so the keyframe flag belongs to the frame whose
+    update changed the game state, and overlays are only drawn on frames that
+    are shown or recorded.
+    """
+    def __init__(self, raw, annotated, game_state):
+        """
+        Args:
+            raw: SessionVideoRecorder of the camera frames, or None
+            annotated: SessionVideoRecorder of the frames with overlays, or None
+            game_state: Callable returning the current game state; frames on which it changes are keyframes
+        """
+        self.raw = raw
+        self.annotated = annotated
+        self.show = False  # whether the frames being processed are previewed, set by the frame loop
+        self._game_state = game_state
+        self._last_state = game_state()
+        self._record_annotated = False
+        self._timestamp = None
+
+    def after_update(self, captured):
+        """
+        Record the raw frame if sampled and return whether overlays are to be drawn
+
+        Args:
+            captured: CapturedFrame whose game update just happened; its image must still be valid
+        """
+        state = self._game_state()
+        keyframe, self._last_state = state != self._last_state, state
+        if self.raw is not None and self.raw.sample(keyframe):
+            self.raw.submit(captured.image, captured.timestamp)
+        self._record_annotated = self.annotated is not None and self.annotated.sample(keyframe)
+        self._timestamp = captured.timestamp
+        return self.show or self._record_annotated
+
+    def drawn(self, frame):
+        """Record the frame drawn after the last after_update() call if it was sampled."""
+        if frame is not None and self._record_annotated:
+            self.annotated.submit(frame, self._timestamp)
+        self._record_annotated = False